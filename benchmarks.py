@@ -0,0 +1,220 @@
+import asyncio
+import importlib.util
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pfuncs as pf
+import pfuncs.cache
+import pfuncs.codegen
+
+
+def best_of(stmt, repeat=5, number=1):
+	""" best wall-clock time, in seconds, of 'number' calls to stmt() """
+	return min(timeit.repeat(stmt, repeat=repeat, number=number)) / number
+
+def report(label, seconds, baseline=None):
+	line = '{label:<40} {ms:>10.2f} ms'.format(label=label, ms=1000*seconds)
+	if baseline is not None:
+		line += '   ({:.1f}x)'.format(baseline/seconds)
+	print(line)
+
+
+N = 10**6
+rng = np.random.default_rng(0)
+x = rng.uniform(0.1, 2.0, N)
+y = rng.uniform(0.1, 2.0, N)
+
+# a formula with a long chain of cheap arithmetic nodes and a few transcendental
+#	ones, over arrays large enough that memory traffic dominates
+f = pf.Func('x**2*y + 3*x*y - exp(-x/y) + sqrt(x + y)*sin(x) - log(1 + x*y)/(2 + y)')
+
+
+# numexpr backend vs. the Interpreter
+print('Backends over {:,} elements'.format(N))
+base = best_of(lambda: f.evaluate(x=x, y=y))
+report('numpy (Interpreter)', base)
+try:
+	import numexpr
+	ne = best_of(lambda: f.evaluate(x=x, y=y, backend='numexpr'))
+	report('numexpr', ne, base)
+except ImportError:
+	print('numexpr is not installed; skipping')
+buffered = best_of(lambda: f.evaluate(x=x, y=y, backend='buffered'))
+report('buffered', buffered, base)
+out = np.empty(N)
+buffered_out = best_of(lambda: f.evaluate(x=x, y=y, backend='buffered', out=out))
+report('buffered, preallocated out', buffered_out, base)
+print('buffered plan uses {} scratch buffers; {} arrays allocated per call'.format(
+		f.plan.n_buffers,
+		f.plan.allocations)
+)
+print(' ')
+
+
+# cache-blocked fused evaluation vs. the plain paths, over arrays much larger
+#	than the last-level cache, and a 40-node formula
+M = 10**7
+xl = rng.uniform(0.1, 2.0, M)
+yl = rng.uniform(0.1, 2.0, M)
+g = pf.Func(
+	'x**2*y + 3*x*y - exp(-x/y) + sqrt(x + y)*sin(x) - log(1 + x*y)/(2 + y)'
+	' + (x - y)*(x + y)/(1 + x**2) - 0.5*x*y*y + cos(x*y)'
+)
+outl = np.empty(M)
+print('Fused evaluation over {:,} elements'.format(M))
+base = best_of(lambda: g.evaluate(x=xl, y=yl), repeat=3)
+report('numpy (Interpreter)', base)
+buffered = best_of(lambda: g.evaluate(x=xl, y=yl, backend='buffered', out=outl), repeat=3)
+report('buffered', buffered, base)
+fused = best_of(lambda: g.evaluate(x=xl, y=yl, backend='fused', out=outl), repeat=3)
+report('fused', fused, base)
+print(' ')
+
+
+# thread scaling of a transcendental-heavy formula. ufuncs release the GIL, so
+#	this should scale with the number of cores
+h = pf.Func('exp(-x/y)*sin(x)*cos(y) + log(1 + x*y)*atan(x/y) + erf(x - y)')
+print('Thread scaling over {:,} elements ({} cores)'.format(M, os.cpu_count()))
+base = best_of(lambda: h.evaluate(x=xl, y=yl, backend='buffered', out=outl), repeat=3)
+report('1 thread', base)
+threads = 2
+while threads <= 2*os.cpu_count():
+	t = best_of(
+		lambda: h.evaluate(x=xl, y=yl, backend='buffered', out=outl, threads=threads),
+		repeat=3
+	)
+	report('{} threads'.format(threads), t, base)
+	threads *= 2
+print(' ')
+
+
+# Chebyshev approximation of an expensive univariate formula vs. the
+#	Interpreter, on single points and on arrays. Lower degrees in more pieces 
+#	favour arrays, where each coefficient costs three passes
+k = pf.Func(
+	'exp(sin(x))*log(2 + cos(x)) + atan(exp(-x**2))*sqrt(1 + sin(x)**2)'
+	' + erf(x/3)*cos(exp(x/4)) + log(1 + exp(-x))/(2 + sin(2*x))'
+)
+approximation = k.approximate((-3, 3), tol=1e-8, max_degree=32)
+xs = rng.uniform(-3, 3, N)
+print('Chebyshev approximation on (-3, 3): {}'.format(approximation))
+base = best_of(lambda: k(0.7), number=1000)
+report('scalar, Interpreter', base)
+report('scalar, Chebyshev', best_of(lambda: approximation(0.7), number=1000), base)
+base = best_of(lambda: k.evaluate(x=xs))
+report('{:,} elements, Interpreter'.format(N), base)
+report('{:,} elements, Chebyshev'.format(N), best_of(lambda: approximation(xs)), base)
+print(' ')
+
+
+# per-call overhead on single points: keyword calls vs. positional calls bound
+#	to the slots of the compiled plan
+point = pf.Func('x*exp(-y) + sin(z)/(1 + x**2)', signature=('x', 'y', 'z'))
+print('Scalar calls of {}'.format(point.text))
+base = best_of(lambda: point(x=0.5, y=1.5, z=2.5), number=10000)
+report('keywords, Interpreter', base)
+report('evaluate, buffered', best_of(
+	lambda: point.evaluate(x=0.5, y=1.5, z=2.5, backend='buffered'),
+	number=10000
+), base)
+report('fast', best_of(lambda: point.fast(0.5, 1.5, 2.5), number=10000), base)
+print(' ')
+
+
+# iterated symbolic composition. Substituted trees are shared, so the tree, and
+#	the work to evaluate and differentiate it, grow linearly with the rounds
+phi = pf.Func('x*x/(1 + x) + x')
+rounds = 30
+print('{} rounds of composing {}'.format(rounds, phi.text))
+def compose():
+	q = pf.Func('x')
+	for _ in range(rounds):
+		q = phi(q)
+	return q
+report('compose', best_of(compose))
+p = compose()
+report('evaluate', best_of(lambda: p(x=0.01), number=100))
+report('differentiate', best_of(lambda: p.d['x']))
+print(' ')
+
+
+# float32 evaluation of float32 data, which reads and writes half the memory 
+#	of float64, against float64 evaluation of the same data
+xs = xl.astype(np.float32)
+ys = yl.astype(np.float32)
+outs = np.empty(M, dtype=np.float32)
+print('float32 evaluation over {:,} elements'.format(M))
+base = best_of(lambda: g.evaluate(x=xl, y=yl, backend='fused', out=outl), repeat=3)
+report('fused, float64', base)
+single = best_of(
+	lambda: g.evaluate(x=xs, y=ys, backend='fused', out=outs, dtype=np.float32),
+	repeat=3
+)
+report('fused, float32', single, base)
+base = best_of(lambda: g.evaluate(x=xl, y=yl), repeat=3)
+report('numpy (Interpreter), float64', base)
+single = best_of(lambda: g.evaluate(x=xs, y=ys, dtype=np.float32), repeat=3)
+report('numpy (Interpreter), float32', single, base)
+print(' ')
+
+
+# concurrent scalar requests from asyncio, awaited one at a time against
+#	micro-batched by an AsyncEvaluator
+requests = [(float(a), float(b)) for a, b in zip(x[:5000], y[:5000])]
+evaluator = pf.AsyncEvaluator(f, max_batch=256, max_delay_ms=1.0)
+
+async def one_by_one():
+	for a, b in requests:
+		f(x=a, y=b)
+
+async def batched():
+	await asyncio.gather(*(evaluator(x=a, y=b) for a, b in requests))
+
+print('{:,} concurrent scalar requests'.format(len(requests)))
+base = best_of(lambda: asyncio.run(one_by_one()), repeat=3)
+report('one call per request', base)
+report('AsyncEvaluator', best_of(lambda: asyncio.run(batched()), repeat=3), base)
+print(evaluator.metrics)
+evaluator.close()
+print(' ')
+
+
+# worker startup: building a catalog of formulas and their gradients from 
+#	scratch, then again from the on-disk cache, as a restarted worker would
+catalog = [
+	'{}*x**2*y + exp(-x/({} + y)) - log(1 + x*y)/(2 + y) + sin(x*y)'.format(i, i)
+	for i in range(500)
+]
+
+def startup():
+	for text in catalog:
+		func = pf.Func(text)
+		func.d['x'], func.d['y']
+
+print('Startup with {:,} formulas and their gradients'.format(len(catalog)))
+pfuncs.cache.configure(None)
+base = best_of(startup, repeat=1)
+report('no cache', base)
+with tempfile.TemporaryDirectory() as cache_dir:
+	pfuncs.cache.configure(cache_dir)
+	report('cold cache', best_of(startup, repeat=1), base)
+	report('warm cache', best_of(startup, repeat=3), base)
+	pfuncs.cache.configure(None)
+print(' ')
+
+
+# a generated module against the Interpreter and the bound plan, on scalars
+print('Generated code for {}'.format(p.text[:60] + '...'))
+with tempfile.TemporaryDirectory() as module_dir:
+	path = os.path.join(module_dir, 'generated.py')
+	pfuncs.codegen.emit_module({'p': p}, path, library='math')
+	spec = importlib.util.spec_from_file_location('generated', path)
+	generated = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(generated)
+base = best_of(lambda: p(x=0.01), number=100)
+report('__call__', base)
+report('fast', best_of(lambda: p.fast(0.01), number=1000), base)
+report('generated (math)', best_of(lambda: generated.p(0.01), number=10000), base)
+print(' ')
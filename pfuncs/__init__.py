@@ -1,7 +1,16 @@
 
+__version__ = '0.1.0'
+
 from pfuncs.callable import Func
 from pfuncs.lexer import Lexer 
 from pfuncs.functions import (
 	Parser,
 	Interpreter
-)
\ No newline at end of file
+)
+from pfuncs.batch import compile_many
+from pfuncs.loading import load_many
+from pfuncs.serving import AsyncEvaluator
+from pfuncs import stats
+from pfuncs import codegen
+from pfuncs.solvers import solve
+from pfuncs.optimize import minimize
\ No newline at end of file
@@ -17,6 +17,11 @@ from pfuncs.base import (
 	ID,
 	LPARE,
 	RPARE,
+	# let-bindings
+	COMMA,
+	ASSIGN,
+	LET,
+	IN,
 	# mathematical operations
 	PLUS, 
 	MINUS,
@@ -34,6 +39,40 @@ class Parser(ABCParser):
 
 	def __init__(self, lexer):
 		super().__init__(lexer)
+		# name: node, of the let-bindings in scope
+		self.bindings = dict()
+
+	def lookahead(self, n=1):
+		""" the token 'n' places after the current one, without eating it """
+		stream = self.lexer.token_stream
+		return stream[min(self.lexer.token_pos + n - 1, len(stream) - 1)]
+
+	def let(self):
+		"""
+		let : LET ID ASSIGN expr (COMMA ID ASSIGN expr)* IN expr
+
+		every use of a bound name in the later bindings and the final expr is 
+		the same node, so the resulting tree shares it
+		"""
+		self.eat(ID)
+		outer = dict(self.bindings)
+
+		while True:
+			name = self.current_token.value
+			self.eat(ID)
+			self.eat(ASSIGN)
+			self.bindings[name] = self.expr()
+			if self.current_token.type != COMMA:
+				break
+			self.eat(COMMA)
+
+		if self.current_token.value != IN:
+			self.error()
+		self.eat(ID)
+		node = self.expr()
+
+		self.bindings = outer
+		return node
 
 	def atom(self):
 		"""
@@ -41,11 +80,21 @@ class Parser(ABCParser):
 			 | NUMBER
 			 | LPARE expr RPARE
 			 | (MINUS | PLUS) term
+			 | let
 		"""
 		token = self.current_token
 
 		if token.type == ID:
-			node = ast.Var(token)
+			if (
+				(token.value == LET) 
+				and (self.lookahead(1).type == ID)
+				and (self.lookahead(2).type == ASSIGN)
+			):
+				return self.let()
+			elif token.value in self.bindings:
+				node = self.bindings[token.value]
+			else:
+				node = ast.Var(token)
 			self.eat(ID)
 			return node
 		elif token.type == NUMBER:
@@ -127,6 +176,22 @@ class Interpreter(ABCVisitor):
 		super().__init__(tree)
 		self.scope = scope
 
+		# subtrees shared by several parents, as composing Funcs makes them,
+		#	are evaluated once. Trees without any keep the plain visit
+		if tree.shared:
+			self._shared = {id(node) for node in tree.shared}
+			self._values = dict()
+			self.visit = self._visit_shared
+
+	def _visit_shared(self, node):
+		""" visit, remembering the values of the shared nodes """
+		key = id(node)
+		if key not in self._shared:
+			return type(self).visit(self, node)
+		if key not in self._values:
+			self._values[key] = type(self).visit(self, node)
+		return self._values[key]
+
 	def visit_Num(self, node):
 		return node.value
 
@@ -2,12 +2,89 @@
 module containing all the nodes ands leaves of the Abstract Syntax Tree
 generated by the pfuncs parser
 """
+import copy
+import hashlib
+
+import numpy as np
+
+
 class AST(object):
-	""" Abstract Base Class for all nodes and leaves in AST """
+	""" 
+	Abstract Base Class for all nodes and leaves in AST. Every node carries its
+	free variables in 'free', a tuple of names in order of first appearance, 
+	and a structural 'digest' of the subtree it roots. Both follow from its
+	children: 'free' is computed when the node is built, and the digest the
+	first time it's asked for, as most trees are never hashed. Walkers that 
+	modify nodes in place call refresh() on the tree once they're done. Nodes
+	are equal, and hash equally, when their digests are; digests don't depend
+	on the process, so they can key on-disk caches.
+
+	Nodes can have several parents: composing Funcs shares the substituted 
+	subtrees rather than copying them, so trees are really DAGs. No walker 
+	modifies a node in a way that would change what its other parents mean
+	"""
+
+	# names of the attributes holding child nodes. Leaves have none
+	_fields = ()
 
 	def __init__(self):
 		pass
 
+	def _label(self):
+		""" what distinguishes this node from others with the same children """
+		return type(self).__name__
+
+	def _update(self):
+		""" recompute 'free' from the children, and forget the digest """
+		self.free = free_variables(self)
+		self.__dict__.pop('_digest', None)
+		self.__dict__.pop('_shared', None)
+
+	@property
+	def digest(self):
+		""" computed the first time it's asked for, then kept """
+		digest = self.__dict__.get('_digest')
+		if digest is None:
+			digest = self._digest = structural_digest(self)
+		return digest
+
+	@property
+	def shared(self):
+		""" 
+		the nodes below this one with several parents (see shared_nodes), 
+		computed the first time they're asked for, then kept
+		"""
+		shared = self.__dict__.get('_shared')
+		if shared is None:
+			shared = self._shared = tuple(shared_nodes(self))
+		return shared
+
+	def __deepcopy__(self, memo):
+		"""
+		copies the nodes of the tree, but shares their tokens and values, which
+		are never modified in place
+		"""
+		node = object.__new__(type(self))
+		node.__dict__.update(self.__dict__)
+		# the shared nodes of the copy are copies themselves
+		node.__dict__.pop('_shared', None)
+		for field in self._fields:
+			child = self.__dict__[field]
+			if isinstance(child, list):
+				copied = [copy.deepcopy(c, memo) for c in child]
+			else:
+				copied = copy.deepcopy(child, memo)
+			node.__dict__[field] = copied
+		return node
+
+	def __eq__(self, other):
+		if not isinstance(other, AST):
+			return NotImplemented
+		return self.digest == other.digest
+
+	def __hash__(self):
+		return int.from_bytes(self.digest[:8], 'little', signed=True)
+
 	def describe(self, level=0):
 		"""
 		allows us to visualize (albeit, in a crude way), the whole abstract syntax
@@ -17,8 +94,10 @@ class AST(object):
 
 		indent = '    '
 
-		# gets all the non-private attributes of the subclass into a list
-		valid_attr = lambda d: (not d.startswith('_')) and (d != 'describe')
+		# gets all the non-private attributes of the subclass into a list, less
+		#	the ones derived from the children
+		hidden = ('describe', 'free', 'digest', 'shared')
+		valid_attr = lambda d: (not d.startswith('_')) and (d not in hidden)
 		attrs = [d for d in dir(self) if valid_attr(d)]
 
 		# only prints the current AST object name when it's the first level
@@ -45,17 +124,29 @@ class AST(object):
 
 class BinaryOp(AST):
 
+	_fields = ('left', 'right')
+
 	def __init__(self, left, op, right):
 		self.left = left
 		self.op = op
 		self.right = right
+		self._update()
+
+	def _label(self):
+		return 'BinaryOp {}'.format(self.op.type)
 
 
 class UnaryOp(AST):
 
+	_fields = ('expr',)
+
 	def __init__(self, op, expr):
 		self.op = op
 		self.expr = expr
+		self._update()
+
+	def _label(self):
+		return 'UnaryOp {}'.format(self.op.type)
 
 
 class Num(AST):
@@ -63,6 +154,10 @@ class Num(AST):
 	def __init__(self, token):
 		self.token = token
 		self.value = self.token.value
+		self._update()
+
+	def _label(self):
+		return 'Num {}'.format(_encode_value(self.value))
 
 
 class Var(AST):
@@ -70,24 +165,165 @@ class Var(AST):
 	def __init__(self, token):
 		self.token = token
 		self.value = self.token.value
+		self._update()
+
+	def _label(self):
+		return 'Var {}'.format(self.value)
 
 
 class Function(AST):
 
+	_fields = ('expr',)
+
 	def __init__(self, token, expr):
 		self.token = token
 		self.value = self.token.value
 		self.expr = expr
+		self._update()
+
+	def _label(self):
+		return 'Function {}'.format(self.value)
 
 
 class MultivarFunction(AST):
 
+	_fields = ('arguments',)
+
 	def __init__(self, token, arguments):
 		self.token = token
 		self.value = self.token.value
 		self.arguments = arguments
+		self._update()
+
+	def _label(self):
+		return 'MultivarFunction {}'.format(self.value)
 
 
 class Arg(AST):
+
+	_fields = ('expr',)
+
 	def __init__(self, expr):
-		self.expr = expr
\ No newline at end of file
+		self.expr = expr
+		self._update()
+
+
+def iter_children(node):
+	""" yields the immediate child nodes of 'node', in left-to-right order """
+	for field in node._fields:
+		child = getattr(node, field)
+		if isinstance(child, list):
+			yield from child
+		else:
+			yield child
+
+
+def free_variables(node):
+	""" 
+	the union of the free variables of the children of 'node', in order of 
+	first appearance
+	"""
+	if isinstance(node, Var):
+		return (node.value,)
+	free = ()
+	for child in iter_children(node):
+		if not free:
+			free = child.free
+		elif child.free != free:
+			free += tuple(v for v in child.free if v not in free)
+	return free
+
+
+def _encode_value(value):
+	""" 
+	text identifying a Num's value, the same in every process. Numbers that
+	compare equal, like 2 and 2.0, get the same text
+	"""
+	if isinstance(value, np.ndarray):
+		return 'array {} {} {}'.format(
+			value.dtype.str, 
+			value.shape, 
+			value.tobytes().hex()
+		)
+	try:
+		number = float(value)
+		if number == value:
+			return repr(number)
+	except (TypeError, ValueError, OverflowError):
+		pass
+	return repr(value)
+
+
+def structural_digest(node):
+	"""
+	digest of the subtree rooted at 'node', from its label and the digests of
+	its children
+	"""
+	h = hashlib.blake2b(node._label().encode(), digest_size=16)
+	for child in iter_children(node):
+		h.update(child.digest)
+	return h.digest()
+
+
+def refresh(tree):
+	"""
+	recompute the free variables of every node of 'tree', children before
+	parents, and forget their digests. Called by the walkers that modify 
+	nodes in place, once they're done. Nodes shared by several parents are 
+	updated once
+	"""
+	done = set()
+	stack = [(tree, False)]
+	while stack:
+		node, expanded = stack.pop()
+		if id(node) in done:
+			continue
+		if expanded or (not node._fields):
+			node._update()
+			done.add(id(node))
+		else:
+			stack.append((node, True))
+			stack.extend((c, False) for c in iter_children(node))
+	return tree
+
+
+def count_nodes(tree):
+	""" 
+	number of distinct nodes and leaves in the tree rooted at 'tree'. Nodes 
+	shared by several parents are counted once
+	"""
+	seen = set()
+	stack = [tree]
+	while stack:
+		node = stack.pop()
+		if id(node) in seen:
+			continue
+		seen.add(id(node))
+		stack.extend(iter_children(node))
+	return len(seen)
+
+
+def shared_nodes(tree):
+	"""
+	the nodes of 'tree' (other than leaves and Args) with more than one parent,
+	or reached through more than one path, children before parents. Trees 
+	built by composing Funcs share the substituted subtrees rather than 
+	copying them
+	"""
+	parents = dict()
+	order = list()
+	stack = [(tree, False)]
+	while stack:
+		node, expanded = stack.pop()
+		if expanded:
+			order.append(node)
+			continue
+		key = id(node)
+		parents[key] = parents.get(key, 0) + 1
+		if parents[key] == 1:
+			stack.append((node, True))
+			stack.extend((c, False) for c in reversed(list(iter_children(node))))
+	return [
+		node for node in order
+		if node._fields and (not isinstance(node, Arg)) and (parents[id(node)] > 1)
+	]
@@ -0,0 +1,266 @@
+"""
+module for the evaluation backends of pfuncs. The default 'numpy' backend is 
+the Interpreter; the 'buffered' backend is an EvaluationPlan, which evaluates 
+ndarrays with in-place ufuncs over a few reused scratch buffers; the 'fused' 
+backend runs that plan over one cache-sized block of the inputs at a time; the 
+'polynomial' backend evaluates univariate polynomial and rational Funcs from 
+their coefficients; the 'numexpr' backend translates an AST into a numexpr 
+expression, which evaluates large arrays in cache-sized blocks on several cores
+without allocating a full-size temporary for every node. numexpr is an optional
+dependency, only imported when its backend is requested. The 'numpy', 
+'buffered' and 'fused' backends also evaluate in a given dtype
+"""
+import copy
+import numbers
+
+import numpy as np
+
+try:
+	import numexpr
+except ImportError:
+	numexpr = None
+
+import pfuncs.ast as ast
+import pfuncs.functions as fnc
+
+from pfuncs.generic import ABCVisitor
+from pfuncs.semantics import ScopedMemory
+from pfuncs.polynomial import PolynomialEvaluator
+from pfuncs.plan import (
+	EvaluationPlan,
+	FusedEvaluator,
+	cast
+)
+
+
+NUMPY 		= 'numpy'
+NUMEXPR 	= 'numexpr'
+BUFFERED 	= 'buffered'
+FUSED 		= 'fused'
+POLYNOMIAL 	= 'polynomial'
+
+BACKENDS = (NUMPY, NUMEXPR, BUFFERED, FUSED, POLYNOMIAL)
+
+# backends whose evaluators take a 'dtype' to evaluate in
+DTYPE_BACKENDS = (NUMPY, BUFFERED, FUSED)
+
+# pfuncs built-in function: numexpr function. Built-ins missing from here (erf,
+# 	and the floor, ceil & sign functions only available in recent numexpr
+#	releases) are evaluated with the Interpreter and passed to numexpr as
+#	arrays
+NUMEXPR_FUNCTIONS = {
+	fnc.EXP: 	'exp',
+	fnc.LOG: 	'log',
+	fnc.LN: 	'log',
+	fnc.LOG10: 	'log10',
+	fnc.SQRT: 	'sqrt',
+	fnc.ABS: 	'abs',
+	fnc.SIN: 	'sin',
+	fnc.COS: 	'cos',
+	fnc.TAN: 	'tan',
+	fnc.ASIN: 	'arcsin',
+	fnc.ACOS: 	'arccos',
+	fnc.ATAN: 	'arctan'
+}
+
+
+class NumexprTranslator(ABCVisitor):
+	"""
+	AST walker that writes the tree as a numexpr expression. Variables are
+	renamed so they can't collide with numexpr's own names, and each subtree
+	numexpr can't evaluate is replaced with a placeholder name and kept in
+	'fallbacks', to be evaluated by the Interpreter. Subtrees shared by several
+	parents are written once, as expressions of their own in 'passes', and 
+	referred to by placeholder names, so composed Funcs aren't written out in
+	full at every use
+	"""
+
+	var_prefix = '_pfv'
+	fallback_prefix = '_pff'
+	shared_prefix = '_pfs'
+
+	def __init__(self, tree):
+		super().__init__(tree)
+		self.names = dict()
+		self.fallbacks = dict()
+		# (placeholder name, expression) of the shared subtrees, children 
+		#	before parents, as they're evaluated
+		self.passes = list()
+		# id(node): placeholder name, of the shared subtrees written so far
+		self.memo = dict()
+		self._shared = {id(node) for node in tree.shared}
+		self.text = self.visit(self.tree)
+
+	def visit(self, node):
+		key = id(node)
+		if key not in self._shared:
+			return super().visit(node)
+
+		name = self.memo.get(key)
+		if name is None:
+			text = super().visit(node)
+			if text in self.fallbacks:
+				name = text
+			else:
+				name = self.shared_prefix + str(len(self.passes))
+				self.passes.append((name, text))
+			self.memo[key] = name
+		return name
+
+	def _fallback(self, node):
+		name = self.fallback_prefix + str(len(self.fallbacks))
+		self.fallbacks[name] = node
+		return name
+
+	def visit_BinaryOp(self, node):
+		return '({left}{op}{right})'.format(
+				left=self.visit(node.left),
+				op=node.op.value,
+				right=self.visit(node.right)
+		)
+
+	def visit_UnaryOp(self, node):
+		return '({op}{expr})'.format(
+				op=node.op.value,
+				expr=self.visit(node.expr)
+		)
+
+	def visit_Num(self, node):
+		# arrays substituted by the Curryer, as well as inf & nan, can't be
+		#	written as literals
+		value = node.value
+		if isinstance(value, numbers.Real) and np.isfinite(value):
+			return '({})'.format(repr(float(value)))
+		return self._fallback(node)
+
+	def visit_Var(self, node):
+		if node.value not in self.names:
+			self.names[node.value] = self.var_prefix + str(len(self.names))
+		return self.names[node.value]
+
+	def visit_Function(self, node):
+		try:
+			name = NUMEXPR_FUNCTIONS[node.value]
+		except KeyError:
+			return self._fallback(node)
+		return '{name}({expr})'.format(name=name, expr=self.visit(node.expr))
+
+	def visit_MultivarFunction(self, node):
+		return self._fallback(node)
+
+	def visit_Arg(self, node):
+		return self.visit(node.expr)
+
+
+class NumexprEvaluator(object):
+	"""
+	evaluates an AST with numexpr. The translation happens once, when the
+	evaluator is initialized; evaluate() can then be called with any scope.
+	The shared subtrees are evaluated first, one numexpr call each
+	"""
+
+	def __init__(self, tree):
+		if numexpr is None:
+			msg = 'The \'numexpr\' backend requires the numexpr package'
+			raise ImportError(msg)
+
+		translator = NumexprTranslator(tree)
+		self.expression = translator.text
+		self.names = translator.names
+		self.fallbacks = translator.fallbacks
+		self.passes = translator.passes
+
+	def evaluate(self, scope, out=None):
+		local_dict = {
+			alias: scope.retrieve(name)
+			for name, alias in self.names.items()
+		}
+		for alias, node in self.fallbacks.items():
+			local_dict[alias] = fnc.Interpreter(node, scope).interpret()
+		for alias, expression in self.passes:
+			local_dict[alias] = numexpr.evaluate(
+				expression,
+				local_dict=local_dict,
+				global_dict={}
+			)
+
+		result = numexpr.evaluate(
+			self.expression,
+			local_dict=local_dict,
+			global_dict={},
+			out=out
+		)
+		# numexpr always returns arrays; hand back scalars for scalar inputs
+		if result.ndim == 0:
+			return result[()]
+		return result
+
+
+def cast_constants(tree, dtype):
+	""" copy of 'tree' with the value of every Num cast to 'dtype' """
+	tree = copy.deepcopy(tree)
+	seen = set()
+	stack = [tree]
+	while stack:
+		node = stack.pop()
+		if id(node) in seen:
+			continue
+		seen.add(id(node))
+		if isinstance(node, ast.Num):
+			node.value = cast(node.value, dtype)
+		stack.extend(ast.iter_children(node))
+	return ast.refresh(tree)
+
+
+class CastingInterpreter(fnc.Interpreter):
+	"""
+	Interpreter casting the results of the multivariate built-ins, which SciPy
+	computes in float64, to 'dtype'
+	"""
+
+	def __init__(self, tree, scope, dtype):
+		super().__init__(tree, scope)
+		self.dtype = dtype
+
+	def visit_MultivarFunction(self, node):
+		return cast(super().visit_MultivarFunction(node), self.dtype)
+
+
+class InterpreterEvaluator(object):
+	""" 
+	the Interpreter behind the same interface as the other evaluators. With a 
+	'dtype', the constants of the tree are cast to it once, here, and the
+	variables on every evaluation, so every operation is computed in it
+	"""
+
+	def __init__(self, tree, dtype=None):
+		self.dtype = None if dtype is None else np.dtype(dtype)
+		if self.dtype is None:
+			self.tree = tree
+		else:
+			self.tree = cast_constants(tree, self.dtype)
+
+	def evaluate(self, scope, out=None):
+		if self.dtype is None:
+			result = fnc.Interpreter(self.tree, scope).interpret()
+		else:
+			cast_scope = ScopedMemory(scope_name='global', scope_level=1)
+			for name, value in zip(scope.variables, scope.arguments):
+				cast_scope.assign(name, cast(value, self.dtype))
+			result = CastingInterpreter(self.tree, cast_scope, self.dtype).interpret()
+		if out is None:
+			return result
+		out[...] = result
+		return out
+
+
+# backend name: class of its evaluator. Evaluators are initialized with an AST
+#	(and, for DTYPE_BACKENDS, a 'dtype' keyword) and have an 
+#	evaluate(scope, out=None) method
+EVALUATORS = {
+	NUMPY: 		InterpreterEvaluator,
+	NUMEXPR: 	NumexprEvaluator,
+	BUFFERED: 	EvaluationPlan,
+	FUSED: 		FusedEvaluator,
+	POLYNOMIAL: PolynomialEvaluator
+}
@@ -9,6 +9,12 @@ NUMBER 	= 'NUMBER'
 EOF 	= 'EOF'
 LPARE 	= '('
 RPARE 	= ')'
+ASSIGN 	= '='
+
+# words starting and ending the let-bindings of shared subtrees. They're only
+#	keywords in 'let name = ...', so they're still valid variable names
+LET 	= 'let'
+IN 		= 'in'
 
 PLUS 	= 'PLUS'
 MINUS 	= 'MINUS'
@@ -0,0 +1,51 @@
+"""
+module for compiling catalogs of related Funcs that are evaluated on the same
+inputs - e.g. every Greek of a pricing model - into a single BatchPlan. The
+trees are merged, subtrees they share are evaluated once per call, and the
+results come back as a dict by name
+"""
+import pfuncs.utils as utils
+
+from pfuncs.plan import BatchPlan
+
+
+class CompiledBatch(object):
+	"""
+	callable returned by compile_many. Called with a keyword argument for every
+	variable used by any of the Funcs (scalars or ndarrays), it returns a dict
+	of each Func's value by name. Array results can be written into the arrays
+	of an 'outs' dict, by name; 'outs' is a reserved keyword here. With a 
+	'dtype', every Func is evaluated in it (see EvaluationPlan)
+	"""
+
+	def __init__(self, funcs, dtype=None):
+		self.funcs = {name: utils.ensure_func(f) for name, f in funcs.items()}
+		trees = {name: f.tree for name, f in self.funcs.items()}
+		self.plan = BatchPlan(trees, dtype=dtype)
+		self.variables = tuple(self.plan.variables)
+
+	def __call__(self, outs=None, **inputs):
+		for k in inputs:
+			if k not in self.plan.variables:
+				raise NameError(k) from None
+		for k in self.variables:
+			if k not in inputs:
+				raise NameError('Value for \'{}\' not provided.'.format(k)) from None
+		return self.plan.run(inputs, outs=outs)
+
+	def __str__(self):
+		return '<{klass}: {n} funcs, {shared} of {nodes} nodes shared, vars: {vars}>'.format(
+				klass=self.__class__.__name__,
+				n=len(self.funcs),
+				shared=self.plan.n_nodes - len(self.plan.instructions),
+				nodes=self.plan.n_nodes,
+				vars=self.variables
+		)
+
+
+def compile_many(funcs, dtype=None):
+	"""
+	compile a dict of Funcs (or parse-able strings, or numbers) by name into a
+	CompiledBatch that evaluates all of them at once, in 'dtype' if it's given
+	"""
+	return CompiledBatch(funcs, dtype=dtype)
@@ -0,0 +1,257 @@
+"""
+module for the optional on-disk cache of parsed expressions and their
+derivatives, so restarted workers skip lexing, parsing, differentiating and
+simplifying the formulas they've seen before. It's enabled by pointing the
+PFUNCS_CACHE_DIR environment variable at a directory (or by calling
+configure()), and PFUNCS_CACHE_SIZE bounds its size in bytes.
+
+Entries are stored as JSON: values are made of dicts, lists, strings and
+numbers (NumPy scalars are stored as the Python numbers they hold), and those
+that can't be, e.g. trees with arrays substituted in, aren't stored. Keys
+include the library version and a fingerprint of its source, so entries
+written by any other version are never read. Each entry is written to a
+temporary file and renamed into place, so concurrent writers (processes or
+threads) never leave a partial entry behind, and readers never see one. When
+the cache outgrows its size, the entries used least recently are removed. Each
+process counts its own writes between scans of the directory, so with several
+writers the size is a soft bound
+"""
+import functools
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+import pfuncs.stats as stats
+
+
+DIR_VARIABLE = 'PFUNCS_CACHE_DIR'
+SIZE_VARIABLE = 'PFUNCS_CACHE_SIZE'
+
+DEFAULT_MAX_BYTES = 2**28
+# eviction removes entries until the cache is down to this fraction of its size
+EVICT_TO = 0.8
+# temporary files older than this many seconds were left by writers that died
+STALE = 3600
+
+SUFFIX = '.pfc'
+TMP_PREFIX = '.tmp-'
+
+# the cache in use, and whether the environment has been read for it yet
+_cache = None
+_configured = False
+
+
+@functools.lru_cache(maxsize=None)
+def library_version():
+	"""
+	the version of pfuncs, and a digest of its source files, so editing the
+	library also invalidates the cache
+	"""
+	import pfuncs
+
+	h = hashlib.blake2b(digest_size=8)
+	package = os.path.dirname(os.path.abspath(__file__))
+	for path in sorted(glob.glob(os.path.join(package, '*.py'))):
+		with open(path, 'rb') as f:
+			h.update(f.read())
+	return '{}-{}'.format(pfuncs.__version__, h.hexdigest())
+
+
+class DiskCache(object):
+	"""
+	directory of JSON values, each in a file named by the digest of its key.
+	Keys are tuples of strings, and are combined with the library version.
+	Hits refresh a file's modification time, which eviction goes by
+	"""
+
+	def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+		self.path = os.path.abspath(path)
+		self.max_bytes = max_bytes
+		os.makedirs(self.path, exist_ok=True)
+		# bytes in the directory, scanned on the first write and then tracked
+		self._size = None
+
+	def _file(self, key):
+		h = hashlib.blake2b(library_version().encode(), digest_size=20)
+		for part in key:
+			h.update(b'\0')
+			h.update(part.encode())
+		return os.path.join(self.path, h.hexdigest() + SUFFIX)
+
+	def get(self, key):
+		""" the value stored under 'key', or None """
+		path = self._file(key)
+		try:
+			with open(path, 'rb') as f:
+				value = json.loads(f.read())
+		except FileNotFoundError:
+			stats.miss('disk')
+			return None
+		except Exception:
+			# unreadable, e.g. truncated by a full disk. Treated as missing
+			stats.miss('disk')
+			self._remove(path)
+			return None
+
+		stats.hit('disk')
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		return value
+
+	def put(self, key, value):
+		"""
+		store 'value' under 'key', replacing whatever is there. Values that
+		can't be stored as JSON are skipped, and errors writing (e.g. a full 
+		or read-only disk) are ignored, as the cache is optional
+		"""
+		try:
+			data = json.dumps(value, default=_plain).encode()
+		except (TypeError, ValueError):
+			return
+		try:
+			fd, tmp = tempfile.mkstemp(dir=self.path, prefix=TMP_PREFIX)
+		except OSError:
+			return
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				f.write(data)
+			os.replace(tmp, self._file(key))
+		except OSError:
+			self._remove(tmp)
+			return
+
+		if self._size is None:
+			self._size = self.size()
+		else:
+			self._size += len(data)
+		if self._size > self.max_bytes:
+			self.evict()
+
+	def _entries(self):
+		""" (modification time, size, path) of every file in the cache """
+		entries = list()
+		for entry in os.scandir(self.path):
+			try:
+				info = entry.stat()
+			except FileNotFoundError:
+				continue
+			entries.append((info.st_mtime, info.st_size, entry.path))
+		return entries
+
+	def size(self):
+		""" bytes in the cache """
+		return sum(size for _, size, _ in self._entries())
+
+	def evict(self):
+		"""
+		remove the entries used least recently until the cache is down to
+		EVICT_TO of its maximum size, along with stale temporary files
+		"""
+		entries = sorted(self._entries())
+		now = time.time()
+		total = 0
+		for mtime, size, path in entries:
+			if os.path.basename(path).startswith(TMP_PREFIX):
+				if now - mtime > STALE:
+					self._remove(path)
+				else:
+					total += size
+			else:
+				total += size
+
+		target = EVICT_TO * self.max_bytes
+		for _, size, path in entries:
+			if total <= target:
+				break
+			if path.endswith(SUFFIX):
+				self._remove(path)
+				total -= size
+		self._size = total
+
+	def clear(self):
+		""" remove every entry """
+		for _, _, path in self._entries():
+			if path.endswith(SUFFIX):
+				self._remove(path)
+		self._size = None
+
+	@staticmethod
+	def _remove(path):
+		# another process may have removed it first
+		try:
+			os.remove(path)
+		except OSError:
+			pass
+
+	def __str__(self):
+		return '<{klass}: {path}, {size} of {max} bytes>'.format(
+				klass=self.__class__.__name__,
+				path=self.path,
+				size=self.size(),
+				max=self.max_bytes
+		)
+
+
+def _plain(value):
+	""" the Python number held by a NumPy scalar, for json.dumps """
+	if isinstance(value, np.generic):
+		return value.item()
+	raise TypeError('{} can\'t be stored in the cache'.format(type(value).__name__))
+
+
+def configure(path=None, max_bytes=None):
+	"""
+	use a cache in the directory 'path', holding at most 'max_bytes', instead
+	of the one set by the environment. None disables the cache
+	"""
+	global _cache, _configured
+	_configured = True
+	if path is None:
+		_cache = None
+	else:
+		_cache = DiskCache(path, max_bytes or DEFAULT_MAX_BYTES)
+	return _cache
+
+
+def get_cache():
+	"""
+	the cache in use, or None when it's disabled. The environment is read the
+	first time it's asked for
+	"""
+	if not _configured:
+		path = os.environ.get(DIR_VARIABLE)
+		configure(path or None, _max_bytes(os.environ.get(SIZE_VARIABLE)))
+	return _cache
+
+
+def _max_bytes(size):
+	"""
+	the cache size set by the environment, or None for the default. Sizes that
+	aren't a positive number of bytes are ignored with a warning, rather than
+	failing the first Func built
+	"""
+	if not size:
+		return None
+	try:
+		max_bytes = int(size)
+	except ValueError:
+		max_bytes = 0
+	if max_bytes > 0:
+		return max_bytes
+
+	msg = '{var} must be a positive number of bytes, not {size}; using {default}'
+	warnings.warn(msg.format(
+			var=SIZE_VARIABLE,
+			size=repr(size),
+			default=DEFAULT_MAX_BYTES
+		)
+	)
+	return None
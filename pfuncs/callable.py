@@ -1,17 +1,29 @@
 """
 module defining the Func class - the central class of the pfuncs library
 """
+import functools
+
+import numpy as np
 
 import pfuncs.ast as ast
 import pfuncs.base as base
+import pfuncs.batch as batch
+import pfuncs.cache as cache
+import pfuncs.chebyshev as chebyshev
+import pfuncs.backends as backends
+import pfuncs.parallel as parallel
+import pfuncs.polynomial as polynomial
+import pfuncs.quadrature as quadrature
+import pfuncs.serialize as serialize
+import pfuncs.solvers as solvers
+import pfuncs.stats as stats
+import pfuncs.streaming as streaming
+import pfuncs.tables as tables
 import pfuncs.utils as utils
 
 from pfuncs.tokens import Token
 from pfuncs.lexer import Lexer 
-from pfuncs.semantics import (
-	SemanticAnalyzer,
- 	ScopedMemory
-)
+from pfuncs.semantics import ScopedMemory
 from pfuncs.functions import (
 	Parser,
 	Interpreter
@@ -20,6 +32,10 @@ from pfuncs.operators import (
 	Curryer,
 	Differential
 )
+from pfuncs.profiler import (
+	ProfilingInterpreter,
+	Profile
+)
 
 
 class Func(object):
@@ -38,14 +54,28 @@ class Func(object):
 						arguments each time an instance of Func is called
 		text 		- only assigned if instance is initialized with 'text'
 						parameter (for now)
+		signature 	- tuple of the variable names, in the order positional
+						arguments are taken by fast() and by __call__ of 
+						multivariate instances. None unless it's provided.
+						Derivatives keep it, as do Funcs built from this one
+						by algebra or currying while it names all their 
+						variables (less those bound by currying)
 	"""
 
 	def __init__(
 		self, 
 		text=None, 
-		tree=None
+		tree=None,
+		signature=None
 	):
 		self.scope = None
+		# function of positional values, bound to the slots of the plan
+		self._fast = None
+		# (backend name, threaded, dtype): evaluator, built the first time it's 
+		#	used
+		self._evaluators = dict()
+		# (variable, order): CompiledBatch of the derivatives up to that order
+		self._derivatives = dict()
 
 		if text and (tree is None):
 			self._text_construct(text)
@@ -54,28 +84,96 @@ class Func(object):
 		else:
 			msg = 'Exactly one of \'text\' and \'tree\' must be provided'
 			raise ValueError(msg)
+		self._init_signature(signature)
 
 
 	# ============================== 
 	# 	Initialization Methods 
 	# ==============================
+	@stats.timed('_text_construct')
 	def _text_construct(self, text):
-		""" constructor method if 'text' parameter is passed to __init__ """
+		""" 
+		constructor method if 'text' parameter is passed to __init__. With the
+		on-disk cache enabled, the tree and variables of text parsed before are
+		read from it instead
+		"""
+		disk = cache.get_cache()
+		if disk is not None:
+			entry = disk.get(('tree', text))
+			if entry is not None:
+				try:
+					self.tree = serialize.decode(entry['tree'])
+					# the digest keys the cached derivatives; it's kept to spare
+					#	hashing the whole tree again
+					self.tree._digest = bytes.fromhex(entry['digest'])
+					self.variables = tuple(entry['variables'])
+					return
+				except (KeyError, IndexError, TypeError, ValueError):
+					# not an entry this version writes; parsed as usual
+					pass
+
 		lexer = Lexer(text)
 		parser = Parser(lexer)
 		self.tree = parser.parse()
 		self._init_variables()
 
+		if disk is not None:
+			disk.put(('tree', text), {
+				'tree': serialize.encode(self.tree), 
+				'variables': self.variables,
+				'digest': self.tree.digest.hex()
+			})
+
 	def _tree_construct(self, tree):
 		""" constructor method if 'tree' parameter is passed to __init__ """
 		self.tree = tree
 		self._init_variables()
 
+	@stats.timed('_init_variables')
 	def _init_variables(self):
-		""" search the AST for Var nodes, assign the variables attribute """
-		sem_analyzer = SemanticAnalyzer(self.tree)
-		sem_analyzer.analyze()
-		self.variables = sem_analyzer.variables
+		""" assign the variables attribute from the free variables of the AST """
+		self.variables = self.tree.free
+
+	def _init_signature(self, signature):
+		""" 
+		check that 'signature' names every variable, each once. It can name
+		variables the expression doesn't use, which take arguments but are 
+		ignored
+		"""
+		if signature is None:
+			self.signature = None
+			return
+
+		signature = tuple(signature)
+		if len(set(signature)) != len(signature):
+			raise ValueError('Signature has repeated variables')
+		missing = [k for k in self.variables if k not in signature]
+		if missing:
+			msg = 'Variables {} missing from the signature'
+			raise NameError(msg.format(tuple(missing)))
+		self.signature = signature
+
+	def _derived_signature(self, variables, bound=()):
+		"""
+		the signature of a Func derived from this one, with 'variables': this 
+		one's, less the names in 'bound' it no longer has, or None if that
+		doesn't name every variable
+		"""
+		if self.signature is None:
+			return None
+		signature = tuple(
+			name for name in self.signature 
+			if (name not in bound) or (name in variables)
+		)
+		if all(name in signature for name in variables):
+			return signature
+		return None
+
+	def _derive(self, tree, bound=()):
+		""" Func of 'tree', derived from this one (see _derived_signature) """
+		func = Func(tree=tree)
+		func.signature = self._derived_signature(func.variables, bound)
+		return func
 
 	
 	# ==============================
@@ -114,6 +212,25 @@ class Func(object):
 			msg = 'Expected one arguments; received {}'
 			raise ValueError(msg.format(len(kwargs)))
 
+	def _bind_positional(self, args, kwargs):
+		""" 
+		merge positional arguments, named by the signature, into 'kwargs'.
+		Arguments for variables the expression doesn't use are dropped
+		"""
+		if len(args) > len(self.signature):
+			msg = 'Expected at most {} positional arguments; received {}'
+			raise ValueError(msg.format(len(self.signature), len(args)))
+
+		arguments = dict()
+		for name, value in zip(self.signature, args):
+			if name in kwargs:
+				msg = 'Multiple values for \'{}\''
+				raise ValueError(msg.format(name))
+			if name in self.variables:
+				arguments[name] = value
+		arguments.update(kwargs)
+		return arguments
+
 	def _init_scope(self, arguments):
 		""" 
 		given 'arguments' object from one of the _call_* methods, initialize the 
@@ -141,6 +258,20 @@ class Func(object):
 		else:
 			raise TypeError('arguments must be dict or tuple')
 
+	def _init_full_scope(self, args, kwargs):
+		""" 
+		initialize the scope for methods that need a value for every variable.
+		Like __call__, positional arguments are only accepted for univariate
+		instances
+		"""
+		if args:
+			if (len(self.variables) != 1) or (len(args) != 1) or kwargs:
+				msg = 'Positional arguments only accepted for univariate functions'
+				raise ValueError(msg)
+			self._init_scope(arguments=args)
+		else:
+			self._init_scope(arguments=kwargs)
+
 	def _maybe_evaluate(self):
 		""" 
 		substitute variables if they're parsable strings or Funcs, 
@@ -151,17 +282,201 @@ class Func(object):
 		else:
 			return self._evaluate()
 
+	@stats.timed('_evaluate')
 	def _evaluate(self):
 		""" evaluates the expression given values of variables in self.scope """
 		interpreter = Interpreter(self.tree, self.scope)
 		return interpreter.interpret()
 
+	def evaluate(
+		self, 
+		*args, 
+		backend=backends.NUMPY, 
+		out=None, 
+		threads=None, 
+		dtype=None,
+		**kwargs
+	):
+		"""
+		evaluate the expression with a value for every variable, using one of
+		the backends in pfuncs.backends. Unlike __call__, never curries or
+		composes. Array results are written into 'out' if it's provided. With
+		'threads', large arrays are split into that many chunks and evaluated
+		in a thread pool. With 'dtype' (e.g. np.float32), the constants are 
+		cast to it once, when the backend's evaluator is built, and the inputs 
+		on every call, so every intermediate and the result are in that dtype;
+		only the 'numpy', 'buffered' and 'fused' backends take one. 'backend', 
+		'out', 'threads' and 'dtype' are reserved keywords here
+		"""
+		self._init_full_scope(args, kwargs)
+		return self._evaluate_scope(backend, out, threads, dtype)
+
+	def _evaluate_scope(self, backend, out, threads, dtype=None):
+		""" evaluate with the scope already set, dispatching to a backend """
+		if threads is not None:
+			evaluator = self._evaluator(backend, threaded=True, dtype=dtype)
+			return evaluator.evaluate(self.scope, out=out, threads=threads)
+		elif (backend != backends.NUMPY) or (dtype is not None):
+			evaluator = self._evaluator(backend, dtype=dtype)
+			return evaluator.evaluate(self.scope, out=out)
+
+		result = self._evaluate()
+		if out is None:
+			return result
+		out[...] = result
+		return out
+
+	def evaluate_columns(
+		self, 
+		table, 
+		backend=backends.NUMPY, 
+		out=None, 
+		threads=None,
+		dtype=None
+	):
+		"""
+		evaluate the expression over a columnar table: a dict of column name: 
+		array, or a NumPy structured array. Each variable is resolved to its 
+		column once, as a view rather than a copy, and extra columns are 
+		ignored. Returns an array with one value per row of the table, in 
+		'dtype' if it's given (see evaluate)
+		"""
+		columns = tables.table_columns(table, self.variables)
+
+		self.scope = ScopedMemory(scope_name='global', scope_level=1)
+		for name, column in columns.items():
+			self.scope.assign(name, column)
+		result = self._evaluate_scope(backend, out, threads, dtype)
+
+		# expressions without variables still give one value per row
+		if np.ndim(result) == 0:
+			result = np.full(tables.table_length(table), result, dtype=dtype)
+		return result
+
+	def evaluate_many(self, arguments, backend=backends.NUMPY):
+		"""
+		evaluate the expression for each dict of keyword arguments in the 
+		'arguments' sequence, returning a list of the results in order. Dicts
+		with a real number for every variable, and nothing else, are stacked 
+		into columns and evaluated together in one call of 'backend'; the rest
+		are passed to __call__ one by one, so they can curry or compose
+		"""
+		arguments = list(arguments)
+		results = [None] * len(arguments)
+		stacked, columns, rest = tables.stack_rows(arguments, self.variables)
+
+		if stacked:
+			values = self.evaluate(backend=backend, **columns)
+			values = np.broadcast_to(values, (len(stacked),))
+			for i, value in zip(stacked, values):
+				results[i] = value
+		for i in rest:
+			results[i] = self(**arguments[i])
+		return results
+
+	def evaluate_stream(
+		self, 
+		out=None, 
+		chunk=streaming.DEFAULT_CHUNK, 
+		backend=backends.NUMPY, 
+		dtype=None,
+		**inputs
+	):
+		"""
+		evaluate the expression over inputs too large for memory. Inputs can be
+		arrays, memmaps, or paths to .npy files (which are memory-mapped); they 
+		are evaluated 'chunk' rows at a time along their first axis, and the 
+		result is written into 'out' - a path to a new .npy file, an existing 
+		array or memmap, or None for a new in-memory array. Chunks are 
+		evaluated in 'dtype' if it's given (see evaluate). 'out', 'chunk', 
+		'backend' and 'dtype' are reserved keywords here
+		"""
+		return streaming.evaluate_stream(
+			self, 
+			inputs, 
+			out=out, 
+			chunk=chunk, 
+			backend=backend,
+			dtype=dtype
+		)
+
+	def _evaluator(self, backend, threaded=False, dtype=None):
+		""" 
+		the cached evaluator of 'backend', built on first use. Threaded
+		evaluators build one evaluator of 'backend' per thread. Evaluators
+		with a 'dtype' are kept apart from those without
+		"""
+		if dtype is not None:
+			dtype = np.dtype(dtype)
+			if backend not in backends.DTYPE_BACKENDS:
+				msg = 'dtype is only supported by the backends {}'
+				raise ValueError(msg.format(backends.DTYPE_BACKENDS))
+
+		key = (backend, threaded, dtype)
+		try:
+			evaluator = self._evaluators[key]
+			stats.hit('evaluators')
+		except KeyError:
+			stats.miss('evaluators')
+			try:
+				klass = backends.EVALUATORS[backend]
+			except KeyError:
+				msg = 'backend must be one of {}'.format(backends.BACKENDS)
+				raise ValueError(msg) from None
+
+			if dtype is not None:
+				klass = functools.partial(klass, dtype=dtype)
+			if threaded:
+				evaluator = parallel.ThreadedEvaluator(self.tree, klass, dtype)
+			else:
+				evaluator = klass(self.tree)
+			self._evaluators[key] = evaluator
+		return evaluator
+
+	def fast(self, *values):
+		"""
+		evaluate the expression with a value for every variable in the order of
+		the signature (or, without one, of 'variables'), through the compiled
+		plan. Slots are resolved on the first call, and values are neither 
+		checked nor substituted, so they must be numbers or ndarrays - never 
+		strings or Funcs
+		"""
+		if self._fast is None:
+			names = self.variables if self.signature is None else self.signature
+			self._fast = self.plan.bind(names)
+		return self._fast(*values)
+
+	@property
+	def plan(self):
+		""" 
+		the EvaluationPlan of the 'buffered' backend. Its n_buffers and 
+		allocations attributes report the scratch buffers it needs, and the 
+		arrays allocated by its last evaluation
+		"""
+		return self._evaluator(backends.BUFFERED)
+
+	def profile(self, *args, repeat=1, **kwargs):
+		"""
+		evaluate the expression 'repeat' times with a ProfilingInterpreter and 
+		return a Profile that attributes the time spent to each node of the AST. 
+		Arguments are given as they are to __call__, but all variables must be 
+		provided
+		"""
+		self._init_full_scope(args, kwargs)
+
+		interpreter = ProfilingInterpreter(self.tree, self.scope)
+		for _ in range(repeat):
+			result = interpreter.interpret()
+		return Profile(self.tree, interpreter.records, result)
+
 	@utils.simplify
+	@stats.timed('_curry')
 	def _curry(self):
-		return Curryer(
+		curried = Curryer(
 			tree=self.tree,
 			scope=self.scope
 		).curry()
+		return self._derive(curried.tree, bound=self.scope.variables)
 
 
 	# ==============================
@@ -172,15 +487,133 @@ class Func(object):
 		""" 
 		Differential class computes AST that represents the derivative, and
 		can be accessed with '[]' to compute functional derivatives, and the 
-		derivative at single points
+		derivative at single points. Derivatives take the same arguments as
+		the Func, so they keep its signature
 		"""
-		return Differential(self.tree)
+		return Differential(self.tree, signature=self.signature)
 
 	@property
 	def d(self):
 		""" alias for derivative property """
 		return self.derivative
 	
+	def compile_derivatives(self, var, order=1):
+		"""
+		CompiledBatch of the expression and its derivatives with respect to
+		'var', up to 'order', keyed by the order of the derivative (0 for the
+		expression itself). The derivatives are built once, and evaluated
+		together with the expression so the subtrees they share run once
+		"""
+		if var not in self.variables:
+			msg = '{} is not a variable of the expression'
+			raise NameError(msg.format(repr(var)))
+
+		key = (var, order)
+		try:
+			compiled = self._derivatives[key]
+			stats.hit('derivatives')
+		except KeyError:
+			stats.miss('derivatives')
+			funcs = {0: self}
+			for n in range(1, order+1):
+				funcs[n] = funcs[n-1].derivative[var]
+			compiled = batch.compile_many(funcs)
+			self._derivatives[key] = compiled
+		return compiled
+
+	@property
+	def polynomial(self):
+		"""
+		if the expression is a polynomial, or a ratio of polynomials, in its 
+		one variable, the Polynomial or Rational representing it; None 
+		otherwise. Those evaluate by Horner's rule and differentiate through 
+		their coefficients
+		"""
+		if len(self.variables) != 1:
+			return None
+		return polynomial.analyze(self.tree, self.variables[0])
+
+	def approximate(self, domain, tol=1e-10, max_degree=128, max_pieces=64):
+		"""
+		a piecewise Chebyshev approximation of the expression on 'domain' =
+		(a, b), with an absolute error of at most 'tol' where 'max_degree' and
+		'max_pieces' allow it. The result is evaluated by Clenshaw's recurrence
+		on scalars or arrays, and its max_error attribute reports the error it
+		achieved. Only for expressions of one variable
+		"""
+		if len(self.variables) != 1:
+			msg = 'Only expressions of exactly one variable can be approximated'
+			raise ValueError(msg)
+		var = self.variables[0]
+
+		def f(x):
+			return self.evaluate(backend=backends.BUFFERED, **{var: x})
+
+		return chebyshev.fit(
+			f,
+			domain,
+			tol=tol,
+			max_degree=max_degree,
+			max_pieces=max_pieces
+		)
+
+	def fixed_point(
+		self,
+		x0,
+		tol=1e-12,
+		maxiter=500,
+		accelerate=None,
+		**params
+	):
+		"""
+		iterate x = f(x) from 'x0', a scalar or an array of starting points,
+		through the compiled plan of the expression rather than calling it
+		again and again. 'params' gives values for any other variables, and
+		'accelerate' can be None, 'aitken' or 'anderson'. Returns a Solution
+		with the fixed points, whether each converged, and the iterations each
+		took; see pfuncs.solvers.fixed_point
+		"""
+		return solvers.fixed_point(
+			self,
+			x0,
+			tol=tol,
+			maxiter=maxiter,
+			accelerate=accelerate,
+			**params
+		)
+
+	def integrate(
+		self,
+		var,
+		a,
+		b,
+		/,
+		tol=1.49e-8,
+		rtol=1.49e-8,
+		limit=50,
+		adaptive=True,
+		intervals=1,
+		**params
+	):
+		"""
+		integral over 'var' from 'a' to 'b' for every parameter set in 'params'
+		at once, by adaptive (or, with adaptive=False, fixed) 15-point Gauss-
+		Kronrod rules evaluated through the compiled plan of the expression.
+		Returns (integrals, error estimates); see pfuncs.quadrature.integrate
+		"""
+		return quadrature.integrate(
+			self,
+			var,
+			a,
+			b,
+			tol=tol,
+			rtol=rtol,
+			limit=limit,
+			adaptive=adaptive,
+			intervals=intervals,
+			**params
+		)
+
 	@property
 	def text(self):
 		author = utils.Writer(self.tree)
@@ -194,69 +627,69 @@ class Func(object):
 	def __add__(self, other):
 		f = utils.ensure_func(self)
 		g = utils.ensure_func(other)
-		return Func(tree=utils.add(f.tree, g.tree))
+		return self._derive(utils.add(f.tree, g.tree))
 
 	@utils.simplify
 	def __radd__(self, other):
 		f = utils.ensure_func(other)
 		g = utils.ensure_func(self)
-		return Func(tree=utils.add(f.tree, g.tree))
+		return self._derive(utils.add(f.tree, g.tree))
 
 	@utils.simplify
 	def __sub__(self, other):
 		f = utils.ensure_func(self)
 		g = utils.ensure_func(other)
-		return Func(tree=utils.minus(f.tree, g.tree))
+		return self._derive(utils.minus(f.tree, g.tree))
 
 	@utils.simplify
 	def __rsub__(self, other):
 		f = utils.ensure_func(other)
 		g = utils.ensure_func(self)
-		return Func(tree=utils.minus(f.tree, g.tree))
+		return self._derive(utils.minus(f.tree, g.tree))
 
 	@utils.simplify
 	def __mul__(self, other):
 		f = utils.ensure_func(self)
 		g = utils.ensure_func(other)
-		return Func(tree=utils.mul(f.tree, g.tree))
+		return self._derive(utils.mul(f.tree, g.tree))
 
 	@utils.simplify
 	def __rmul__(self, other):
 		f = utils.ensure_func(other)
 		g = utils.ensure_func(self)
-		return Func(tree=utils.mul(f.tree, g.tree))
+		return self._derive(utils.mul(f.tree, g.tree))
 
 	@utils.simplify
 	def __truediv__(self, other):
 		f = utils.ensure_func(self)
 		g = utils.ensure_func(other)
-		return Func(tree=utils.div(f.tree, g.tree))
+		return self._derive(utils.div(f.tree, g.tree))
 
 	@utils.simplify
 	def __rtruediv__(self, other):
 		f = utils.ensure_func(other)
 		g = utils.ensure_func(self)
-		return Func(tree=utils.div(f.tree, g.tree))
+		return self._derive(utils.div(f.tree, g.tree))
 
 	@utils.simplify
 	def __pow__(self, other):
 		f = utils.ensure_func(self)
 		g = utils.ensure_func(other)
-		return Func(tree=utils.power(f.tree, g.tree))
+		return self._derive(utils.power(f.tree, g.tree))
 
 	@utils.simplify
 	def __rpow__(self, other):
 		f = utils.ensure_func(other)
 		g = utils.ensure_func(self)
-		return Func(tree=utils.power(f.tree, g.tree))
+		return self._derive(utils.power(f.tree, g.tree))
 
 	@utils.simplify
 	def __pos__(self):
-		return Func(self.text)
+		return Func(self.text, signature=self.signature)
 
 	@utils.simplify
 	def __neg__(self):
-		return Func('-' + self.text)
+		return Func('-' + self.text, signature=self.signature)
 
 	def __str__(self):
 		return '<{klass}: {txt}, vars: {vars}>'.format(
@@ -269,7 +702,28 @@ class Func(object):
 		self.tree.describe()
 		return ''
 
+	def __eq__(self, other):
+		""" Funcs are equal when their trees are structurally identical """
+		if not isinstance(other, Func):
+			return NotImplemented
+		return self.tree == other.tree
+
+	def __hash__(self):
+		return hash(self.tree)
+
+	@property
+	def digest(self):
+		"""
+		hex digest of the expression's structure, the same in every process and
+		on every machine
+		"""
+		return self.tree.digest.hex()
+
 	def __call__(self, *args, **kwargs):
+		if args and (self.signature is not None):
+			kwargs = self._bind_positional(args, kwargs)
+			args = ()
+
 		if len(self.variables) == 1:
 			return self._call_univariate(*args, **kwargs)
 		elif len(self.variables) > 1:
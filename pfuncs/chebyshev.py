@@ -0,0 +1,207 @@
+"""
+module for approximating expensive univariate Funcs on a fixed domain by
+Chebyshev series. The series are fitted adaptively - doubling the degree until
+the error on a dense grid is within tolerance, and splitting the domain into
+pieces when no single series of the maximum degree is - and evaluated by
+Clenshaw's recurrence, which costs a handful of multiplications per
+coefficient however many nodes the original tree had
+"""
+import bisect
+
+import numpy as np
+from numpy.polynomial import chebyshev as cheb
+
+from pfuncs.plan import (
+	MIN_BLOCK,
+	cache_size
+)
+
+
+# degree of the first series tried on each piece
+MIN_DEGREE = 16
+
+
+def clenshaw(coefficients, t):
+	"""
+	value at t (in [-1, 1]) of the Chebyshev series with 'coefficients', lowest
+	degree first. 't' can be a scalar or an array
+	"""
+	b1 = b2 = 0.0
+	for c in coefficients[:0:-1]:
+		b1, b2 = c + 2*t*b1 - b2, b1
+	return coefficients[0] + t*b1 - b2
+
+def clenshaw_array(coefficients, t, out=None):
+	"""
+	clenshaw for 1-d arrays, updating the recurrence in place a block at a
+	time. Blocks are sized so the four working arrays fill half the L2 cache.
+	Written into 'out', if it's provided
+	"""
+	if out is None:
+		out = np.empty_like(t)
+	n = len(t)
+	block = max(MIN_BLOCK, cache_size() // (2 * 4 * t.itemsize))
+	size = min(block, n)
+	b1, b2, tmp = np.empty(size), np.empty(size), np.empty(size)
+
+	for start in range(0, n, block):
+		stop = min(start + block, n)
+		m = stop - start
+		u, v, w = b1[:m], b2[:m], tmp[:m]
+		t2 = 2*t[start:stop]
+		u[...] = 0.0
+		v[...] = 0.0
+		for c in coefficients[:0:-1]:
+			# b2 <- c + 2*t*b1 - b2, then swap, so b1 holds the newest term
+			np.multiply(t2, u, out=w)
+			np.subtract(w, v, out=v)
+			v += c
+			u, v = v, u
+		np.multiply(t2, u, out=w)
+		w *= 0.5
+		w -= v
+		w += coefficients[0]
+		out[start:stop] = w
+	return out
+
+
+class Chebyshev(object):
+	"""
+	piecewise Chebyshev approximation of a univariate function. Piece i covers
+	[breakpoints[i], breakpoints[i+1]] with the series coefficients[i]. Calling
+	it evaluates scalars or arrays; points outside the domain give nan.
+	'max_error' is the largest absolute error found on a dense grid of the
+	domain when the approximation was fitted
+	"""
+
+	def __init__(self, breakpoints, coefficients, max_error):
+		self.breakpoints = np.asarray(breakpoints, dtype=float)
+		self.coefficients = [np.asarray(c, dtype=float) for c in coefficients]
+		self.max_error = max_error
+		self.domain = (float(self.breakpoints[0]), float(self.breakpoints[-1]))
+
+		# plain Python lists for the scalar path
+		self._breaks = [float(b) for b in self.breakpoints]
+		self._coefficients = [[float(c) for c in cs] for cs in self.coefficients]
+
+	@property
+	def degree(self):
+		""" highest degree of any piece """
+		return max(len(c) for c in self.coefficients) - 1
+
+	def _scalar(self, x):
+		a, b = self._breaks[0], self._breaks[-1]
+		if not (a <= x <= b):
+			return float('nan')
+		i = min(bisect.bisect_right(self._breaks, x), len(self._breaks)-1) - 1
+		lo, hi = self._breaks[i], self._breaks[i+1]
+		return clenshaw(self._coefficients[i], (2*x - lo - hi) / (hi - lo))
+
+	def __call__(self, x):
+		if np.ndim(x) == 0:
+			return self._scalar(x)
+
+		x = np.asarray(x, dtype=float)
+		shape = x.shape
+		x = x.ravel()
+		a, b = self.domain
+
+		if len(self.coefficients) == 1:
+			inside = (x >= a) & (x <= b)
+			t = (2*x - a - b) / (b - a)
+			result = clenshaw_array(self.coefficients[0], t)
+			if not inside.all():
+				result[~inside] = np.nan
+			return result.reshape(shape)
+
+		result = np.full(x.shape, np.nan)
+		pieces = np.searchsorted(self.breakpoints, x, side='right') - 1
+		# the right end of the domain belongs to the last piece
+		pieces[x == b] = len(self.coefficients) - 1
+
+		for i, coefficients in enumerate(self.coefficients):
+			mask = (pieces == i)
+			if not mask.any():
+				continue
+			lo, hi = self.breakpoints[i], self.breakpoints[i+1]
+			t = (2*x[mask] - lo - hi) / (hi - lo)
+			result[mask] = clenshaw_array(coefficients, t)
+		return result.reshape(shape)
+
+	def __str__(self):
+		return '<{klass}: {n} pieces on {domain}, degree {deg}, max error {err:.3g}>'.format(
+				klass=self.__class__.__name__,
+				n=len(self.coefficients),
+				domain=self.domain,
+				deg=self.degree,
+				err=self.max_error
+		)
+
+
+def _grid(a, b, n):
+	""" n points spread evenly over [a, b], for measuring errors """
+	return np.linspace(a, b, n)
+
+def _fit_piece(f, a, b, tol, max_degree):
+	"""
+	the lowest-degree series, doubling from MIN_DEGREE, whose error on [a, b]
+	is within 'tol'. Returns (coefficients, error, converged)
+	"""
+	def g(t):
+		return f(a + (t + 1)*(b - a)/2)
+
+	degree = min(MIN_DEGREE, max_degree)
+	while True:
+		coefficients = cheb.chebinterpolate(g, degree)
+
+		t = np.linspace(-1, 1, 4*(degree + 1))
+		exact = g(t)
+		if not np.all(np.isfinite(exact)):
+			msg = 'Function is not finite on [{}, {}]'
+			raise ValueError(msg.format(a, b))
+		error = np.max(np.abs(clenshaw(coefficients, t) - exact))
+
+		if error <= tol:
+			# drop trailing coefficients that are too small to matter
+			tail = np.cumsum(np.abs(coefficients[::-1]))
+			n_drop = int(np.searchsorted(tail, (tol - error)/2))
+			if n_drop:
+				coefficients = coefficients[:len(coefficients)-n_drop]
+			return coefficients, error, True
+		if degree >= max_degree:
+			return coefficients, error, False
+		degree = min(2*degree, max_degree)
+
+
+def fit(f, domain, tol=1e-10, max_degree=128, max_pieces=64):
+	"""
+	fit a piecewise Chebyshev approximation to 'f', a vectorized function of
+	one array, on 'domain' = (a, b) with an absolute error of at most 'tol'.
+	Pieces that can't reach 'tol' with 'max_degree' are halved, up to
+	'max_pieces' pieces; beyond that the approximation is returned anyway,
+	with its max_error showing how close it came
+	"""
+	a, b = map(float, domain)
+	if not (a < b):
+		raise ValueError('domain must be an interval (a, b) with a < b')
+
+	# (a, b) intervals still to fit, and the fitted (a, b, coefficients) pieces
+	pending = [(a, b)]
+	pieces = list()
+	while pending:
+		lo, hi = pending.pop()
+		coefficients, _, converged = _fit_piece(f, lo, hi, tol, max_degree)
+		n_pieces = len(pieces) + len(pending) + 1
+		if converged or (n_pieces >= max_pieces):
+			pieces.append((lo, hi, coefficients))
+		else:
+			mid = (lo + hi)/2
+			pending.extend([(mid, hi), (lo, mid)])
+
+	pieces.sort(key=lambda p: p[0])
+	breakpoints = [p[0] for p in pieces] + [b]
+	approximation = Chebyshev(breakpoints, [p[2] for p in pieces], 0.0)
+
+	x = _grid(a, b, max(10**4, 8*len(pieces)*(approximation.degree + 1)))
+	approximation.max_error = float(np.max(np.abs(approximation(x) - f(x))))
+	return approximation
@@ -0,0 +1,340 @@
+"""
+module for generating Python source from Funcs ahead of time. emit_module writes
+a plain module with one straight-line function per Func (and, optionally, per
+derivative), so deployed code can import and call them without the lexer,
+parser or any visitor. Subexpressions appearing more than once in a Func are
+computed once, into a local variable, and the built-ins are called directly:
+through NumPy & SciPy, as the Interpreter calls them, or through the math
+module, for scalars only
+"""
+import itertools
+import keyword
+import os
+
+import pfuncs.ast as ast
+import pfuncs.callable as call
+import pfuncs.functions as fnc
+import pfuncs.utils as utils
+
+from pfuncs.generic import ABCVisitor
+from pfuncs.base import (
+	PLUS,
+	MINUS,
+	MUL,
+	DIV,
+	POWER
+)
+
+
+NUMPY 	= 'numpy'
+MATH 	= 'math'
+LIBRARIES = (NUMPY, MATH)
+
+OPERATORS = {
+	PLUS: 	'+',
+	MINUS: 	'-',
+	MUL: 	'*',
+	DIV: 	'/',
+	POWER: 	'**'
+}
+
+# pfuncs built-in: (call template, module-level setup). The arguments are
+#	formatted into the template, separated by commas. The same values the
+#	Interpreter computes, with the same functions
+NUMPY_FUNCTIONS = {
+	fnc.EXP: 		('_exp({})', 'from numpy import exp as _exp'),
+	fnc.LOG: 		('_log({})', 'from numpy import log as _log'),
+	fnc.LN: 		('_log({})', 'from numpy import log as _log'),
+	fnc.LOG10: 		('_log10({})', 'from numpy import log10 as _log10'),
+	fnc.SQRT: 		('_sqrt({})', 'from numpy import sqrt as _sqrt'),
+	fnc.ABS: 		('_abs({})', 'from numpy import abs as _abs'),
+	fnc.SIGN: 		('_sign({})', 'from numpy import sign as _sign'),
+	fnc.SIN: 		('_sin({})', 'from numpy import sin as _sin'),
+	fnc.COS: 		('_cos({})', 'from numpy import cos as _cos'),
+	fnc.TAN: 		('_tan({})', 'from numpy import tan as _tan'),
+	fnc.ASIN: 		('_asin({})', 'from numpy import arcsin as _asin'),
+	fnc.ACOS: 		('_acos({})', 'from numpy import arccos as _acos'),
+	fnc.ATAN: 		('_atan({})', 'from numpy import arctan as _atan'),
+	fnc.FLOOR: 		('_floor({})', 'from numpy import floor as _floor'),
+	fnc.CEIL: 		('_ceil({})', 'from numpy import ceil as _ceil'),
+	fnc.ERF: 		('_erf({})', 'from scipy.special import erf as _erf'),
+	fnc.MAX: 		(
+		'_reduce(_maximum, ({},))',
+		'from functools import reduce as _reduce\nfrom numpy import maximum as _maximum'
+	),
+	fnc.MIN: 		(
+		'_reduce(_minimum, ({},))',
+		'from functools import reduce as _reduce\nfrom numpy import minimum as _minimum'
+	),
+	fnc.NORMCDF: 	('_norm.cdf({})', 'from scipy.stats import norm as _norm'),
+	fnc.NORMPDF: 	('_norm.pdf({})', 'from scipy.stats import norm as _norm')
+}
+
+_SIGN = '''def _sign(x):
+	if x > 0:
+		return 1.0
+	if x < 0:
+		return -1.0
+	return x * 0.0'''
+
+_NORMCDF = '''def _normcdf(x, mu, sigma):
+	return 0.5 * _math.erfc((mu - x) / (sigma * _math.sqrt(2.0)))'''
+
+_NORMPDF = '''def _normpdf(x, mu, sigma):
+	z = (x - mu) / sigma
+	return _math.exp(-0.5 * z * z) / (sigma * _math.sqrt(2.0 * _math.pi))'''
+
+# as NUMPY_FUNCTIONS, for the math library. Domain errors raise ValueError
+#	rather than returning nan
+MATH_FUNCTIONS = {
+	fnc.EXP: 		('_exp({})', 'from math import exp as _exp'),
+	fnc.LOG: 		('_log({})', 'from math import log as _log'),
+	fnc.LN: 		('_log({})', 'from math import log as _log'),
+	fnc.LOG10: 		('_log10({})', 'from math import log10 as _log10'),
+	fnc.SQRT: 		('_sqrt({})', 'from math import sqrt as _sqrt'),
+	fnc.ABS: 		('abs({})', None),
+	fnc.SIGN: 		('_sign({})', _SIGN),
+	fnc.SIN: 		('_sin({})', 'from math import sin as _sin'),
+	fnc.COS: 		('_cos({})', 'from math import cos as _cos'),
+	fnc.TAN: 		('_tan({})', 'from math import tan as _tan'),
+	fnc.ASIN: 		('_asin({})', 'from math import asin as _asin'),
+	fnc.ACOS: 		('_acos({})', 'from math import acos as _acos'),
+	fnc.ATAN: 		('_atan({})', 'from math import atan as _atan'),
+	fnc.FLOOR: 		('float(_floor({}))', 'from math import floor as _floor'),
+	fnc.CEIL: 		('float(_ceil({}))', 'from math import ceil as _ceil'),
+	fnc.ERF: 		('_erf({})', 'from math import erf as _erf'),
+	fnc.MAX: 		('max({})', None),
+	fnc.MIN: 		('min({})', None),
+	fnc.NORMCDF: 	('_normcdf({})', _NORMCDF),
+	fnc.NORMPDF: 	('_normpdf({})', _NORMPDF)
+}
+
+FUNCTIONS = {
+	NUMPY: 	NUMPY_FUNCTIONS,
+	MATH: 	MATH_FUNCTIONS
+}
+
+# builtins called by generated code, which functions and variables can't shadow
+BUILTINS = ('abs', 'max', 'min', 'float')
+
+
+def repeated_subtrees(tree):
+	"""
+	the distinct composite subtrees of 'tree' that are operands more than once
+	- whether shared by several parents or written out several times -
+	children before parents. Subtrees are told apart by their digests
+	"""
+	uses = dict()
+	nodes = dict()
+	order = list()
+	stack = [(tree, False)]
+	while stack:
+		node, expanded = stack.pop()
+		if expanded:
+			order.append(node.digest)
+			continue
+
+		key = node.digest
+		uses[key] = uses.get(key, 0) + 1
+		if uses[key] == 1:
+			nodes[key] = node
+			stack.append((node, True))
+			children = [
+				c.expr if isinstance(c, ast.Arg) else c
+				for c in ast.iter_children(node)
+			]
+			stack.extend((c, False) for c in reversed(children))
+
+	return [nodes[k] for k in order if (uses[k] > 1) and nodes[k]._fields]
+
+
+class FunctionWriter(ABCVisitor):
+	"""
+	AST walker that writes the tree as the body of a Python function: one
+	assignment to a local per repeated subtree (see repeated_subtrees), then
+	a return statement. 'functions' maps the built-ins to their call templates,
+	and 'setup' collects the module-level lines the calls need
+	"""
+
+	local_prefix = '_t'
+
+	def __init__(self, tree, functions):
+		super().__init__(tree)
+		self.functions = functions
+		self.setup = list()
+		# digest: name of the local holding the subtree
+		self.locals = dict()
+		self.lines = self._write()
+
+	def _names(self):
+		""" names for locals that don't clash with any variable """
+		n = 0
+		while True:
+			name = self.local_prefix + str(n)
+			if name not in self.tree.free:
+				yield name
+			n += 1
+
+	def _write(self):
+		lines = list()
+		names = self._names()
+		for node in repeated_subtrees(self.tree):
+			name = next(names)
+			lines.append('{} = {}'.format(name, type(self).visit(self, node)))
+			self.locals[node.digest] = name
+		lines.append('return {}'.format(self.visit(self.tree)))
+		return lines
+
+	def visit(self, node):
+		name = self.locals.get(node.digest)
+		if name is not None:
+			return name
+		return super().visit(node)
+
+	def _call(self, name, args):
+		template, setup = self.functions[name]
+		if (setup is not None) and (setup not in self.setup):
+			self.setup.append(setup)
+		return template.format(', '.join(args))
+
+	def visit_BinaryOp(self, node):
+		return '({left} {op} {right})'.format(
+				left=self.visit(node.left),
+				op=OPERATORS[node.op.type],
+				right=self.visit(node.right)
+		)
+
+	def visit_UnaryOp(self, node):
+		return '({op}{expr})'.format(
+				op=OPERATORS[node.op.type],
+				expr=self.visit(node.expr)
+		)
+
+	def visit_Num(self, node):
+		try:
+			value = float(node.value)
+		except TypeError:
+			# arrays substituted by the Curryer
+			raise TypeError('Cannot emit the constant {}'.format(repr(node.value)))
+
+		if value != value:
+			return '_math.nan'
+		elif value in (float('inf'), float('-inf')):
+			return '_math.inf' if value > 0 else '(-_math.inf)'
+		elif value < 0:
+			return '({})'.format(repr(value))
+		return repr(value)
+
+	def visit_Var(self, node):
+		return node.value
+
+	def visit_Function(self, node):
+		return self._call(node.value, [self.visit(node.expr)])
+
+	def visit_MultivarFunction(self, node):
+		return self._call(node.value, [self.visit(arg) for arg in node.arguments])
+
+	def visit_Arg(self, node):
+		return self.visit(node.expr)
+
+
+def _check_name(name, kind):
+	""" raise a ValueError unless 'name' can be used in generated code """
+	if (
+		(not isinstance(name, str))
+		or (not name.isidentifier())
+		or keyword.iskeyword(name)
+		or name.startswith('_')
+		or (name in BUILTINS)
+	):
+		msg = '{} {} is not a valid name for generated code'
+		raise ValueError(msg.format(kind, repr(name)))
+
+
+def _expand(funcs, order):
+	"""
+	dict of function name: Func, with every Func of 'funcs' followed by its
+	partial derivatives up to 'order', e.g. 'f_dx' and 'f_dx_dy'. Funcs 
+	without a signature are given their variables as one, so they and their
+	derivatives (which keep it) take the same arguments
+	"""
+	expanded = dict()
+	for name, func in funcs.items():
+		_check_name(name, 'Function name')
+		func = utils.ensure_func(func)
+		if func.signature is None:
+			func = call.Func(tree=func.tree, signature=func.variables)
+		expanded[name] = func
+
+		for n in range(1, order+1):
+			for key in itertools.combinations_with_replacement(func.variables, n):
+				d_name = '{}_d{}'.format(name, '_d'.join(key))
+				if (d_name in expanded) or (d_name in funcs):
+					msg = 'Derivative name {} clashes with another function'
+					raise ValueError(msg.format(repr(d_name)))
+				try:
+					derivative = func.derivative[key if n > 1 else key[0]]
+				except NotImplementedError:
+					msg = 'Cannot differentiate {} (a built-in has no derivative)'
+					raise NotImplementedError(msg.format(repr(name))) from None
+				expanded[d_name] = derivative
+	return expanded
+
+
+def emit_source(funcs, derivatives=0, library=NUMPY):
+	"""
+	source of a Python module with one function per item of the 'funcs' dict
+	of name: Func (or parse-able string). Functions take the variables
+	positionally, in the order of the Func's signature, or of its variables.
+	With 'derivatives', the partial derivatives up to that order are written
+	too, named like 'f_dx' and 'f_dx_dy'. 'library' is 'numpy' (arrays and
+	scalars, with the Interpreter's results) or 'math' (scalars only, and
+	faster for them)
+	"""
+	if library not in LIBRARIES:
+		raise ValueError('library must be one of {}'.format(LIBRARIES))
+	funcs = _expand(funcs, int(derivatives))
+
+	setup = list()
+	bodies = list()
+	for name, func in funcs.items():
+		for arg in func.signature:
+			_check_name(arg, 'Variable')
+		writer = FunctionWriter(func.tree, FUNCTIONS[library])
+		setup.extend(line for line in writer.setup if line not in setup)
+
+		lines = ['def {}({}):'.format(name, ', '.join(func.signature))]
+		lines.append('\t""" {} """'.format(func.text.replace('\\', '\\\\')))
+		lines.extend('\t' + line for line in writer.lines)
+		bodies.append('\n'.join(lines))
+
+	imports = [line for line in setup if line.startswith('from ')]
+	helpers = [line for line in setup if line not in imports]
+	header = [
+		'"""',
+		'module generated by pfuncs.codegen from {} Funcs, using {}. Do not edit'.format(
+			len(funcs),
+			library
+		),
+		'"""',
+		'import math as _math',
+		''
+	] + imports + [
+		'',
+		'__all__ = {}'.format(repr(list(funcs)))
+	]
+	return '\n\n\n'.join(['\n'.join(header)] + helpers + bodies) + '\n'
+
+
+def emit_module(funcs, path, derivatives=0, library=NUMPY):
+	"""
+	write the module of emit_source (see there for the arguments) to 'path',
+	through a temporary file renamed into place, so it's never imported half
+	written. Returns 'path'
+	"""
+	source = emit_source(funcs, derivatives=derivatives, library=library)
+	tmp = '{}.tmp{}'.format(path, os.getpid())
+	with open(tmp, 'w') as f:
+		f.write(source)
+	os.replace(tmp, path)
+	return path
@@ -4,6 +4,7 @@ by pfuncs. Both Parser and Interpreter inherit most of the their functionality
 from the analogous objects in pfuncs.algebra
 """
 import copy
+import functools
 import numpy as np
 import scipy.stats as stats
 from scipy.special import erf
@@ -73,6 +74,18 @@ MULTIVAR_FUNCTIONS = {
 }
 
 
+def maximum(*args):
+	"""
+	elementwise maximum of the arguments, broadcast against each other, so
+	max(x, y) of arrays is the array of each row's maximum
+	"""
+	return functools.reduce(np.maximum, args)
+
+def minimum(*args):
+	""" elementwise minimum of the arguments, as maximum() """
+	return functools.reduce(np.minimum, args)
+
+
 class Parser(alg.Parser):
 	""" 
 	The pfuncs.functions.Parser adds a call() method between the exponent() and 
@@ -209,10 +222,10 @@ class Interpreter(alg.Interpreter):
 		args = node.arguments
 
 		if f == MAX:
-			return np.amax([self.visit(arg) for arg in args])
+			return maximum(*[self.visit(arg) for arg in args])
 
 		if f == MIN:
-			return np.amin([self.visit(arg) for arg in args])
+			return minimum(*[self.visit(arg) for arg in args])
 
 		if f == NORMCDF:
 			return stats.norm.cdf(
@@ -0,0 +1,130 @@
+"""
+module for parsing large numbers of formulas, one per line, in a pool of
+processes. Workers lex and parse batches of lines and send back each tree in
+the compact form of pfuncs.serialize; a line that fails to parse is reported
+as a LineError without affecting the rest of its batch. Only a few batches are
+in flight at a time, so the input is streamed rather than read up front
+"""
+import collections
+import itertools
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pfuncs.callable as call
+import pfuncs.serialize as serialize
+
+
+# lines sent to a worker at once
+DEFAULT_BATCH = 1000
+
+
+class LineError(object):
+	""" a line of the input that couldn't be parsed """
+
+	def __init__(self, lineno, text, message):
+		self.lineno = lineno
+		self.text = text
+		self.message = message
+
+	def __str__(self):
+		return 'line {lineno}: {text!r}: {message}'.format(
+				lineno=self.lineno,
+				text=self.text,
+				message=self.message
+		)
+
+	def __repr__(self):
+		return '<{klass}({txt})>'.format(
+				klass=self.__class__.__name__,
+				txt=self.__str__()
+		)
+
+
+def _parse_batch(lines):
+	"""
+	worker function: parse each line, returning (True, compact tree) or
+	(False, error message) pairs in the same order
+	"""
+	parsed = list()
+	for text in lines:
+		try:
+			tree = call.Func(text).tree
+			parsed.append((True, serialize.encode(tree)))
+		except Exception as e:
+			parsed.append((False, '{}: {}'.format(type(e).__name__, e)))
+	return parsed
+
+def _read_lines(source):
+	""" lines of the file at 'source', if it's a path, or 'source' itself """
+	if isinstance(source, (str, os.PathLike)):
+		with open(source) as f:
+			for line in f:
+				yield line.strip()
+	else:
+		for line in source:
+			yield line.strip()
+
+def _batches(lines, size):
+	lines = iter(lines)
+	while True:
+		batch = list(itertools.islice(lines, size))
+		if not batch:
+			return
+		yield batch
+
+
+def iter_load(source, workers=None, batch=DEFAULT_BATCH):
+	"""
+	yields a (line number, Func, LineError) triple for every line of 'source',
+	a path or an iterable of strings, in input order. One of Func and LineError
+	is None. With 'workers' of 1, lines are parsed in this process; otherwise
+	in a pool of that many processes (by default, one per core)
+	"""
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	lineno = 0
+	batches = _batches(_read_lines(source), batch)
+
+	def unpack(lines, parsed):
+		nonlocal lineno
+		for text, (ok, payload) in zip(lines, parsed):
+			lineno += 1
+			if ok:
+				yield lineno, call.Func(tree=serialize.decode(payload)), None
+			else:
+				yield lineno, None, LineError(lineno, text, payload)
+
+	if workers < 2:
+		for lines in batches:
+			yield from unpack(lines, _parse_batch(lines))
+		return
+
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		# two batches per worker keeps them all busy while bounding memory
+		pending = collections.deque()
+		for lines in batches:
+			pending.append((lines, pool.submit(_parse_batch, lines)))
+			if len(pending) >= 2*workers:
+				lines, future = pending.popleft()
+				yield from unpack(lines, future.result())
+		while pending:
+			lines, future = pending.popleft()
+			yield from unpack(lines, future.result())
+
+
+def load_many(source, workers=None, batch=DEFAULT_BATCH):
+	"""
+	parse every line of 'source' (a path or an iterable of strings) into a
+	Func, using a pool of 'workers' processes. Returns a (funcs, errors) pair:
+	'funcs' has one entry per line, in input order, which is None for lines
+	that failed to parse; 'errors' has a LineError for each of those lines
+	"""
+	funcs = list()
+	errors = list()
+	for _, func, error in iter_load(source, workers=workers, batch=batch):
+		funcs.append(func)
+		if error is not None:
+			errors.append(error)
+	return funcs, errors
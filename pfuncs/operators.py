@@ -6,6 +6,9 @@ them in some way
 import copy
 
 import pfuncs.ast as ast 
+import pfuncs.cache as cache
+import pfuncs.stats as stats
+import pfuncs.serialize as serialize
 import pfuncs.callable as call
 import pfuncs.functions as fnc
 
@@ -31,17 +34,35 @@ class Curryer(ABCVisitor):
 	"""
 	class that implements currying of multivariate functions. Walks over the 
 	entire Abstract Syntax Tree, and every time it hits a Var node that 
-	represents a variable in the scope, replaces it with the argument
+	represents a variable in the scope, replaces it with the argument. Every
+	occurrence of a variable is replaced with the same node, so substituting
+	a Func (or string) shares its tree rather than copying it, and composing
+	Funcs over and over grows the tree linearly rather than exponentially
 	"""
 
 	def __init__(self, tree, scope):
 		self.tree = copy.deepcopy(tree)
 		self.scope = copy.deepcopy(scope)
+		self.names = frozenset(self.scope.variables)
+		# variable name: the node substituted for it
+		self.substitutes = dict()
+		# ids of the nodes already walked
+		self._visited = set()
 
 	def curry(self):
 		self.visit(self.tree)
+		# substitutions change the free variables of every node above them
+		ast.refresh(self.tree)
 		return call.Func(tree=self.tree)
 
+	def visit(self, node):
+		# subtrees without any of the substituted variables are left as they 
+		#	are, and shared subtrees are only walked once
+		if self.names.isdisjoint(node.free) or (id(node) in self._visited):
+			return
+		self._visited.add(id(node))
+		super().visit(node)
+
 	def maybe_substitute(self, node, attr):
 		attribute = getattr(node, attr)
 		if isinstance(attribute, ast.Var):
@@ -51,19 +72,28 @@ class Curryer(ABCVisitor):
 	def substitute(self, node):
 		""" 
 		four cases for substituting: Func obj, or parse-able string, 
-		number or ndarray-type object 
+		number or ndarray-type object. The node is built once per variable
 		"""
 		var_name = node.value 
+		try:
+			return self.substitutes[var_name]
+		except KeyError:
+			pass
 		var_value = self.scope.retrieve(var_name)
 
 		if isinstance(var_value, call.Func):
-			return var_value.tree
+			sub = var_value.tree
 		elif isinstance(var_value, str):
 			sub_func = call.Func(var_value)
-			return sub_func.tree
+			sub = sub_func.tree
 		else:
 			token = Token(NUMBER, var_value)
-			return ast.Num(token)
+			sub = ast.Num(token)
+		self.substitutes[var_name] = sub
+		# substituted trees are never walked, or variables they share names
+		#	with would be substituted into themselves
+		self._visited.add(id(sub))
+		return sub
 
 	def visit_BinaryOp(self, node):
 		self.visit(node.left)
@@ -82,13 +112,13 @@ class Curryer(ABCVisitor):
 		pass
 
 	def visit_Function(self, node):
-		self.maybe_substitute(node, 'expr')
 		self.visit(node.expr)
+		self.maybe_substitute(node, 'expr')
 
 	def visit_MultivarFunction(self, node):
 		for arg in node.arguments:
-			self.maybe_substitute(arg, 'expr')
 			self.visit(arg)
+			self.maybe_substitute(arg, 'expr')
 			
 	def visit_Arg(self, node):
 		self.visit(node.expr)
@@ -97,41 +127,60 @@ class Curryer(ABCVisitor):
 class _Jacobian(ABCVisitor, fnc.FunctionDerivative):
 	"""
 	class the implements derivatives of functions. Walks over the entire
-	Abstract Syntax Tree
+	Abstract Syntax Tree. The rules rewrite shallow copies of the nodes they
+	differentiate, so the nodes of the original tree - which the derivative, 
+	and other trees, may share - are never modified. Derivatives of subtrees 
+	are memoized by their digests, so a subtree shared by several parents, or 
+	repeated, is differentiated once, and its derivative is shared in turn
 	"""
 
 	def __init__(self, tree, diff_var):
-		self.tree = self._copy(tree)
 		self.diff_var = diff_var
+		# digest of a subtree: its derivative
+		self.derivatives = dict()
 
-		self.visit(self.tree)
+		self.tree = self._derivative(tree)
+		# the rules rewrite nodes in place, below their parents' children
+		ast.refresh(self.tree)
 
 	def _is_constant(self, node):
 		return is_constant(node, self.diff_var)
 
 	def _copy(self, tree):
-		return copy.deepcopy(tree)
+		return copy.copy(tree)
+
+	def _derivative(self, node):
+		""" a new tree that's the derivative of 'node' """
+		key = node.digest
+		try:
+			return self.derivatives[key]
+		except KeyError:
+			pass
+
+		if self._is_constant(node):
+			# covers numbers and other variables, and skips whole subtrees
+			#	without diff_var
+			prime = ast.Num(Token(NUMBER, 0))
+		elif isinstance(node, ast.Var):
+			prime = ast.Num(Token(NUMBER, 1))
+		elif isinstance(node, ast.Function):
+			prime = self._chain_rule(node)
+		elif isinstance(node, ast.MultivarFunction):
+			raise NotImplementedError
+		else:
+			prime = self._copy(node)
+			self.visit(prime)
+
+		self.derivatives[key] = prime
+		return prime
 
 	def maybe_singleton(self, node, attr):
 		"""
-		Checks if node's attr attribute if it is a singleton - a Var, Num or 
-		Function node. If so, take the derivative of it. If not, walk the 
-		attribute as normal
+		replaces node's attr attribute with its derivative. Singletons - Var, 
+		Num or Function nodes - and subtrees constant with respect to diff_var 
+		are differentiated directly; other subtrees are walked as normal
 		"""
-		attribute = getattr(node, attr)
-		if isinstance(attribute, ast.Var):
-			if attribute.value == self.diff_var:
-				setattr(node, attr, ast.Num(Token(NUMBER, 1)))
-			else:
-				setattr(node, attr, ast.Num(Token(NUMBER, 0)))
-		elif isinstance(attribute, ast.Num):
-			setattr(node, attr, ast.Num(Token(NUMBER, 0)))
-		elif isinstance(attribute, ast.Function):
-			setattr(node, attr, self._chain_rule(attribute))
-		elif isinstance(attribute, ast.MultivarFunction):
-			raise NotImplementedError
-		else:
-			self.visit(attribute)
+		setattr(node, attr, self._derivative(getattr(node, attr)))
 
 	def _new_binary(self, left, op, right):
 		""" utility function used in the _*_rules """
@@ -253,18 +302,25 @@ class _Jacobian(ABCVisitor, fnc.FunctionDerivative):
 			)
 
 		elif (not base_const) and expo_const:
+			# second copy is used to evaluate the f' term of the chain rule
 			node_copy = self._copy(node)
+			prime_copy = self._copy(node)
+			self.maybe_singleton(prime_copy, 'left')
 
 			node.left = node_copy.right
 			node.op = Token(MUL, '*')
 			node.right = self._new_binary(
-				left=node_copy.left,
-				op=Token(POWER, '**'),
-				right=self._new_binary(
-					left=node_copy.right,
-					op=Token(MINUS, '-'),
-					right=ast.Num(Token(NUMBER, 1))
-				)
+				left=self._new_binary(
+					left=node_copy.left,
+					op=Token(POWER, '**'),
+					right=self._new_binary(
+						left=node_copy.right,
+						op=Token(MINUS, '-'),
+						right=ast.Num(Token(NUMBER, 1))
+					)
+				),
+				op=Token(MUL, '*'),
+				right=prime_copy.left
 			)
 
 		elif (not base_const) and (not expo_const):
@@ -276,7 +332,7 @@ class _Jacobian(ABCVisitor, fnc.FunctionDerivative):
 			self.maybe_singleton(prime_copy, 'right')
 
 			f, g = node_copy.left, node_copy.right
-			fp, gp = prime_copy.left, node_copy.right
+			fp, gp = prime_copy.left, prime_copy.right
 
 			lnf = ast.Function(
 				token=Token(fnc.FUNCTION, fnc.LN),
@@ -322,68 +378,63 @@ class _Jacobian(ABCVisitor, fnc.FunctionDerivative):
 		""" Check if singleton variable; visit child nodes if not """
 		self.maybe_singleton(node, 'expr')
 
-	def visit_Num(self, node):
-		""" 
-		if this node is reached it means the entire tree is just the one 
-		number node. In larger trees, the maybe_singleton method handles
-		numbers within binary & unary operations, and expressions
-		"""
-		self.tree = ast.Num(Token(NUMBER, 0))
-		
-	def visit_Var(self, node):
-		""" 
-		if this node is reached it means the entire tree is just the one 
-		variable node. In larger trees, the maybe_singleton method handles
-		variables within binary & unary operations, and expressions
-		"""
-		if node.value == self.diff_var:
-			self.tree = ast.Num(Token(NUMBER ,1))
-		else:
-			self.tree = ast.Num(Token(NUMBER, 0))
-
-	def visit_Function(self, node):
-		""" 
-		if this node is reached it means the entire tree is just the one 
-		function node. In larger trees, the maybe_singleton method handles
-		functions within binary & unary operations, and expressions
-		"""
-		self.tree = self._chain_rule(node)
-
-	def visit_MultivarFunction(self, node):
-		""" 
-		if this node is reached it means the entire tree is just the one 
-		multivarvunction node. In larger trees, the maybe_singleton method handles
-		multivarfunctions within binary & unary operations, and expressions
-		"""
-		raise NotImplementedError
-
 
 class Differential(object):
 	"""
 	Class that's instantiated when the .d or .derivative property of a Funcs
-	instance is accessed
+	instance is accessed. With the on-disk cache enabled, derivatives (other
+	than those evaluated at a point) are read from it when they've been taken
+	before, keyed by the digest of the tree. Derivatives take 'signature', 
+	that of the Func they're taken of
 	"""
 
-	def __init__(self, tree):
+	def __init__(self, tree, signature=None):
 		self.tree = tree
+		self.signature = signature
 
-	@simplify
 	def __getitem__(self, key):
+		disk = cache.get_cache()
+		variables = (key,) if isinstance(key, str) else key
+		# derivatives at a point, and keys _differentiate doesn't take, go
+		#	straight to it
+		if (disk is None) or not (
+			isinstance(variables, tuple)
+			and all(isinstance(v, str) for v in variables)
+		):
+			return self._differentiate(key)
+
+		entry = ('derivative', self.tree.digest.hex()) + variables
+		code = disk.get(entry)
+		if code is not None:
+			try:
+				return call.Func(tree=serialize.decode(code), signature=self.signature)
+			except (KeyError, IndexError, TypeError, ValueError):
+				# not an entry this version writes; differentiated as usual
+				pass
+
+		f_prime = self._differentiate(key)
+		if isinstance(f_prime, call.Func):
+			disk.put(entry, serialize.encode(f_prime.tree))
+		return f_prime
+
+	@simplify
+	@stats.timed('Differential.__getitem__')
+	def _differentiate(self, key):
 		if isinstance(key, str):
 			f_prime = _Jacobian(self.tree, key)
-			return call.Func(tree=f_prime.tree)
+			return call.Func(tree=f_prime.tree, signature=self.signature)
 
 		elif isinstance(key, tuple):
 			tree = copy.deepcopy(self.tree)
 			for k in reversed(key):
 				dfdk = _Jacobian(tree, k)
 				tree = dfdk.tree
-			return call.Func(tree=tree)
+			return call.Func(tree=tree, signature=self.signature)
 
 		elif isinstance(key, dict):
 			tree = copy.deepcopy(self.tree)
 			for k in reversed(tuple(key.keys())):
 				dfdk = _Jacobian(tree, k)
 				tree = dfdk.tree
-			f_prime = call.Func(tree=tree)
+			f_prime = call.Func(tree=tree, signature=self.signature)
 			return f_prime(**key)
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+module for minimizing Funcs over some of their variables. The gradient (and,
+for Newton's method, the Hessian) is built once and compiled together with
+the objective into a CompiledBatch, so every step of the optimizer costs one
+call of that batch, however many variables there are, and the optimizer itself
+works on flat NumPy vectors
+"""
+import numpy as np
+
+import pfuncs.batch as batch
+import pfuncs.utils as utils
+
+
+LBFGS = 'lbfgs'
+NEWTON = 'newton'
+METHODS = (LBFGS, NEWTON)
+
+# sufficient decrease constant of the backtracking line search
+ARMIJO = 1e-4
+
+
+class Minimum(object):
+	"""
+	the result of minimize: 'x' holds the minimizing value of each variable by
+	name, 'fun' the objective there and 'gradient' its gradient, in the order
+	of 'x'. 'converged' is whether the gradient met the tolerance, and
+	'evaluations' counts the calls of the compiled objective
+	"""
+
+	def __init__(self, x, fun, gradient, iterations, evaluations, converged):
+		self.x = x
+		self.fun = fun
+		self.gradient = gradient
+		self.iterations = iterations
+		self.evaluations = evaluations
+		self.converged = converged
+
+	def __str__(self):
+		return '<{klass}: f = {fun:.6g} at {x}, {status} after {it} iterations>'.format(
+				klass=self.__class__.__name__,
+				fun=self.fun,
+				x=self.x,
+				status='converged' if self.converged else 'not converged',
+				it=self.iterations
+		)
+
+
+class Objective(object):
+	"""
+	the objective 'func' as a function of the flat vector of 'variables', with
+	'params' fixed. Calling it returns (value, gradient), or (value, gradient,
+	Hessian) with 'hessian', from one evaluation of a CompiledBatch
+	"""
+
+	def __init__(self, func, variables, params, hessian=False):
+		self.variables = tuple(variables)
+		self.params = params
+		self.hessian = hessian
+		self.evaluations = 0
+
+		funcs = {(): func}
+		for i, var in enumerate(self.variables):
+			funcs[(i,)] = func.derivative[var]
+		if hessian:
+			for i in range(len(self.variables)):
+				for j in range(i, len(self.variables)):
+					funcs[(i, j)] = funcs[(i,)].derivative[self.variables[j]]
+		self.compiled = batch.compile_many(funcs)
+
+		n = len(self.variables)
+		self._gradient = [(i,) for i in range(n)]
+		self._hessian = [(i, j) for i in range(n) for j in range(i, n)]
+		self._upper = np.triu_indices(n)
+
+	def __call__(self, x):
+		inputs = dict(zip(self.variables, x.tolist()))
+		inputs.update(self.params)
+		values = self.compiled(**inputs)
+		self.evaluations += 1
+
+		f = float(values[()])
+		g = np.array([values[k] for k in self._gradient], dtype=float)
+		if not self.hessian:
+			return f, g
+
+		h = np.empty((len(x), len(x)))
+		h[self._upper] = [values[k] for k in self._hessian]
+		h.T[self._upper] = h[self._upper]
+		return f, g, h
+
+
+def _line_search(objective, x, f, g, p, step=1.0, maxiter=50):
+	"""
+	backtracking search along 'p' for a step satisfying the Armijo condition.
+	Returns (step, x, f, g) at the accepted point, or None if there isn't one
+	"""
+	slope = g @ p
+	if not (slope < 0):
+		return None
+	for _ in range(maxiter):
+		x_new = x + step*p
+		f_new, g_new = objective(x_new)[:2]
+		if np.isfinite(f_new) and (f_new <= f + ARMIJO*step*slope):
+			return step, x_new, f_new, g_new
+		step /= 2
+	return None
+
+
+def _lbfgs(objective, x, gtol, maxiter, memory):
+	""" limited-memory BFGS, with the two-loop recursion """
+	f, g = objective(x)
+	s_history, y_history = list(), list()
+
+	for it in range(maxiter):
+		if np.max(np.abs(g), initial=0) <= gtol:
+			return x, f, g, it, True
+
+		# p = -H g, with H the inverse Hessian approximation
+		q = g.copy()
+		alphas = list()
+		for s, y in zip(reversed(s_history), reversed(y_history)):
+			alpha = (s @ q) / (y @ s)
+			q -= alpha*y
+			alphas.append(alpha)
+		if s_history:
+			s, y = s_history[-1], y_history[-1]
+			q *= (s @ y) / (y @ y)
+		else:
+			q /= max(1.0, np.linalg.norm(g))
+		for (s, y), alpha in zip(zip(s_history, y_history), reversed(alphas)):
+			beta = (y @ q) / (y @ s)
+			q += (alpha - beta)*s
+		p = -q
+
+		found = _line_search(objective, x, f, g, p)
+		if found is None:
+			# start again from steepest descent before giving up
+			if not s_history:
+				return x, f, g, it, False
+			s_history, y_history = list(), list()
+			continue
+		_, x_new, f_new, g_new = found
+
+		s, y = x_new - x, g_new - g
+		if s @ y > 1e-12 * np.linalg.norm(s) * np.linalg.norm(y):
+			s_history.append(s)
+			y_history.append(y)
+			if len(s_history) > memory:
+				del s_history[0], y_history[0]
+		x, f, g = x_new, f_new, g_new
+
+	return x, f, g, maxiter, np.max(np.abs(g), initial=0) <= gtol
+
+
+def _newton(objective, x, gtol, maxiter):
+	"""
+	Newton's method, shifting the Hessian's diagonal until it's positive
+	definite where it isn't
+	"""
+	f, g, h = objective(x)
+	identity = np.eye(len(x))
+
+	for it in range(maxiter):
+		if np.max(np.abs(g), initial=0) <= gtol:
+			return x, f, g, it, True
+		if not np.all(np.isfinite(h)):
+			# no shift makes a Hessian with nan or inf in it positive definite
+			return x, f, g, it, False
+
+		shift = 0.0
+		while True:
+			try:
+				factor = np.linalg.cholesky(h + shift*identity)
+				break
+			except np.linalg.LinAlgError:
+				scale = np.max(np.abs(np.diag(h)), initial=0)
+				shift = max(2*shift, 1e-3*scale, 1e-8)
+		p = -np.linalg.solve(factor.T, np.linalg.solve(factor, g))
+
+		found = _line_search(objective, x, f, g, p)
+		if found is None:
+			return x, f, g, it, False
+		_, x, _, _ = found
+		f, g, h = objective(x)
+
+	return x, f, g, maxiter, np.max(np.abs(g), initial=0) <= gtol
+
+
+def minimize(
+	func,
+	x0,
+	method=LBFGS,
+	gtol=1e-8,
+	maxiter=200,
+	memory=10,
+	**params
+):
+	"""
+	minimize 'func' over the variables in the 'x0' dict of starting values,
+	with a value in 'params' for each of its other variables. 'method' is
+	'lbfgs' (limited-memory BFGS, keeping the last 'memory' steps) or 'newton'
+	(Newton's method, with the Hessian shifted where it isn't positive
+	definite); both search backtracking along each direction. Stops when every
+	component of the gradient is within 'gtol', or after 'maxiter' iterations.
+	'method', 'gtol', 'maxiter' and 'memory' are reserved keywords here.
+	Returns a Minimum
+	"""
+	if method not in METHODS:
+		raise ValueError('method must be one of {}'.format(METHODS))
+
+	func = utils.ensure_func(func)
+	for k in list(x0) + list(params):
+		if k not in func.variables:
+			raise NameError(k) from None
+	for k in func.variables:
+		if (k not in x0) and (k not in params):
+			raise NameError('Value for \'{}\' not provided.'.format(k)) from None
+
+	objective = Objective(func, x0, params, hessian=(method == NEWTON))
+	x = np.array([x0[k] for k in objective.variables], dtype=float)
+
+	if method == LBFGS:
+		x, f, g, it, converged = _lbfgs(objective, x, gtol, maxiter, memory)
+	else:
+		x, f, g, it, converged = _newton(objective, x, gtol, maxiter)
+
+	return Minimum(
+		dict(zip(objective.variables, x.tolist())),
+		f,
+		g,
+		it,
+		objective.evaluations,
+		converged
+	)
@@ -0,0 +1,92 @@
+"""
+module for evaluating Funcs on several threads. NumPy's ufuncs release the GIL
+while they loop over arrays, so splitting broadcast inputs into contiguous
+chunks along their first axis and evaluating the chunks concurrently scales
+with the number of cores for large arrays. Every chunk is written straight into
+its slice of a single output array
+"""
+import math
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import pfuncs.streaming as streaming
+
+from pfuncs.semantics import ScopedMemory
+
+
+# fewest rows worth handing to a thread of their own
+MIN_ROWS = 2**12
+
+# thread count: executor, shared by every Func so threads are started once
+_executors = dict()
+_executors_lock = threading.Lock()
+
+
+def executor(threads):
+	""" the shared ThreadPoolExecutor with 'threads' workers """
+	with _executors_lock:
+		if threads not in _executors:
+			_executors[threads] = ThreadPoolExecutor(
+				max_workers=threads,
+				thread_name_prefix='pfuncs'
+			)
+		return _executors[threads]
+
+
+class ThreadedEvaluator(object):
+	"""
+	evaluates a tree over chunks of its inputs in a thread pool. Evaluators
+	that keep state between calls (like the scratch buffers of an
+	EvaluationPlan) aren't safe to share between threads, so each thread builds
+	its own from the 'factory', a function of the tree, the first time it runs
+	a chunk. 'dtype' is the dtype of the output when the evaluators have one
+	"""
+
+	def __init__(self, tree, factory, dtype=None):
+		self.tree = tree
+		self.factory = factory
+		self.dtype = dtype
+		self._local = threading.local()
+
+	def _thread_evaluator(self):
+		try:
+			return self._local.evaluator
+		except AttributeError:
+			self._local.evaluator = self.factory(self.tree)
+			return self._local.evaluator
+
+	def _evaluate_chunk(self, inputs, out):
+		scope = ScopedMemory(scope_name='global', scope_level=1)
+		for name, value in inputs.items():
+			scope.assign(name, value)
+		return self._thread_evaluator().evaluate(scope, out=out)
+
+	def evaluate(self, scope, out=None, threads=1):
+		inputs = dict(zip(scope.variables, scope.arguments))
+		shape = streaming.broadcast_shape(inputs)
+
+		# too little work to be worth splitting
+		if (threads < 2) or (len(shape) == 0) or (shape[0] < 2*MIN_ROWS):
+			return self._evaluate_chunk(inputs, out)
+
+		if out is None:
+			dtype = self.dtype
+			if dtype is None:
+				dtype = np.result_type(*inputs.values(), 1.0)
+			out = np.empty(shape, dtype=dtype)
+
+		rows = max(MIN_ROWS, math.ceil(shape[0] / threads))
+		futures = [
+			executor(threads).submit(
+				self._evaluate_chunk,
+				streaming.chunk_inputs(inputs, shape, start, stop),
+				out[start:stop]
+			)
+			for start, stop in streaming.chunk_bounds(shape[0], rows)
+		]
+		for future in futures:
+			future.result()
+		return out
@@ -0,0 +1,632 @@
+"""
+module for evaluation plans: ASTs flattened into a list of ufunc calls that
+write into a small pool of reusable scratch buffers. Identical subtrees, within
+one tree or across several, are flattened into a single instruction. A node's
+buffer is free again as soon as the last node reading it has run, so the pool 
+only needs as many buffers as there are intermediates alive at once - usually
+a handful, regardless of the size of the tree. Buffers are kept in a Workspace
+between evaluations, so repeatedly evaluating inputs of the same shape 
+allocates nothing. Plans built with a dtype cast their constants once, when 
+they're built, and their inputs once per evaluation, so every intermediate is
+computed in that dtype - float32 plans read and write half the memory
+"""
+import functools
+import glob
+import operator
+import os
+
+import numpy as np
+import scipy.stats as stats
+from scipy.special import erf
+
+import pfuncs.stats as pstats
+import pfuncs.streaming as streaming
+import pfuncs.functions as fnc
+
+from pfuncs.generic import ABCVisitor
+from pfuncs.base import (
+	NUMBER,
+	PLUS,
+	MINUS,
+	MUL,
+	DIV,
+	POWER
+)
+
+
+BINARY_UFUNCS = {
+	PLUS: 	np.add,
+	MINUS: 	np.subtract,
+	MUL: 	np.multiply,
+	DIV: 	np.true_divide,
+	POWER: 	np.power
+}
+
+UNARY_UFUNCS = {
+	PLUS: 	np.positive,
+	MINUS: 	np.negative
+}
+
+FUNCTION_UFUNCS = {
+	fnc.EXP: 	np.exp,
+	fnc.LOG: 	np.log,
+	fnc.LN: 	np.log,
+	fnc.LOG10: 	np.log10,
+	fnc.SQRT: 	np.sqrt,
+	fnc.ABS: 	np.abs,
+	fnc.SIGN: 	np.sign,
+	fnc.SIN: 	np.sin,
+	fnc.COS: 	np.cos,
+	fnc.TAN: 	np.tan,
+	fnc.ASIN: 	np.arcsin,
+	fnc.ACOS: 	np.arccos,
+	fnc.ATAN: 	np.arctan,
+	fnc.FLOOR: 	np.floor,
+	fnc.CEIL: 	np.ceil,
+	fnc.ERF: 	erf
+}
+
+# the multivariate built-ins aren't ufuncs, so they return new arrays rather
+#	than writing into a buffer. They're evaluated exactly as the Interpreter
+#	evaluates them
+MULTIVAR_FUNCTIONS = {
+	fnc.MAX: 		fnc.maximum,
+	fnc.MIN: 		fnc.minimum,
+	fnc.NORMCDF: 	stats.norm.cdf,
+	fnc.NORMPDF: 	stats.norm.pdf
+}
+
+# ufuncs whose arguments can be swapped without changing the result, so a*b
+#	and b*a are evaluated once when both appear
+COMMUTATIVE = (np.add, np.multiply)
+
+# types of the values a bound plan evaluates without checking their shapes,
+#	and the NumPy scalar types the Python ones are converted to. Python ints
+#	and bools become floats, as __call__ computes them with Python's 
+#	operators: 2**-1 is 0.5, large products don't wrap around, and True + True
+#	is 2
+SCALARS = (int, float, complex, np.generic)
+NUMPY_SCALARS = {
+	bool: 		np.float64,
+	int: 		np.float64,
+	float: 		np.float64,
+	complex: 	np.complex128
+}
+# Python types converted when they're the inputs of unbound plans too
+PYTHON_INTEGERS = (bool, int)
+
+# operators of NumPy scalars, used in place of the ufuncs by bound plans
+SCALAR_OPERATORS = {
+	np.add: 		operator.add,
+	np.subtract: 	operator.sub,
+	np.multiply: 	operator.mul,
+	np.true_divide: operator.truediv,
+	np.power: 		operator.pow,
+	np.positive: 	operator.pos,
+	np.negative: 	operator.neg
+}
+
+# L2 cache size assumed when it can't be read from the system, and the fewest
+#	elements evaluated per block, below which per-call overhead dominates
+DEFAULT_CACHE = 2**20
+MIN_BLOCK = 2**10
+
+
+def is_ufunc(func):
+	return isinstance(func, np.ufunc)
+
+
+def cast(value, dtype):
+	""" 
+	'value' in 'dtype': a NumPy scalar for numbers and 0-d arrays, an array
+	otherwise. Arrays already in 'dtype' aren't copied
+	"""
+	value = np.asarray(value, dtype=dtype)
+	return value[()] if value.ndim == 0 else value
+
+
+def _casting(func, dtype):
+	""" 'func', with its result cast to 'dtype' """
+	@functools.wraps(func)
+	def call(*args):
+		return cast(func(*args), dtype)
+	return call
+
+
+def _numpy_scalar(value):
+	""" 'value' as a NumPy scalar, so arithmetic on it follows NumPy's rules """
+	if isinstance(value, np.generic):
+		return value
+	try:
+		return NUMPY_SCALARS[type(value)](value)
+	except KeyError:
+		return np.asarray(value)[()]
+
+
+@functools.lru_cache(maxsize=None)
+def cache_size(level=2):
+	""" 
+	size in bytes of the level-'level' data cache of the first CPU, read from
+	sysfs on linux. DEFAULT_CACHE if it can't be read
+	"""
+	pattern = '/sys/devices/system/cpu/cpu0/cache/index*'
+	for index in sorted(glob.glob(pattern)):
+		try:
+			with open(os.path.join(index, 'level')) as f:
+				if int(f.read()) != level:
+					continue
+			with open(os.path.join(index, 'type')) as f:
+				if f.read().strip() == 'Instruction':
+					continue
+			with open(os.path.join(index, 'size')) as f:
+				size = f.read().strip()
+		except (OSError, ValueError):
+			continue
+
+		units = {'K': 2**10, 'M': 2**20, 'G': 2**30}
+		if size[-1] in units:
+			return int(size[:-1]) * units[size[-1]]
+		return int(size)
+	return DEFAULT_CACHE
+
+
+class Workspace(object):
+	"""
+	pool of scratch buffers for an EvaluationPlan. Only buffers of one shape and
+	dtype are kept at a time, so a workspace never holds more than the plan's
+	n_buffers arrays. Each thread evaluating a plan needs its own workspace
+	"""
+
+	def __init__(self):
+		self.key = None
+		self.pool = list()
+		# arrays allocated by the most recent evaluation
+		self.allocations = 0
+
+	def buffers(self, n, shape, dtype):
+		""" 'n' buffers of 'shape' and 'dtype', allocating only those missing """
+		key = (shape, np.dtype(dtype))
+		if key != self.key:
+			self.key = key
+			self.pool = list()
+
+		self.allocations = 0
+		while len(self.pool) < n:
+			self.pool.append(np.empty(shape, dtype=dtype))
+			self.allocations += 1
+
+		if self.allocations:
+			pstats.miss('workspace')
+		else:
+			pstats.hit('workspace')
+		return self.pool[:n]
+
+
+class EvaluationPlan(ABCVisitor):
+	"""
+	AST walker that flattens the tree, in post-order, into a list of
+	instructions. Every operand and result is a slot in a flat list of values,
+	which holds the variables and constants before the instructions run. Each
+	instruction is a (function, argument slots, result slot, buffer) list,
+	where buffer indexes the scratch buffers followed by the output arrays, or
+	is None for functions that aren't ufuncs. Identical subtrees are flattened
+	into a single instruction, so each is evaluated once per call.
+
+	With a 'dtype', constants are cast to it as they're flattened, inputs as 
+	they're loaded, and the results of the functions that aren't ufuncs (whose
+	SciPy implementations compute in float64) as they're returned, so every 
+	ufunc runs its loop for that dtype, and every buffer is of that dtype
+	"""
+
+	def __init__(self, tree, dtype=None):
+		super().__init__(tree)
+		self._build({None: tree}, dtype)
+
+	# ==============================
+	# 	Building
+	# ==============================
+	def _build(self, trees, dtype=None):
+		self.dtype = None if dtype is None else np.dtype(dtype)
+		# variable name: slot
+		self.variables = dict()
+		# (slot, value) pairs
+		self.constants = list()
+		self.instructions = list()
+		self.n_slots = 0
+		# operation nodes reached, including those shared with earlier ones
+		self.n_nodes = 0
+
+		# (function, argument slots) or constant key: slot, for finding 
+		#	subtrees that have already been flattened
+		self._memo = dict()
+		# id(node): slot, so nodes shared by several parents are visited once
+		self._slots = dict()
+		# multivariate built-in name: function casting its results to dtype
+		self._casts = dict()
+
+		# name: slot of each tree's result
+		self.roots = {name: self.visit(tree) for name, tree in trees.items()}
+		self._allocate()
+
+		self.workspace = Workspace()
+
+	def visit(self, node):
+		key = id(node)
+		if key not in self._slots:
+			self._slots[key] = super().visit(node)
+		return self._slots[key]
+
+	def _new_slot(self):
+		self.n_slots += 1
+		return self.n_slots - 1
+
+	def _emit(self, func, args):
+		""" append an instruction, unless an identical one already exists """
+		self.n_nodes += 1
+
+		args = tuple(args)
+		key = (func, tuple(sorted(args)) if func in COMMUTATIVE else args)
+		try:
+			return self._memo[key]
+		except KeyError:
+			pass
+
+		slot = self._new_slot()
+		self.instructions.append([func, args, slot, None])
+		self._memo[key] = slot
+		return slot
+
+	def _allocate(self):
+		"""
+		assign buffers to the results of ufunc instructions. A result's buffer is
+		released after the last instruction that reads it, and can be taken by 
+		that same instruction's result, since ufuncs can write over their 
+		arguments. The results of the trees get output arrays of their own
+		"""
+		last_use = dict()
+		for i, (_, args, _, _) in enumerate(self.instructions):
+			for slot in args:
+				last_use[slot] = i
+
+		results = {i[2]: i for i in self.instructions}
+		self.outputs = list()
+		for slot in self.roots.values():
+			if (
+				(slot in results) 
+				and is_ufunc(results[slot][0]) 
+				and (slot not in self.outputs)
+			):
+				self.outputs.append(slot)
+
+		free = list()
+		held = dict()
+		n_buffers = 0
+		for i, instruction in enumerate(self.instructions):
+			func, args, slot, _ = instruction
+			for arg in set(args):
+				if (arg in held) and (last_use[arg] == i):
+					free.append(held.pop(arg))
+
+			if (not is_ufunc(func)) or (slot in self.outputs):
+				continue
+			if free:
+				instruction[3] = free.pop()
+			else:
+				instruction[3] = n_buffers
+				n_buffers += 1
+			held[slot] = instruction[3]
+
+		self.n_buffers = n_buffers
+		for k, slot in enumerate(self.outputs):
+			results[slot][3] = n_buffers + k
+
+	def visit_Num(self, node):
+		# arrays substituted by the Curryer can't be hashed, so they're never
+		#	shared
+		try:
+			key = (NUMBER, type(node.value), node.value)
+			if key in self._memo:
+				return self._memo[key]
+		except TypeError:
+			key = None
+
+		value = node.value
+		if self.dtype is not None:
+			value = cast(value, self.dtype)
+
+		slot = self._new_slot()
+		self.constants.append((slot, value))
+		if key is not None:
+			self._memo[key] = slot
+		return slot
+
+	def visit_Var(self, node):
+		if node.value not in self.variables:
+			self.variables[node.value] = self._new_slot()
+		return self.variables[node.value]
+
+	def visit_UnaryOp(self, node):
+		expr = self.visit(node.expr)
+		return self._emit(UNARY_UFUNCS[node.op.type], (expr,))
+
+	def visit_BinaryOp(self, node):
+		left = self.visit(node.left)
+		right = self.visit(node.right)
+		return self._emit(BINARY_UFUNCS[node.op.type], (left, right))
+
+	def visit_Function(self, node):
+		expr = self.visit(node.expr)
+		return self._emit(FUNCTION_UFUNCS[node.value], (expr,))
+
+	def visit_MultivarFunction(self, node):
+		args = [self.visit(arg) for arg in node.arguments]
+		return self._emit(self._multivar_function(node.value), args)
+
+	def _multivar_function(self, name):
+		""" 
+		the function of the multivariate built-in 'name', casting its results
+		for plans with a dtype. One per name, so calls of it are still shared
+		"""
+		func = MULTIVAR_FUNCTIONS[name]
+		if self.dtype is None:
+			return func
+		if name not in self._casts:
+			self._casts[name] = _casting(func, self.dtype)
+		return self._casts[name]
+
+	def visit_Arg(self, node):
+		return self.visit(node.expr)
+
+
+	# ==============================
+	# 	Evaluating
+	# ==============================
+	@property
+	def allocations(self):
+		""" arrays allocated by the last evaluation with the default workspace """
+		return self.workspace.allocations
+
+	def _load(self, inputs):
+		""" list of slot values with the variables and constants filled in """
+		values = [None] * self.n_slots
+		if self.dtype is None:
+			for name, slot in self.variables.items():
+				value = inputs[name]
+				if type(value) in PYTHON_INTEGERS:
+					value = _numpy_scalar(value)
+				values[slot] = value
+		else:
+			for name, slot in self.variables.items():
+				values[slot] = cast(inputs[name], self.dtype)
+		for slot, value in self.constants:
+			values[slot] = value
+		return values
+
+	def _run(self, values, buffers, shape, dtype):
+		"""
+		run the instructions, returning the number of output arrays allocated.
+		Results that don't span the full broadcast 'shape' (e.g. subtrees of 
+		constants, or of inputs of lower dimension) are computed without a 
+		buffer, and output arrays are only allocated when they're first needed
+		"""
+		allocated = 0
+		for func, args, result, buf in self.instructions:
+			operands = [values[i] for i in args]
+			if (buf is None) or not any(
+				getattr(o, 'shape', None) == shape for o in operands
+			):
+				values[result] = func(*operands)
+				continue
+
+			target = buffers[buf]
+			if target is None:
+				target = buffers[buf] = np.empty(shape, dtype=dtype)
+				allocated += 1
+			values[result] = func(*operands, out=target)
+		return allocated
+
+	def _run_scalar(self, values):
+		for func, args, result, _ in self.instructions:
+			values[result] = func(*[values[i] for i in args])
+
+	def _execute(self, inputs, outs, workspace):
+		""" 
+		evaluate every tree with the 'inputs' dict of variable values, writing
+		into the arrays of the 'outs' dict (by tree name) where given. Returns a
+		dict of the results by tree name
+		"""
+		if workspace is None:
+			workspace = self.workspace
+
+		values = self._load(inputs)
+		leaves = [values[s] for s in self.variables.values()]
+		leaves.extend(value for _, value in self.constants)
+		shape = np.broadcast_shapes(*(np.shape(v) for v in leaves))
+
+		if shape == ():
+			workspace.allocations = 0
+			self._run_scalar(values)
+		else:
+			dtype = self.dtype
+			if dtype is None:
+				dtype = np.result_type(*leaves, 1.0)
+			buffers = workspace.buffers(self.n_buffers, shape, dtype)
+			provided = {self.roots[name]: out for name, out in outs.items()}
+			buffers.extend(provided.get(slot) for slot in self.outputs)
+			workspace.allocations += self._run(values, buffers, shape, dtype)
+
+		results = dict()
+		for name, slot in self.roots.items():
+			result = values[slot]
+			out = outs.get(name)
+			if (out is not None) and (result is not out):
+				out[...] = result
+				result = out
+			results[name] = result
+		return results
+
+	def evaluate(self, scope, out=None, workspace=None):
+		"""
+		evaluate the plan with the variables in 'scope'. Array results are
+		written into 'out' if it's provided; otherwise into a new array.
+		Scalar-only evaluations don't use buffers at all
+		"""
+		inputs = {name: scope.retrieve(name) for name in self.variables}
+		return self.run(inputs, out=out, workspace=workspace)
+
+	def run(self, inputs, out=None, workspace=None):
+		""" evaluate the plan with the 'inputs' dict of variable values """
+		outs = dict() if out is None else {None: out}
+		return self._execute(inputs, outs, workspace)[None]
+
+	def bind(self, names):
+		"""
+		function evaluating the plan with the values of the variables 'names'
+		given positionally, in that order. Slots are resolved here, once. Calls
+		with numbers only convert them to NumPy scalars, whose operators run
+		the same loops as the ufuncs without their per-call overhead; calls
+		with any arrays go through run(). 'names' must include every variable 
+		of the plan, and names the plan doesn't use are ignored
+		"""
+		names = tuple(names)
+		missing = [k for k in self.variables if k not in names]
+		if missing:
+			msg = 'Variables {} missing from the signature'
+			raise NameError(msg.format(tuple(missing)))
+
+		scalar = all(np.ndim(v) == 0 for _, v in self.constants)
+		if self.dtype is None:
+			convert = _numpy_scalar
+		else:
+			convert = functools.partial(cast, dtype=self.dtype)
+		template = [None] * self.n_slots
+		for slot, value in self.constants:
+			template[slot] = convert(value) if scalar else value
+		slots = [self.variables.get(name) for name in names]
+		bindings = [(i, s) for i, s in enumerate(slots) if s is not None]
+		instructions = [
+			(SCALAR_OPERATORS.get(f, f), args, result)
+			for f, args, result, _ in self.instructions
+		]
+		root = self.roots[None]
+		n = len(names)
+
+		def call(*values):
+			if len(values) != n:
+				msg = 'Expected {} arguments; received {}'
+				raise TypeError(msg.format(n, len(values)))
+			if not (scalar and all(isinstance(v, SCALARS) for v in values)):
+				return self.run(dict(zip(names, values)))
+
+			current = template.copy()
+			for i, slot in bindings:
+				current[slot] = convert(values[i])
+			for func, args, result in instructions:
+				current[result] = func(*[current[i] for i in args])
+			return current[root]
+
+		return call
+
+	def __str__(self):
+		names = {slot: name for name, slot in self.variables.items()}
+		names.update({slot: repr(value) for slot, value in self.constants})
+		targets = {
+			slot: 'out' if name is None else str(name)
+			for name, slot in self.roots.items()
+		}
+
+		lines = list()
+		for func, args, result, buf in self.instructions:
+			if result in targets:
+				target = targets[result]
+			elif buf is None:
+				target = 't' + str(result)
+			else:
+				target = 'b' + str(buf)
+			lines.append('{target} = {func}({args})'.format(
+					target=target,
+					func=getattr(func, '__name__', func),
+					args=', '.join(names[i] for i in args))
+			)
+			names[result] = target
+		return '\n'.join(lines)
+
+
+class BatchPlan(EvaluationPlan):
+	"""
+	EvaluationPlan of several trees at once, given as a dict by name. Subtrees
+	shared between the trees are evaluated once per call, and run() returns a
+	dict of the results by name. Trees that are identical share one result
+	"""
+
+	def __init__(self, trees, dtype=None):
+		self.tree = None
+		self._build(trees, dtype)
+
+	def evaluate(self, scope, outs=None, workspace=None):
+		inputs = {name: scope.retrieve(name) for name in self.variables}
+		return self.run(inputs, outs=outs, workspace=workspace)
+
+	def run(self, inputs, outs=None, workspace=None):
+		""" 
+		evaluate every tree with the 'inputs' dict of variable values, writing
+		into the arrays of the 'outs' dict (by name) where given
+		"""
+		return self._execute(inputs, outs or dict(), workspace)
+
+
+class FusedEvaluator(object):
+	"""
+	evaluates an EvaluationPlan over large arrays one block at a time: the whole
+	tree runs over the first block of the inputs before the second block is 
+	touched. Blocks are sized so a block of every input, scratch buffer, and the
+	output fit in the L2 cache together, so intermediates never travel through 
+	main memory. Set 'block' to override the number of elements per block, and
+	'dtype' to evaluate in that dtype (see EvaluationPlan)
+	"""
+
+	def __init__(self, tree, block=None, dtype=None):
+		self.plan = EvaluationPlan(tree, dtype=dtype)
+		self.block = block
+		self.workspace = Workspace()
+		# the last block is usually shorter, so it gets buffers of its own
+		#	rather than evicting the full-size ones
+		self.tail_workspace = Workspace()
+
+	def block_size(self, n_inputs, itemsize):
+		""" number of elements evaluated per block """
+		if self.block is not None:
+			return self.block
+		arrays = self.plan.n_buffers + n_inputs + 1
+		return max(MIN_BLOCK, cache_size() // (itemsize * arrays))
+
+	def evaluate(self, scope, out=None):
+		inputs = {name: scope.retrieve(name) for name in self.plan.variables}
+		constants = [value for _, value in self.plan.constants]
+		shape = streaming.broadcast_shape(inputs)
+
+		# constant arrays (from currying) aren't split into blocks, so those 
+		#	trees are evaluated whole
+		if any(np.ndim(c) for c in constants) or (len(shape) == 0):
+			return self.plan.run(inputs, out=out, workspace=self.workspace)
+
+		dtype = self.plan.dtype
+		if dtype is None:
+			dtype = np.result_type(*inputs.values(), *constants, 1.0)
+		row = int(np.prod(shape[1:]))
+		block = self.block_size(len(inputs), dtype.itemsize)
+		rows = max(1, block // row)
+		if rows >= shape[0]:
+			return self.plan.run(inputs, out=out, workspace=self.workspace)
+
+		if out is None:
+			out = np.empty(shape, dtype=dtype)
+
+		for start, stop in streaming.chunk_bounds(shape[0], rows):
+			workspace = self.workspace if (stop-start == rows) else self.tail_workspace
+			self.plan.run(
+				streaming.chunk_inputs(inputs, shape, start, stop),
+				out=out[start:stop],
+				workspace=workspace
+			)
+		return out
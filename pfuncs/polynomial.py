@@ -0,0 +1,288 @@
+"""
+module for recognizing Funcs that are polynomials, or ratios of polynomials, in
+their one variable. The PolynomialAnalyzer expands the tree into coefficient
+arrays; Polynomial and Rational then evaluate by Horner's rule (np.polyval for
+arrays) and differentiate through their coefficients in O(degree), instead of
+walking trees of nested power and product nodes
+"""
+import numpy as np
+
+import pfuncs.utils as utils
+import pfuncs.callable as call
+
+from pfuncs.generic import ABCVisitor
+from pfuncs.plan import (
+	FUNCTION_UFUNCS,
+	MULTIVAR_FUNCTIONS
+)
+from pfuncs.base import (
+	PLUS,
+	MINUS,
+	MUL,
+	DIV,
+	POWER
+)
+
+
+# polynomials of a higher degree, in the numerator or denominator, are left to
+#	the other backends: their coefficients take as long to expand as the tree
+#	takes to evaluate, and np.polyval loses accuracy
+MAX_DEGREE = 64
+
+
+class _NotPolynomial(Exception):
+	pass
+
+
+def _trim(c):
+	""" coefficients without leading zeros, keeping at least one """
+	c = np.trim_zeros(np.atleast_1d(c), 'f')
+	return c if len(c) else np.zeros(1)
+
+def _is_constant(c):
+	return len(c) == 1
+
+
+class PolynomialAnalyzer(ABCVisitor):
+	"""
+	AST walker that expands the tree into a (numerator, denominator) pair of
+	coefficient arrays, highest degree first (as np.polyval expects), in the
+	variable 'var'. Subtrees without 'var' are evaluated to numbers, so e.g.
+	sqrt(2)*x is a polynomial. Subtrees shared by several parents are expanded
+	once. Raises _NotPolynomial otherwise, or past MAX_DEGREE
+	"""
+
+	def __init__(self, tree, var):
+		super().__init__(tree)
+		self.var = var
+		# id(node): (numerator, denominator), of the nodes expanded so far
+		self.memo = dict()
+
+	def visit(self, node):
+		key = id(node)
+		pair = self.memo.get(key)
+		if pair is None:
+			pair = super().visit(node)
+			if max(len(pair[0]), len(pair[1])) > MAX_DEGREE + 1:
+				raise _NotPolynomial
+			self.memo[key] = pair
+		return pair
+
+	def analyze(self):
+		num, den = self.visit(self.tree)
+		return _trim(num), _trim(den)
+
+	def _constant(self, pair):
+		""" the value of a (numerator, denominator) pair without 'var' """
+		num, den = pair
+		if not (_is_constant(num) and _is_constant(den)):
+			raise _NotPolynomial
+		return num[0] / den[0]
+
+	def _power(self, pair, n):
+		""" pair raised to the integer power n, by repeated squaring """
+		num, den = pair
+		if n < 0:
+			num, den, n = den, num, -n
+		if n * (max(len(num), len(den)) - 1) > MAX_DEGREE:
+			raise _NotPolynomial
+		rnum, rden = np.ones(1), np.ones(1)
+		while n:
+			if n & 1:
+				rnum, rden = np.polymul(rnum, num), np.polymul(rden, den)
+			num, den = np.polymul(num, num), np.polymul(den, den)
+			n >>= 1
+		return rnum, rden
+
+	def visit_Num(self, node):
+		if np.ndim(node.value) != 0:
+			raise _NotPolynomial
+		return np.array([node.value], dtype=float), np.ones(1)
+
+	def visit_Var(self, node):
+		if node.value != self.var:
+			raise _NotPolynomial
+		return np.array([1.0, 0.0]), np.ones(1)
+
+	def visit_UnaryOp(self, node):
+		num, den = self.visit(node.expr)
+		if node.op.type == MINUS:
+			return -num, den
+		return num, den
+
+	def visit_BinaryOp(self, node):
+		(lnum, lden), (rnum, rden) = self.visit(node.left), self.visit(node.right)
+		op = node.op.type
+
+		if op in (PLUS, MINUS):
+			combine = np.polyadd if op == PLUS else np.polysub
+			if np.array_equal(lden, rden):
+				return combine(lnum, rnum), lden
+			return (
+				combine(np.polymul(lnum, rden), np.polymul(rnum, lden)),
+				np.polymul(lden, rden)
+			)
+		elif op == MUL:
+			return np.polymul(lnum, rnum), np.polymul(lden, rden)
+		elif op == DIV:
+			return np.polymul(lnum, rden), np.polymul(lden, rnum)
+		elif op == POWER:
+			exponent = self._constant((rnum, rden))
+			if _is_constant(lnum) and _is_constant(lden):
+				return np.array([self._constant((lnum, lden)) ** exponent]), np.ones(1)
+			if float(exponent).is_integer():
+				return self._power((lnum, lden), int(exponent))
+			raise _NotPolynomial
+
+	def visit_Function(self, node):
+		value = self._constant(self.visit(node.expr))
+		return np.array([FUNCTION_UFUNCS[node.value](value)]), np.ones(1)
+
+	def visit_MultivarFunction(self, node):
+		args = [self._constant(self.visit(arg)) for arg in node.arguments]
+		return np.array([MULTIVAR_FUNCTIONS[node.value](*args)]), np.ones(1)
+
+	def visit_Arg(self, node):
+		return self.visit(node.expr)
+
+
+class Polynomial(object):
+	"""
+	polynomial in 'variable' with 'coefficients', highest degree first. Scalars
+	are evaluated by Horner's rule in pure Python, and arrays with np.polyval
+	"""
+
+	def __init__(self, coefficients, variable):
+		self.coefficients = _trim(np.asarray(coefficients, dtype=float))
+		self.variable = variable
+		self._coefficients = [float(c) for c in self.coefficients]
+
+	@property
+	def degree(self):
+		return len(self.coefficients) - 1
+
+	def __call__(self, x):
+		if np.ndim(x) == 0:
+			result = 0.0
+			for c in self._coefficients:
+				result = result*x + c
+			return result
+		return np.polyval(self.coefficients, x)
+
+	def derivative(self, n=1):
+		""" the n-th derivative, from the coefficients alone """
+		return Polynomial(np.polyder(self.coefficients, n), self.variable)
+
+	@property
+	def d(self):
+		""" alias for the first derivative """
+		return self.derivative()
+
+	@property
+	def tree(self):
+		""" AST of the polynomial in Horner form, (((c0*x + c1)*x + c2)*x + ...) """
+		node = utils.number(self._coefficients[0])
+		for c in self._coefficients[1:]:
+			node = utils.mul(node, utils.variable(self.variable))
+			if c != 0:
+				node = utils.add(node, utils.number(c))
+		return node
+
+	@property
+	def func(self):
+		""" the polynomial as a Func, in Horner form """
+		return call.Func(tree=self.tree)
+
+	def __str__(self):
+		return '<{klass}: degree {n} in {var}>'.format(
+				klass=self.__class__.__name__,
+				n=self.degree,
+				var=self.variable
+		)
+
+
+class Rational(object):
+	""" ratio of two Polynomials in the same variable """
+
+	def __init__(self, numerator, denominator):
+		self.numerator = numerator
+		self.denominator = denominator
+		self.variable = numerator.variable
+
+	def __call__(self, x):
+		return self.numerator(x) / self.denominator(x)
+
+	def derivative(self, n=1):
+		""" the n-th derivative, by the quotient rule on the coefficients """
+		result = self
+		for _ in range(n):
+			p, q = result.numerator.coefficients, result.denominator.coefficients
+			num = np.polysub(
+				np.polymul(np.polyder(p), q),
+				np.polymul(p, np.polyder(q))
+			)
+			result = Rational(
+				Polynomial(num, self.variable),
+				Polynomial(np.polymul(q, q), self.variable)
+			)
+		return result
+
+	@property
+	def d(self):
+		""" alias for the first derivative """
+		return self.derivative()
+
+	@property
+	def tree(self):
+		return utils.div(self.numerator.tree, self.denominator.tree)
+
+	@property
+	def func(self):
+		""" the rational function as a Func, with both parts in Horner form """
+		return call.Func(tree=self.tree)
+
+	def __str__(self):
+		return '<{klass}: degree {n}/{m} in {var}>'.format(
+				klass=self.__class__.__name__,
+				n=self.numerator.degree,
+				m=self.denominator.degree,
+				var=self.variable
+		)
+
+
+def analyze(tree, var):
+	"""
+	the Polynomial or Rational that 'tree' represents in the variable 'var', or
+	None if it's neither
+	"""
+	try:
+		num, den = PolynomialAnalyzer(tree, var).analyze()
+	except (_NotPolynomial, ZeroDivisionError):
+		return None
+
+	if _is_constant(den):
+		return Polynomial(num / den[0], var)
+	return Rational(Polynomial(num, var), Polynomial(den, var))
+
+
+class PolynomialEvaluator(object):
+	""" evaluator of the 'polynomial' backend, for univariate Funcs """
+
+	def __init__(self, tree):
+		variables = tree.free
+		if len(variables) != 1:
+			msg = 'The \'polynomial\' backend requires exactly one variable'
+			raise ValueError(msg)
+
+		self.variable = variables[0]
+		self.polynomial = analyze(tree, self.variable)
+		if self.polynomial is None:
+			msg = 'Expression is not a polynomial or rational function of {}'
+			raise ValueError(msg.format(repr(self.variable)))
+
+	def evaluate(self, scope, out=None):
+		result = self.polynomial(scope.retrieve(self.variable))
+		if out is None:
+			return result
+		out[...] = result
+		return out
@@ -0,0 +1,122 @@
+"""
+module for profiling the evaluation of a Func node by node. The
+ProfilingInterpreter times every visit it makes, and the resulting Profile
+attributes inclusive time (the node and everything beneath it), exclusive time
+(the node alone), and call counts to each node of the AST
+"""
+import time
+
+import pfuncs.ast as ast
+import pfuncs.utils as utils
+
+from pfuncs.functions import Interpreter
+
+
+class NodeProfile(object):
+	""" timings of a single AST node, accumulated over all of its visits """
+
+	def __init__(self, node, depth):
+		self.node = node
+		self.depth = depth
+		self.calls = 0
+		self.inclusive = 0.0
+		self.exclusive = 0.0
+
+	@property
+	def text(self):
+		return utils.Writer(self.node).write()
+
+	def __repr__(self):
+		return '<{klass}({text}: {incl:.3g}s incl, {excl:.3g}s excl)>'.format(
+				klass=self.__class__.__name__,
+				text=self.text,
+				incl=self.inclusive,
+				excl=self.exclusive
+		)
+
+
+class ProfilingInterpreter(Interpreter):
+	"""
+	Interpreter that wraps every visit in a timer. The time spent in a node's
+	children is subtracted from its own time to give the exclusive time
+	"""
+
+	def __init__(self, tree, scope):
+		super().__init__(tree, scope)
+		# id(node): NodeProfile, in the order the nodes were first reached
+		self.records = dict()
+		# running total of the time spent in the children of each open visit
+		self._child_time = [0.0]
+		self._depth = 0
+
+	def visit(self, node):
+		record = self.records.get(id(node))
+		if record is None:
+			record = NodeProfile(node, self._depth)
+			self.records[id(node)] = record
+
+		self._depth += 1
+		self._child_time.append(0.0)
+
+		start = time.perf_counter()
+		result = super().visit(node)
+		elapsed = time.perf_counter() - start
+
+		children = self._child_time.pop()
+		self._child_time[-1] += elapsed
+		self._depth -= 1
+
+		record.calls += 1
+		record.inclusive += elapsed
+		record.exclusive += elapsed - children
+		return result
+
+
+class Profile(object):
+	"""
+	the result of profiling the evaluation of a Func. 'result' holds the value
+	of the last evaluation, and 'nodes' the NodeProfile of every AST node
+	reached, in the order they were first visited. Arg nodes are folded into
+	their expression, since they only forward to it
+	"""
+
+	def __init__(self, tree, records, result):
+		self.tree = tree
+		self.result = result
+		self.nodes = [
+			r for r in records.values()
+			if not isinstance(r.node, ast.Arg)
+		]
+		self.total = records[id(tree)].inclusive
+
+	def hottest(self, n=10, by='exclusive'):
+		""" the 'n' nodes with the most 'exclusive' or 'inclusive' time """
+		if by not in ('exclusive', 'inclusive'):
+			raise ValueError('by must be \'exclusive\' or \'inclusive\'')
+		ranked = sorted(self.nodes, key=lambda r: getattr(r, by), reverse=True)
+		return ranked[:n]
+
+	def report(self, n=10, by='exclusive', width=60):
+		"""
+		table of the 'n' hottest nodes, with their time as a percentage of the
+		total, call counts, and the expression each node represents
+		"""
+		total = self.total if self.total > 0 else 1.0
+
+		header = '{:>7} {:>7} {:>7}  {}'.format('excl%', 'incl%', 'calls', 'expr')
+		lines = [header, '-'*len(header)]
+		for r in self.hottest(n, by):
+			text = r.text
+			if len(text) > width:
+				text = text[:width-3] + '...'
+			lines.append('{excl:>6.1f}% {incl:>6.1f}% {calls:>7}  {text}'.format(
+					excl=100*r.exclusive/total,
+					incl=100*r.inclusive/total,
+					calls=r.calls,
+					text=text)
+			)
+		lines.append('total: {:.6g}s'.format(self.total))
+		return '\n'.join(lines)
+
+	def __str__(self):
+		return self.report()
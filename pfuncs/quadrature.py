@@ -0,0 +1,215 @@
+"""
+module for integrating Funcs over intervals for many parameter sets at once,
+with 15-point Gauss-Kronrod rules. The nodes of every interval of every
+parameter set are evaluated in one call of the Func's compiled plan, and the
+adaptive rule bisects the intervals whose error estimates are too large, a
+whole round of intervals at a time
+"""
+import numpy as np
+
+import pfuncs.utils as utils
+
+
+# the 15-point Kronrod nodes on [-1, 1], and their Kronrod weights. Every other
+#	node, starting from the second, is a node of the 7-point Gauss rule
+_XK = np.array([
+	0.991455371120812639206854697526329,
+	0.949107912342758524526189684047851,
+	0.864864423359769072789712788640926,
+	0.741531185599394439863864773280788,
+	0.586087235467691130294144845693013,
+	0.405845151377397166906606412076961,
+	0.207784955007898467600689403773245,
+	0.000000000000000000000000000000000
+])
+_WK = np.array([
+	0.022935322010529224963732008058970,
+	0.063092092629978553290700663189204,
+	0.104790010322250183839876322541518,
+	0.140653259715525918745189590510238,
+	0.169004726639267902826583426598550,
+	0.190350578064785409913256402421014,
+	0.204432940075298892414161999234649,
+	0.209482141084727828012999174891714
+])
+_WG = np.array([
+	0.129484966168869693270611432679082,
+	0.279705391489276667901467771423780,
+	0.381830050505118944950369775488975,
+	0.417959183673469387755102040816327
+])
+
+NODES = np.concatenate([-_XK[:-1], _XK[::-1]])
+KRONROD_WEIGHTS = np.concatenate([_WK[:-1], _WK[::-1]])
+GAUSS_WEIGHTS = np.zeros(15)
+GAUSS_WEIGHTS[1:7:2] = _WG[:-1]
+GAUSS_WEIGHTS[7] = _WG[-1]
+GAUSS_WEIGHTS[9:15:2] = _WG[-2::-1]
+
+# intervals evaluated in one call of the plan
+BATCH = 2**12
+
+_EPS = np.finfo(float).eps
+
+
+class GaussKronrod(object):
+	"""
+	the 15-point Gauss-Kronrod rule for 'func' in 'var', with 'params' the
+	values of its other variables: flat arrays (one value per parameter set)
+	or scalars
+	"""
+
+	def __init__(self, func, var, params):
+		self.plan = func.plan
+		self.var = var
+		self.params = params
+
+	def __call__(self, index, lo, hi):
+		"""
+		integral and error estimate over [lo[i], hi[i]] for parameter set
+		index[i], for every i. Errors are estimated as QUADPACK does
+		"""
+		integral = np.empty(len(index))
+		error = np.empty(len(index))
+		for start in range(0, len(index), BATCH):
+			batch = slice(start, start + BATCH)
+			integral[batch], error[batch] = self._rule(
+				index[batch],
+				lo[batch],
+				hi[batch]
+			)
+		return integral, error
+
+	def _rule(self, index, lo, hi):
+		center = ((lo + hi) / 2)[:, None]
+		half = (hi - lo) / 2
+
+		inputs = {
+			k: v if np.ndim(v) == 0 else v[index][:, None]
+			for k, v in self.params.items()
+		}
+		inputs[self.var] = center + half[:, None]*NODES
+		f = np.broadcast_to(self.plan.run(inputs), (len(index), len(NODES)))
+
+		kronrod = f @ KRONROD_WEIGHTS
+		gauss = f @ GAUSS_WEIGHTS
+		mean = kronrod / 2
+
+		scale = np.abs(half)
+		error = np.abs(kronrod - gauss) * scale
+		resasc = (np.abs(f - mean[:, None]) @ KRONROD_WEIGHTS) * scale
+		resabs = (np.abs(f) @ KRONROD_WEIGHTS) * scale
+		with np.errstate(divide='ignore', invalid='ignore'):
+			scaled = resasc * np.minimum(1, (200*error/resasc)**1.5)
+		error = np.where((resasc != 0) & (error != 0), scaled, error)
+		error = np.maximum(50*_EPS*resabs, error)
+		return kronrod*half, error
+
+
+def integrate(
+	func,
+	var,
+	a,
+	b,
+	/,
+	tol=1.49e-8,
+	rtol=1.49e-8,
+	limit=50,
+	adaptive=True,
+	intervals=1,
+	**params
+):
+	"""
+	integral of 'func' over 'var' from 'a' to 'b', with a value (scalar or
+	array) in 'params' for every other variable. a, b and params broadcast
+	against each other, and every integral is computed at once.
+
+	With 'adaptive', [a, b] is bisected until each piece's error estimate is
+	within its share, by length, of max(tol, rtol*|integral|), or a parameter
+	set has 'limit' pieces. Otherwise [a, b] is split into 'intervals' equal
+	pieces, each integrated with one 15-point rule. Limits must be finite.
+	'var', 'a' and 'b' are positional-only, so variables can share their
+	names, but 'tol', 'rtol', 'limit', 'adaptive' and 'intervals' are
+	reserved keywords here. Returns (integrals, error estimates)
+	"""
+	func = utils.ensure_func(func)
+	if var not in func.variables:
+		msg = '{} is not a variable of the expression'
+		raise NameError(msg.format(repr(var)))
+	for k in func.variables:
+		if (k != var) and (k not in params):
+			raise NameError('Value for \'{}\' not provided.'.format(k)) from None
+	for k in params:
+		if k not in func.variables:
+			raise NameError(k) from None
+	if not (np.all(np.isfinite(a)) and np.all(np.isfinite(b))):
+		raise ValueError('Integration limits must be finite')
+
+	shape = np.broadcast_shapes(
+		np.shape(a),
+		np.shape(b),
+		*(np.shape(v) for v in params.values())
+	)
+	n = int(np.prod(shape))
+	a = np.array(np.broadcast_to(a, shape), dtype=float).ravel()
+	b = np.array(np.broadcast_to(b, shape), dtype=float).ravel()
+	params = {
+		k: v if np.ndim(v) == 0 else np.broadcast_to(v, shape).ravel()
+		for k, v in params.items()
+	}
+	rule = GaussKronrod(func, var, params)
+
+	if adaptive:
+		integral, error = _adaptive(rule, n, a, b, tol, rtol, limit)
+	else:
+		steps = np.arange(intervals + 1) / intervals
+		edges = a[:, None] + (b - a)[:, None]*steps
+		index = np.repeat(np.arange(n), intervals)
+		pieces, errors = rule(index, edges[:, :-1].ravel(), edges[:, 1:].ravel())
+		integral = pieces.reshape(n, intervals).sum(axis=1)
+		error = errors.reshape(n, intervals).sum(axis=1)
+
+	if shape == ():
+		return integral[0], error[0]
+	return integral.reshape(shape), error.reshape(shape)
+
+
+def _adaptive(rule, n, a, b, tol, rtol, limit):
+	"""
+	bisect every interval whose error is over its share of the tolerance,
+	evaluating each round of intervals, for all parameter sets, together
+	"""
+	integral = np.zeros(n)
+	error = np.zeros(n)
+	length = np.abs(b - a)
+	length[length == 0] = 1.0
+	# pieces each parameter set has accepted so far
+	accepted = np.zeros(n, dtype=int)
+
+	index, lo, hi = np.arange(n), a, b
+	target = None
+	while len(index):
+		pieces, errors = rule(index, lo, hi)
+		if target is None:
+			target = np.maximum(tol, rtol*np.abs(pieces))
+
+		share = np.abs(hi - lo) / length[index]
+		done = errors <= target[index]*share
+
+		# parameter sets that would go over 'limit' pieces stop refining
+		split = np.bincount(index[~done], minlength=n)
+		pending = np.bincount(index, minlength=n)
+		done |= (accepted + pending + split > limit)[index]
+
+		integral += np.bincount(index[done], weights=pieces[done], minlength=n)
+		error += np.bincount(index[done], weights=errors[done], minlength=n)
+		accepted += np.bincount(index[done], minlength=n)
+
+		rest = ~done
+		mid = (lo[rest] + hi[rest]) / 2
+		index = np.concatenate([index[rest], index[rest]])
+		lo, hi = (
+			np.concatenate([lo[rest], mid]),
+			np.concatenate([mid, hi[rest]])
+		)
+	return integral, error
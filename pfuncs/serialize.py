@@ -0,0 +1,107 @@
+"""
+module for converting ASTs to and from a compact form: a flat tuple of small
+tuples, one per node, in post-order. It's much cheaper to pickle and ship
+between processes, or store on disk, than a graph of AST and Token objects.
+Nodes shared by several parents are encoded once, and referred to by the index
+of their entry afterwards
+"""
+import pfuncs.ast as ast
+
+from pfuncs.tokens import Token
+from pfuncs.base import (
+	NUMBER,
+	ID
+)
+
+
+BINARY 		= 'b'
+UNARY 		= 'u'
+NUM 		= 'n'
+VAR 		= 'v'
+FUNCTION 	= 'f'
+MULTIVAR 	= 'm'
+REF 		= 'r'
+
+
+def encode(tree):
+	""" the compact form of 'tree' """
+	code = list()
+	# id(node): index of its entry, for the nodes with children
+	entries = dict()
+	stack = [(tree, False)]
+	while stack:
+		node, expanded = stack.pop()
+		if isinstance(node, ast.Arg):
+			stack.append((node.expr, False))
+			continue
+		if (not expanded) and (id(node) in entries):
+			code.append((REF, entries[id(node)]))
+			continue
+		if not expanded:
+			# children are pushed after their parent, so they're encoded first
+			stack.append((node, True))
+			stack.extend((c, False) for c in reversed(list(ast.iter_children(node))))
+			continue
+
+		if isinstance(node, ast.BinaryOp):
+			code.append((BINARY, node.op.type, node.op.value))
+		elif isinstance(node, ast.UnaryOp):
+			code.append((UNARY, node.op.type, node.op.value))
+		elif isinstance(node, ast.Num):
+			code.append((NUM, node.value))
+		elif isinstance(node, ast.Var):
+			code.append((VAR, node.value))
+		elif isinstance(node, ast.Function):
+			code.append((FUNCTION, node.token.type, node.value))
+		elif isinstance(node, ast.MultivarFunction):
+			code.append((MULTIVAR, node.token.type, node.value, len(node.arguments)))
+		else:
+			raise TypeError('Cannot encode {}'.format(repr(node)))
+		if node._fields:
+			entries[id(node)] = len(code) - 1
+	return tuple(code)
+
+
+def decode(code):
+	""" the AST represented by the compact form 'code' """
+	stack = list()
+	# the node decoded from each entry
+	nodes = list()
+	for entry in code:
+		kind = entry[0]
+
+		if kind == REF:
+			node = nodes[entry[1]]
+		elif kind == BINARY:
+			right = stack.pop()
+			left = stack.pop()
+			node = ast.BinaryOp(
+				left=left,
+				op=Token(entry[1], entry[2]),
+				right=right
+			)
+		elif kind == UNARY:
+			node = ast.UnaryOp(op=Token(entry[1], entry[2]), expr=stack.pop())
+		elif kind == NUM:
+			node = ast.Num(Token(NUMBER, entry[1]))
+		elif kind == VAR:
+			node = ast.Var(Token(ID, entry[1]))
+		elif kind == FUNCTION:
+			node = ast.Function(token=Token(entry[1], entry[2]), expr=stack.pop())
+		elif kind == MULTIVAR:
+			n = entry[3]
+			args = [ast.Arg(expr) for expr in stack[len(stack)-n:]]
+			del stack[len(stack)-n:]
+			node = ast.MultivarFunction(
+				token=Token(entry[1], entry[2]),
+				arguments=args
+			)
+		else:
+			raise ValueError('Unknown node code {}'.format(repr(kind)))
+
+		stack.append(node)
+		nodes.append(node)
+
+	if len(stack) != 1:
+		raise ValueError('Malformed compact tree')
+	return stack[0]
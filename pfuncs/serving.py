@@ -0,0 +1,213 @@
+"""
+module for evaluating a Func from asyncio code that issues many small,
+concurrent requests. An AsyncEvaluator queues the requests arriving within a
+short window, evaluates them as one vectorized call of Func.evaluate_many in an
+executor thread, and resolves each request's future with its own result, so
+the per-call overhead is paid once per batch rather than once per request
+"""
+import asyncio
+import functools
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pfuncs.backends as backends
+import pfuncs.utils as utils
+
+
+# requests evaluated together at most, and the longest a request waits for
+#	others to join its batch, in milliseconds
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY_MS = 1.0
+
+
+class BatchMetrics(object):
+	"""
+	batch sizes and queue latencies of an AsyncEvaluator. A request's queue
+	latency is the time from its arrival to the start of its batch's
+	evaluation. 'sizes' counts the batches of each size
+	"""
+
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		self.batches = 0
+		self.requests = 0
+		self.errors = 0
+		self.sizes = dict()
+		self.queue_time = 0.0
+		self.max_queue_time = 0.0
+		self.evaluation_time = 0.0
+
+	def record(self, latencies, elapsed, errors=0):
+		"""
+		add a batch whose requests waited 'latencies' seconds, and whose
+		evaluation took 'elapsed' seconds
+		"""
+		size = len(latencies)
+		self.batches += 1
+		self.requests += size
+		self.errors += errors
+		self.sizes[size] = self.sizes.get(size, 0) + 1
+		self.queue_time += sum(latencies)
+		self.max_queue_time = max(self.max_queue_time, max(latencies))
+		self.evaluation_time += elapsed
+
+	def snapshot(self):
+		""" dict of everything recorded so far, with the means filled in """
+		return {
+			'batches': self.batches,
+			'requests': self.requests,
+			'errors': self.errors,
+			'sizes': dict(self.sizes),
+			'mean_batch': self.requests / self.batches if self.batches else 0.0,
+			'mean_queue_time': self.queue_time / self.requests if self.requests else 0.0,
+			'max_queue_time': self.max_queue_time,
+			'evaluation_time': self.evaluation_time
+		}
+
+	def __str__(self):
+		snapshot = self.snapshot()
+		return '<{klass}: {requests} requests in {batches} batches, mean batch {mean:.1f}, mean queue {queue:.3f} ms>'.format(
+				klass=self.__class__.__name__,
+				requests=snapshot['requests'],
+				batches=snapshot['batches'],
+				mean=snapshot['mean_batch'],
+				queue=1000*snapshot['mean_queue_time']
+		)
+
+
+class AsyncEvaluator(object):
+	"""
+	awaitable evaluator of 'func' (a Func, or a parse-able string) for asyncio
+	code: 'await evaluator(**kwargs)' returns what 'func(**kwargs)' would.
+	Requests are collected until 'max_batch' of them are waiting, or
+	'max_delay_ms' after the first of them arrived, whichever is sooner, and
+	evaluated together with Func.evaluate_many on 'backend' in an executor
+	thread, so the event loop is never blocked. A request that fails gets its
+	own exception; the rest of its batch is unaffected.
+
+	Batches run one at a time on a thread of the evaluator's own, as Funcs
+	keep state between calls. 'metrics' is a BatchMetrics of the batches run
+	so far. close() stops the thread once the pending batches are done
+	"""
+
+	def __init__(
+		self,
+		func,
+		max_batch=DEFAULT_MAX_BATCH,
+		max_delay_ms=DEFAULT_MAX_DELAY_MS,
+		backend=backends.NUMPY
+	):
+		if max_batch < 1:
+			raise ValueError('max_batch must be at least 1')
+		if max_delay_ms < 0:
+			raise ValueError('max_delay_ms can\'t be negative')
+
+		self.func = utils.ensure_func(func)
+		self.max_batch = max_batch
+		self.max_delay = max_delay_ms / 1000
+		self.backend = backend
+		self.metrics = BatchMetrics()
+
+		# (keyword arguments, future, arrival time) of the queued requests
+		self._pending = list()
+		# handle of the call that flushes the queue when the window closes
+		self._timer = None
+		self._executor = ThreadPoolExecutor(
+			max_workers=1,
+			thread_name_prefix='pfuncs-async'
+		)
+
+	async def __call__(self, **kwargs):
+		loop = asyncio.get_running_loop()
+		future = loop.create_future()
+		self._pending.append((kwargs, future, time.perf_counter()))
+
+		if len(self._pending) >= self.max_batch:
+			self._flush(loop)
+		elif self._timer is None:
+			self._timer = loop.call_later(self.max_delay, self._flush, loop)
+		return await future
+
+	def _flush(self, loop):
+		""" send the queued requests to the executor as one batch """
+		if self._timer is not None:
+			self._timer.cancel()
+			self._timer = None
+
+		batch, self._pending = self._pending, list()
+		if not batch:
+			return
+
+		arguments = [kwargs for kwargs, _, _ in batch]
+		try:
+			task = loop.run_in_executor(self._executor, self._evaluate, arguments)
+		except RuntimeError as e:
+			# the evaluator was closed
+			for _, future, _ in batch:
+				if not future.done():
+					future.set_exception(e)
+			return
+		task.add_done_callback(functools.partial(self._resolve, batch))
+
+	def _evaluate(self, arguments):
+		"""
+		executor function: evaluate the batch, returning the time it started,
+		the time it took, and a (result, exception) pair per request. When the
+		batch fails as a whole, each request is evaluated on its own, so only
+		those at fault get an exception
+		"""
+		start = time.perf_counter()
+		try:
+			outcomes = [
+				(result, None)
+				for result in self.func.evaluate_many(arguments, backend=self.backend)
+			]
+		except Exception:
+			outcomes = list()
+			for kwargs in arguments:
+				try:
+					outcomes.append((self.func(**kwargs), None))
+				except Exception as e:
+					outcomes.append((None, e))
+		return start, time.perf_counter() - start, outcomes
+
+	def _resolve(self, batch, task):
+		""" done callback: resolve each request's future with its outcome """
+		futures = [future for _, future, _ in batch]
+		try:
+			start, elapsed, outcomes = task.result()
+		except BaseException as e:
+			# the executor itself failed, e.g. it was shut down
+			for future in futures:
+				if not future.done():
+					future.set_exception(e)
+			return
+
+		errors = 0
+		for future, (result, exception) in zip(futures, outcomes):
+			errors += exception is not None
+			# requests cancelled while they waited are skipped
+			if future.done():
+				continue
+			if exception is None:
+				future.set_result(result)
+			else:
+				future.set_exception(exception)
+
+		latencies = [start - arrival for _, _, arrival in batch]
+		self.metrics.record(latencies, elapsed, errors)
+
+	def close(self):
+		""" stop the executor thread, once the batches already sent are done """
+		self._executor.shutdown(wait=False)
+
+	def __str__(self):
+		return '<{klass}: {func}, max batch {batch}, max delay {delay} ms>'.format(
+				klass=self.__class__.__name__,
+				func=self.func.text,
+				batch=self.max_batch,
+				delay=1000*self.max_delay
+		)
@@ -0,0 +1,265 @@
+"""
+module for solving equations, and iterating to fixed points, over arrays of
+starting points and parameters at once. Expressions (and the derivatives a
+method needs) are compiled once, and every iteration evaluates them over the
+elements that haven't converged yet, so converged elements cost nothing
+"""
+import numpy as np
+
+import pfuncs.utils as utils
+
+
+NEWTON = 'newton'
+HALLEY = 'halley'
+
+# derivatives each method needs
+ORDERS = {NEWTON: 1, HALLEY: 2}
+
+AITKEN = 'aitken'
+ANDERSON = 'anderson'
+ACCELERATIONS = (None, AITKEN, ANDERSON)
+
+
+class Solution(object):
+	"""
+	the result of a vectorized solver, with the shape of the broadcast inputs:
+	'x' holds the solutions, 'converged' whether each element met the
+	tolerance, and 'iterations' how many iterations each element took
+	"""
+
+	def __init__(self, x, converged, iterations):
+		self.x = x
+		self.converged = converged
+		self.iterations = iterations
+
+	def __str__(self):
+		return '<{klass}: {n} of {total} converged, at most {it} iterations>'.format(
+				klass=self.__class__.__name__,
+				n=int(np.sum(self.converged)),
+				total=np.size(self.converged),
+				it=int(np.max(self.iterations, initial=0))
+		)
+
+
+def _flatten(value, shape):
+	""" 'value' broadcast to 'shape' and flattened, or as it is if a scalar """
+	if np.ndim(value) == 0:
+		return value
+	return np.broadcast_to(value, shape).ravel()
+
+def _take(value, index):
+	if np.ndim(value) == 0:
+		return value
+	return value[index]
+
+def _reshape(value, shape):
+	""" flat 'value' back in 'shape', as a scalar if 'shape' is () """
+	value = value.reshape(shape)
+	return value[()] if shape == () else value
+
+
+def solve(
+	func,
+	var,
+	x0,
+	method=NEWTON,
+	bracket=None,
+	tol=1e-12,
+	maxiter=50,
+	**params
+):
+	"""
+	solve func = 0 for 'var', starting from 'x0', with a value (scalar or
+	array) in 'params' for every other variable. x0, params and bracket
+	broadcast against each other, and every element is solved at once with
+	Newton's or Halley's 'method'. An element has converged when its step is
+	within tol*(1 + |x|), or func is exactly 0.
+
+	With 'bracket' = (lo, hi), where func changes sign between lo and hi,
+	steps that leave the bracket, or can't be taken, fall back to bisection.
+	Elements whose bracket doesn't change sign are returned as nan. Without a
+	bracket, elements whose step can't be taken stop unconverged. 'method',
+	'bracket', 'tol' and 'maxiter' are reserved keywords here. Returns a
+	Solution
+	"""
+	if method not in ORDERS:
+		raise ValueError('method must be one of {}'.format(tuple(ORDERS)))
+
+	func = utils.ensure_func(func)
+	compiled = func.compile_derivatives(var, ORDERS[method])
+
+	bounds = tuple(bracket) if bracket is not None else ()
+	shape = np.broadcast_shapes(
+		np.shape(x0),
+		*(np.shape(b) for b in bounds),
+		*(np.shape(v) for v in params.values())
+	)
+	n = int(np.prod(shape))
+	x = np.array(np.broadcast_to(x0, shape), dtype=float).ravel()
+	params = {k: _flatten(v, shape) for k, v in params.items()}
+	converged = np.zeros(n, dtype=bool)
+	iterations = np.zeros(n, dtype=int)
+
+	def evaluate(x, index):
+		""" the expression and its derivatives at the elements in 'index' """
+		inputs = {k: _take(v, index) for k, v in params.items()}
+		inputs[var] = x
+		values = compiled(**inputs)
+		return [np.broadcast_to(values[k], x.shape) for k in sorted(values)]
+
+	active = np.arange(n)
+	if bracket is not None:
+		lo = np.array(np.broadcast_to(bounds[0], shape), dtype=float).ravel()
+		hi = np.array(np.broadcast_to(bounds[1], shape), dtype=float).ravel()
+		f_lo = evaluate(lo, active)[0]
+		f_hi = evaluate(hi, active)[0]
+
+		with np.errstate(invalid='ignore'):
+			signed = np.sign(f_lo) * np.sign(f_hi) <= 0
+		x[~signed] = np.nan
+		# starting points outside the bracket start from its midpoint
+		outside = signed & ~((x >= np.minimum(lo, hi)) & (x <= np.maximum(lo, hi)))
+		x[outside] = (lo[outside] + hi[outside]) / 2
+		# from here on, func(lo) <= 0 <= func(hi)
+		swap = f_lo > 0
+		lo[swap], hi[swap] = hi[swap], lo[swap]
+		active = active[signed]
+
+	for it in range(1, maxiter+1):
+		if not len(active):
+			break
+		xa = x[active]
+		derivatives = evaluate(xa, active)
+		f, df = derivatives[0], derivatives[1]
+
+		with np.errstate(all='ignore'):
+			if method == NEWTON:
+				step = f / df
+			else:
+				d2f = derivatives[2]
+				step = 2*f*df / (2*df*df - f*d2f)
+			x_new = xa - step
+
+			stopped = np.zeros(len(active), dtype=bool)
+			if bracket is not None:
+				below = f < 0
+				lo[active[below]] = xa[below]
+				hi[active[~below]] = xa[~below]
+				la, ha = lo[active], hi[active]
+				# bisect where the step is non-finite or leaves the bracket
+				bisect = ~((x_new - la) * (x_new - ha) <= 0)
+				x_new[bisect] = (la[bisect] + ha[bisect]) / 2
+				width = np.abs(ha - la) <= tol*(1 + np.abs(xa))
+			else:
+				width = np.zeros(len(active), dtype=bool)
+				stopped = ~np.isfinite(x_new)
+
+			done = (f == 0) | width | (np.abs(x_new - xa) <= tol*(1 + np.abs(xa)))
+
+		x[active] = np.where((f == 0) | stopped, xa, x_new)
+		iterations[active] = it
+		converged[active[done]] = True
+		active = active[~(done | stopped)]
+
+	return Solution(
+		_reshape(x, shape),
+		_reshape(converged, shape),
+		_reshape(iterations, shape)
+	)
+
+
+def fixed_point(
+	func,
+	x0,
+	tol=1e-12,
+	maxiter=500,
+	accelerate=None,
+	**params
+):
+	"""
+	iterate x = func(x) from 'x0' until successive iterates are within
+	tol*(1 + |x|), with a value (scalar or array) in 'params' for every other
+	variable. x0 and params broadcast against each other, and every element is
+	iterated at once through the expression's compiled plan.
+
+	'accelerate' can be 'aitken', where each iteration takes two plain steps
+	and extrapolates them with Aitken's delta-squared (Steffensen's method), or
+	'anderson', which mixes the last two steps of each element to zero its
+	residual (Anderson acceleration of depth one). Elements are independent
+	scalar problems, so deeper Anderson histories wouldn't add anything.
+	Elements whose iterates stop being finite stop unconverged. 'tol',
+	'maxiter' and 'accelerate' are reserved keywords here. Returns a Solution
+	"""
+	if accelerate not in ACCELERATIONS:
+		msg = 'accelerate must be one of {}'
+		raise ValueError(msg.format(ACCELERATIONS))
+
+	func = utils.ensure_func(func)
+	free = [v for v in func.variables if v not in params]
+	if len(free) != 1:
+		msg = 'Expected values for every variable but the iterated one; {} free'
+		raise ValueError(msg.format(tuple(free)))
+	var = free[0]
+	for k in params:
+		if k not in func.variables:
+			raise NameError(k) from None
+	plan = func.plan
+
+	shape = np.broadcast_shapes(
+		np.shape(x0),
+		*(np.shape(v) for v in params.values())
+	)
+	n = int(np.prod(shape))
+	x = np.array(np.broadcast_to(x0, shape), dtype=float).ravel()
+	params = {k: _flatten(v, shape) for k, v in params.items()}
+	converged = np.zeros(n, dtype=bool)
+	iterations = np.zeros(n, dtype=int)
+
+	def step(x, index):
+		inputs = {k: _take(v, index) for k, v in params.items()}
+		inputs[var] = x
+		return np.array(np.broadcast_to(plan.run(inputs), x.shape), dtype=float)
+
+	# Anderson keeps each element's previous iterate and residual
+	previous_x = np.full(n, np.nan)
+	previous_r = np.full(n, np.nan)
+
+	active = np.arange(n)
+	for it in range(1, maxiter+1):
+		if not len(active):
+			break
+		xa = x[active]
+		gx = step(xa, active)
+
+		with np.errstate(all='ignore'):
+			if accelerate == AITKEN:
+				ggx = step(gx, active)
+				denominator = ggx - 2*gx + xa
+				x_new = xa - (gx - xa)**2 / denominator
+				# where the extrapolation breaks down, keep the plain steps
+				plain = ~np.isfinite(x_new) | (denominator == 0)
+				x_new[plain] = ggx[plain]
+			elif accelerate == ANDERSON:
+				r = gx - xa
+				px, pr = previous_x[active], previous_r[active]
+				gamma = r / (r - pr)
+				x_new = gx - gamma*(gx - (px + pr))
+				plain = ~np.isfinite(x_new)
+				x_new[plain] = gx[plain]
+				previous_x[active], previous_r[active] = xa, r
+			else:
+				x_new = gx
+
+			done = np.abs(x_new - xa) <= tol*(1 + np.abs(xa))
+			stopped = ~np.isfinite(x_new)
+
+		x[active] = np.where(stopped, xa, x_new)
+		iterations[active] = it
+		converged[active[done]] = True
+		active = active[~(done | stopped)]
+
+	return Solution(
+		_reshape(x, shape),
+		_reshape(converged, shape),
+		_reshape(iterations, shape)
+	)
@@ -0,0 +1,126 @@
+"""
+module for the opt-in instrumentation of pfuncs. When enabled, each phase of
+building, differentiating, simplifying and evaluating a Func records its number
+of calls, cumulative time, and the number of AST nodes it handled; caches record
+their hits and misses. When disabled (the default), the only cost is a single
+flag check per instrumented call
+"""
+import copy
+import functools
+import time
+
+import pfuncs.ast as ast
+
+
+_enabled = False
+_callback = None
+
+# phase name: {'calls': int, 'time': float, 'nodes': int}
+_phases = dict()
+
+# cache name: {'hits': int, 'misses': int}
+_caches = dict()
+
+
+# ==============================
+# 	Switches
+# ==============================
+def enable():
+	""" turn instrumentation on """
+	global _enabled
+	_enabled = True
+
+def disable():
+	""" turn instrumentation off. Recorded values are kept until reset() """
+	global _enabled
+	_enabled = False
+
+def is_enabled():
+	return _enabled
+
+def set_callback(callback):
+	"""
+	register a function that is called with (name, metrics) every time a phase
+	or cache event is recorded, e.g. to forward them to a metrics system. For
+	phases 'metrics' is {'time': seconds, 'nodes': n}; for caches it is
+	{'hits': 1} or {'misses': 1}. Pass None to remove the callback
+	"""
+	global _callback
+	_callback = callback
+
+
+# ==============================
+# 	Reading & Clearing
+# ==============================
+def snapshot():
+	""" copy of everything recorded so far """
+	return {
+		'phases': copy.deepcopy(_phases),
+		'caches': copy.deepcopy(_caches)
+	}
+
+def reset():
+	""" clear everything recorded so far """
+	_phases.clear()
+	_caches.clear()
+
+
+# ==============================
+# 	Recording
+# ==============================
+def record(phase, elapsed, nodes=0):
+	""" add one call of 'phase' that took 'elapsed' seconds over 'nodes' nodes """
+	entry = _phases.setdefault(phase, {'calls': 0, 'time': 0.0, 'nodes': 0})
+	entry['calls'] += 1
+	entry['time'] += elapsed
+	entry['nodes'] += nodes
+
+	if _callback is not None:
+		_callback(phase, {'time': elapsed, 'nodes': nodes})
+
+def hit(cache):
+	""" record a hit on the cache named 'cache' """
+	if _enabled:
+		_count_cache(cache, 'hits')
+
+def miss(cache):
+	""" record a miss on the cache named 'cache' """
+	if _enabled:
+		_count_cache(cache, 'misses')
+
+def _count_cache(cache, kind):
+	entry = _caches.setdefault(cache, {'hits': 0, 'misses': 0})
+	entry[kind] += 1
+
+	if _callback is not None:
+		_callback(cache, {kind: 1})
+
+
+def timed(phase):
+	"""
+	decorator that records the call count, time, and node count of 'phase' each
+	time the decorated function is called while instrumentation is enabled. The
+	node count is taken from the 'tree' attribute of the first argument (i.e.
+	the instance, for methods), after the call has finished
+	"""
+
+	def decorator(func):
+
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if not _enabled:
+				return func(*args, **kwargs)
+
+			start = time.perf_counter()
+			result = func(*args, **kwargs)
+			elapsed = time.perf_counter() - start
+
+			tree = getattr(args[0], 'tree', None) if args else None
+			nodes = ast.count_nodes(tree) if tree is not None else 0
+			record(phase, elapsed, nodes)
+
+			return result
+
+		return wrapper
+
+	return decorator
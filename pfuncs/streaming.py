@@ -0,0 +1,105 @@
+"""
+module for evaluating Funcs over inputs too large to hold in memory. Inputs are
+memory-mapped, split into aligned chunks along their first axis, and each
+chunk of the result is written into a (by default memory-mapped) output, so
+peak memory is bounded by the chunk size times the width of the tree rather
+than by the size of the inputs
+"""
+import os
+
+import numpy as np
+
+
+# rows along the first axis evaluated at once
+DEFAULT_CHUNK = 2**16
+
+
+def open_input(value):
+	"""
+	file paths of .npy files are opened as read-only memory maps; every other
+	value (memmaps, arrays, scalars) is passed through untouched
+	"""
+	if isinstance(value, (str, os.PathLike)):
+		return np.load(os.fspath(value), mmap_mode='r')
+	return value
+
+def open_output(out, shape, dtype):
+	"""
+	the array results are written into: a new .npy memory map if 'out' is a
+	path, 'out' itself if it's an array, or a new in-memory array if it's None
+	"""
+	if out is None:
+		return np.empty(shape, dtype=dtype)
+	elif isinstance(out, (str, os.PathLike)):
+		return np.lib.format.open_memmap(
+			os.fspath(out),
+			mode='w+',
+			dtype=dtype,
+			shape=shape
+		)
+	elif out.shape != shape:
+		msg = 'out has shape {}; expected {}'
+		raise ValueError(msg.format(out.shape, shape))
+	return out
+
+def broadcast_shape(inputs):
+	""" shape of the result of evaluating a Func over the 'inputs' dict """
+	return np.broadcast_shapes(*(np.shape(v) for v in inputs.values()))
+
+def chunk_bounds(length, chunk):
+	""" (start, stop) pairs covering range(length) in steps of 'chunk' """
+	if chunk < 1:
+		raise ValueError('chunk must be a positive integer')
+	return [(i, min(i + chunk, length)) for i in range(0, length, chunk)]
+
+def chunk_inputs(inputs, shape, start, stop):
+	"""
+	rows start:stop of every input, aligned against the broadcast 'shape'.
+	Inputs that broadcast along the first axis (scalars, inputs of lower
+	dimension, or a first axis of length one) are passed whole. Slices of arrays
+	and memmaps are views, so nothing is read until the chunk is evaluated
+	"""
+	chunked = dict()
+	for name, value in inputs.items():
+		vshape = np.shape(value)
+		if (len(vshape) < len(shape)) or (vshape[0] == 1):
+			chunked[name] = value
+		else:
+			chunked[name] = value[start:stop]
+	return chunked
+
+
+def evaluate_stream(func, inputs, out=None, chunk=DEFAULT_CHUNK, **options):
+	"""
+	evaluate 'func' over the 'inputs' dict chunk by chunk, writing each chunk
+	of the result into 'out'. 'options' are passed to Func.evaluate. Returns
+	the output array, flushed to disk if it's a memory map
+	"""
+	inputs = {k: open_input(v) for k, v in inputs.items()}
+	shape = broadcast_shape(inputs)
+
+	if len(shape) == 0:
+		result = np.asarray(func.evaluate(**inputs, **options))
+		output = open_output(out, shape, result.dtype)
+		output[...] = result
+		return output
+
+	output = None
+	for start, stop in chunk_bounds(shape[0], chunk):
+		block = chunk_inputs(inputs, shape, start, stop)
+
+		# the dtype of the output isn't known until the first chunk is done.
+		#	After that, chunks are evaluated straight into views of the output
+		if output is None:
+			result = func.evaluate(**block, **options)
+			output = open_output(out, shape, np.result_type(result))
+			output[start:stop] = result
+		else:
+			func.evaluate(**block, out=output[start:stop], **options)
+
+	if output is None:
+		# the first axis has length zero
+		output = open_output(out, shape, np.float64)
+	if isinstance(output, np.memmap):
+		output.flush()
+	return output
@@ -0,0 +1,52 @@
+"""
+module for gathering the inputs of batched evaluations: the columns of 
+columnar tables, for Func.evaluate_columns, and rows of keyword arguments
+stacked into columns, for Func.evaluate_many
+"""
+import numpy as np
+
+
+def table_columns(table, names):
+	"""
+	the columns 'names' of a columnar table - a dict of arrays, or a structured
+	array - as arrays. Fields of structured arrays are views, and arrays in 
+	dicts are used as they are, so no column is copied
+	"""
+	columns = dict()
+	for name in names:
+		try:
+			columns[name] = np.asarray(table[name])
+		except (KeyError, ValueError):
+			raise NameError('Column for \'{}\' not provided.'.format(name)) from None
+	return columns
+
+def table_length(table):
+	""" number of rows in a columnar table """
+	if isinstance(table, np.ndarray):
+		return len(table)
+	return len(next(iter(table.values()), ()))
+
+def stack_rows(rows, names):
+	"""
+	split 'rows', a sequence of dicts of variable values, into those that can
+	be evaluated together - with a float for exactly the variables 'names' -
+	and the rest. Returns the indices of the stacked rows, a dict of their 
+	values as one float column per variable, and the indices of the rest. Ints
+	and bools aren't stacked, as float64 can't hold every int, and __call__ 
+	computes them with Python's operators
+	"""
+	names = set(names)
+	stacked, rest = list(), list()
+	for i, row in enumerate(rows):
+		if (row.keys() == names) and all(
+			isinstance(v, float) for v in row.values()
+		):
+			stacked.append(i)
+		else:
+			rest.append(i)
+
+	columns = {
+		name: np.fromiter((rows[i][name] for i in stacked), float, len(stacked))
+		for name in names
+	}
+	return stacked, columns, rest
@@ -5,12 +5,14 @@ import copy
 import functools
 
 import pfuncs.ast as ast
+import pfuncs.stats as stats
 import pfuncs.callable as call 
 
 from pfuncs.tokens import Token
 from pfuncs.generic import ABCVisitor
 from pfuncs.base import (
 	NUMBER,
+	ID,
 	PLUS,
 	MINUS,
 	MUL,
@@ -24,16 +26,46 @@ class Writer(ABCVisitor):
 	AST walker that translates the tree into a human-readable string expression.
 	The implementation is a little crude and results in a parentheses-laden 
 	string, but the resulting string can be re-parsed to the same AST.
+
+	Subtrees shared by several parents (see Curryer, and _Jacobian, which
+	shares the derivatives of repeated subtrees) are written once, as 
+	let-bindings ahead of the expression that uses them, e.g. 
+	'(let _s0 = sin((x+1)) in (_s0*_s0))', which the Parser reads back into 
+	the same shared structure. Shared subtrees of a single operation on leaves
+	are short enough to be written out wherever they're used
 	"""
 
+	binding_prefix = '_s'
+
 	def __init__(self, tree):
 		super().__init__(tree)
 		# self.tree = copy.deepcopy(tree)
+		# id(node): name, of the shared nodes
+		self.bindings = dict()
 
 	def add(self, new_string):
 		""" so you don't see 'self.text + self.text + x' all over """
 		self.text = self.text + new_string
 
+	def _visit_bound(self, node):
+		""" visit, writing the names of the nodes already bound """
+		name = self.bindings.get(id(node))
+		if name is not None:
+			self.add(name)
+		else:
+			type(self).visit(self, node)
+
+	def _bind(self, shared):
+		""" names for the 'shared' nodes that don't clash with any variable """
+		n = 0
+		for node in shared:
+			name = self.binding_prefix + str(n)
+			while name in self.tree.free:
+				n += 1
+				name = self.binding_prefix + str(n)
+			yield node, name
+			n += 1
+
 	def visit_BinaryOp(self, node):
 		self.add('(')
 		self.visit(node.left)
@@ -78,10 +110,38 @@ class Writer(ABCVisitor):
 
 	def write(self):
 		self.text = ''
+		self.bindings = dict()
+		shared = [n for n in self.tree.shared if _nested(n)]
+		if not shared:
+			self.visit(self.tree)
+			return self.text
+
+		# each binding can use the ones before it, since shared nodes come
+		#	children first
+		self.visit = self._visit_bound
+		self.add('(let ')
+		for i, (node, name) in enumerate(self._bind(shared)):
+			if i:
+				self.add(', ')
+			self.add(name + ' = ')
+			self.visit(node)
+			self.bindings[id(node)] = name
+		self.add(' in ')
 		self.visit(self.tree)
+		self.add(')')
 		return self.text
 
 
+def _nested(node):
+	""" whether any of the children of 'node' (or of its Args) have children """
+	for child in ast.iter_children(node):
+		if isinstance(child, ast.Arg):
+			child = child.expr
+		if child._fields:
+			return True
+	return False
+
+
 class Reducer(ABCVisitor):
 
 	# additive and multiplicative identities
@@ -90,6 +150,8 @@ class Reducer(ABCVisitor):
 
 	def __init__(self, tree):
 		self.tree = self._copy(tree)
+		# ids of the nodes already reduced, so shared subtrees are reduced once
+		self._visited = set()
 
 		# visit all the nodes in the usual recursive way. We call _reduce() here
 		# 	in case self.tree ends up being a Binary or Unary op that can be 
@@ -98,10 +160,18 @@ class Reducer(ABCVisitor):
 		final_tree = self._reduce(self.tree)
 		if final_tree:
 			self.tree = final_tree
+		# reductions can drop variables anywhere below a node's children
+		ast.refresh(self.tree)
 
 	def _copy(self, tree):
 		return copy.deepcopy(tree)
 
+	def visit(self, node):
+		if id(node) in self._visited:
+			return
+		self._visited.add(id(node))
+		super().visit(node)
+
 	def _both_numbers(self, node1, node2):
 		return isinstance(node1, ast.Num) and isinstance(node2, ast.Num)
 
@@ -297,8 +367,7 @@ def is_constant(tree, wrt):
 	"""
 	checks that an (full or partial) AST is constant with respect to some variable 
 	"""
-	checker = NodeFinder(tree)
-	return not checker.contains(wrt)
+	return wrt not in tree.free
 
 
 def simplify(func):
@@ -311,8 +380,7 @@ def simplify(func):
 	def reduce(self=None, *args, **kwargs):
 		obj = func(self, *args, **kwargs)
 		try:
-			red = Reducer(obj.tree)
-			return call.Func(tree=red.tree)
+			return _reduce_func(obj)
 		except AttributeError:
 			# if func() is an fully evaluated Differential object, 'obj' will
 			#	just be a number
@@ -321,6 +389,14 @@ def simplify(func):
 	return reduce
 
 
+@stats.timed('simplify')
+def _reduce_func(f):
+	""" the Reducer pass of the simplify decorator, timed as its own phase """
+	red = Reducer(f.tree)
+	# reducing only drops variables, so the signature still names them all
+	return call.Func(tree=red.tree, signature=f.signature)
+
+
 def ensure_func(f):
 	if isinstance(f, call.Func):
 		return f 
@@ -341,6 +417,9 @@ def is_str_or_func(f):
 def number(value):
 	return ast.Num(Token(NUMBER, value))
 
+def variable(name):
+	return ast.Var(Token(ID, name))
+
 def add(left, right):
 	return ast.BinaryOp(
 		left=left,
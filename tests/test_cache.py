@@ -0,0 +1,130 @@
+"""
+the on-disk cache: storing values as JSON, reading damaged entries, writing
+entries atomically and evicting those used least recently
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+import pfuncs as pf
+import pfuncs.cache as cache
+import pfuncs.stats as stats
+
+
+@pytest.fixture
+def disk(tmp_path, monkeypatch):
+	# whatever cache the other tests use is put back afterwards
+	monkeypatch.setattr(cache, '_cache', None)
+	monkeypatch.setattr(cache, '_configured', False)
+	return cache.configure(str(tmp_path))
+
+
+def _files(disk, prefix=''):
+	return sorted(n for n in os.listdir(disk.path) if n.startswith(prefix))
+
+
+def test_round_trip(disk):
+	value = {'tree': [1, 'x', [2.5, None]], 'digest': 'ab', 'scale': np.float64(0.5)}
+	disk.put(('tree', 'x + 1'), value)
+	assert disk.get(('tree', 'x + 1')) == dict(value, scale=0.5)
+	assert disk.get(('tree', 'x + 2')) is None
+
+	# values that aren't JSON aren't stored
+	disk.put(('tree', 'x'), {'value': np.arange(3)})
+	assert disk.get(('tree', 'x')) is None
+
+
+def test_funcs_read_back(disk):
+	text = 'x**2*y + exp(-x/y) - sin(x*y)'
+	f = pf.Func(text)
+	dfdx = f.d['x']
+
+	stats.reset()
+	stats.enable()
+	try:
+		g = pf.Func(text)
+		dgdx = g.d['x']
+		counts = stats.snapshot()['caches']['disk']
+	finally:
+		stats.disable()
+		stats.reset()
+
+	assert counts == {'hits': 2, 'misses': 0}
+	assert g == f and dgdx == dfdx
+	assert g.variables == f.variables
+	assert g.tree.digest == f.tree.digest
+	assert g(x=1.5, y=2.0) == f(x=1.5, y=2.0)
+
+
+def test_unreadable_entries_are_misses(disk):
+	disk.put(('tree', 'x + 1'), {'variables': ['x']})
+	path = disk._file(('tree', 'x + 1'))
+	with open(path, 'rb') as f:
+		data = f.read()
+	# e.g. truncated by a full disk
+	with open(path, 'wb') as f:
+		f.write(data[:len(data) // 2])
+
+	assert disk.get(('tree', 'x + 1')) is None
+	assert not os.path.exists(path)
+
+	with open(path, 'w') as f:
+		json.dump({'tree': 'not a tree'}, f)
+	assert pf.Func('x + 1')(x=1.0) == 2.0
+
+
+def test_atomic_writes(disk, monkeypatch):
+	disk.put(('a',), 'first')
+	assert _files(disk, cache.TMP_PREFIX) == []
+	assert len(_files(disk)) == 1
+
+	# a write that fails partway leaves neither the temporary file nor a new entry
+	def fail(src, dst):
+		raise OSError('disk full')
+
+	monkeypatch.setattr(cache.os, 'replace', fail)
+	disk.put(('a',), 'second')
+	disk.put(('b',), 'second')
+	monkeypatch.undo()
+
+	assert _files(disk, cache.TMP_PREFIX) == []
+	assert disk.get(('a',)) == 'first'
+	assert disk.get(('b',)) is None
+
+
+def test_eviction(tmp_path, monkeypatch):
+	monkeypatch.setattr(cache, '_cache', None)
+	monkeypatch.setattr(cache, '_configured', False)
+	monkeypatch.setenv(cache.DIR_VARIABLE, str(tmp_path))
+	monkeypatch.setenv(cache.SIZE_VARIABLE, '1000')
+	disk = cache.get_cache()
+	assert disk.max_bytes == 1000
+
+	# four entries of 202 bytes, used in order, fit
+	value = 'v' * 200
+	keys = [(name,) for name in 'abcd']
+	for i, key in enumerate(keys):
+		disk.put(key, value)
+		os.utime(disk._file(key), (100 + i, 100 + i))
+	assert disk.size() == 808
+
+	# reading 'a' makes 'b' and 'c' the least recent, and the fifth entry
+	#	overflows the cache, which is cut back to EVICT_TO of its size
+	assert disk.get(('a',)) == value
+	disk.put(('e',), value)
+	assert disk.size() <= cache.EVICT_TO * disk.max_bytes
+	assert [disk.get((name,)) is not None for name in 'abcde'] == [
+		True, False, False, True, True
+	]
+
+
+def test_bad_size_warns(tmp_path, monkeypatch):
+	monkeypatch.setattr(cache, '_cache', None)
+	monkeypatch.setattr(cache, '_configured', False)
+	monkeypatch.setenv(cache.DIR_VARIABLE, str(tmp_path))
+	monkeypatch.setenv(cache.SIZE_VARIABLE, '256MB')
+	with pytest.warns(UserWarning, match=cache.SIZE_VARIABLE):
+		disk = cache.get_cache()
+	assert disk.max_bytes == cache.DEFAULT_MAX_BYTES
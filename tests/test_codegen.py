@@ -0,0 +1,123 @@
+"""
+modules generated by pfuncs.codegen, for both libraries, against calling the
+Funcs (and their derivatives) they were generated from
+"""
+import importlib.util
+import math
+
+import numpy as np
+import pytest
+
+import pfuncs as pf
+import pfuncs.codegen as codegen
+
+
+LIBRARIES = ('math', 'numpy')
+
+POINTS = ((0.7, 1.3), (2.5, 0.4), (1.1, 1.1))
+
+
+def _funcs():
+	comp = pf.Func('x*x/(1 + x) + x')
+	nested = pf.Func('x')
+	for _ in range(4):
+		nested = comp(nested)
+	return {
+		'g': pf.Func(
+			'x**2*y + 3*x*y - exp(-x/y) + sqrt(x + y)*sin(x) - log(1 + x*y)/(2 + y)',
+			signature=('y', 'x')
+		),
+		'trig': pf.Func('tan(x/(1 + y)) + exp(x)*cos(y) + x', signature=('x', 'y')),
+		'nested': pf.Func(tree=nested.tree, signature=('x',)),
+	}
+
+
+def _load(path, name):
+	spec = importlib.util.spec_from_file_location(name, path)
+	module = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+
+def _args(func, point):
+	return point[:len(func.signature)]
+
+
+@pytest.fixture(params=LIBRARIES)
+def generated(request, tmp_path):
+	library = request.param
+	funcs = _funcs()
+	path = codegen.emit_module(
+		funcs,
+		str(tmp_path / 'gen_{}.py'.format(library)),
+		derivatives=1,
+		library=library
+	)
+	return library, funcs, _load(path, 'gen_{}'.format(library))
+
+
+def test_values(generated):
+	_, funcs, module = generated
+	for name, func in funcs.items():
+		for point in POINTS:
+			args = _args(func, point)
+			assert getattr(module, name)(*args) == pytest.approx(func(*args), rel=1e-12)
+
+
+def test_gradients(generated):
+	_, funcs, module = generated
+	names = list()
+	for name, func in funcs.items():
+		for var in func.variables:
+			d_name = '{}_d{}'.format(name, var)
+			names.append(d_name)
+			derivative = func.d[var]
+			for point in POINTS:
+				args = _args(func, point)
+				expected = derivative(*args)
+				assert getattr(module, d_name)(*args) == pytest.approx(expected, rel=1e-12)
+	assert sorted(module.__all__) == sorted(list(funcs) + names)
+
+
+def test_numpy_arrays(tmp_path):
+	funcs = _funcs()
+	path = codegen.emit_module(funcs, str(tmp_path / 'gen_arrays.py'), derivatives=1)
+	module = _load(path, 'gen_arrays')
+
+	x = np.linspace(0.1, 2.0, 50)
+	y = x[::-1] + 0.5
+	np.testing.assert_allclose(module.g(y, x), funcs['g'](x=x, y=y), rtol=1e-12)
+	np.testing.assert_allclose(module.g_dx(y, x), funcs['g'].d['x'](x=x, y=y), rtol=1e-12)
+	np.testing.assert_allclose(module.nested(x), funcs['nested'](x), rtol=1e-12)
+
+	# max and min are elementwise, as the Interpreter computes them
+	source = codegen.emit_source({'m': pf.Func('max(x, y) - min(x, 0)', signature=('x', 'y'))})
+	namespace = dict()
+	exec(source, namespace)
+	expected = pf.Func('max(x, y) - min(x, 0)')(x=x - 1, y=y - 1.5)
+	np.testing.assert_allclose(namespace['m'](x - 1, y - 1.5), expected)
+
+
+@pytest.mark.parametrize('library', LIBRARIES)
+def test_without_derivatives(library):
+	# built-ins of several variables, which have no derivatives
+	cdf = pf.Func('normcdf(x, y, 2) - normpdf(y, 0, x) + max(x, 1)', signature=('x', 'y'))
+	funcs = {'cdf': cdf, 'c': '2*pi', 'n': '(-2)**2 + -x'}
+	namespace = dict()
+	exec(codegen.emit_source(funcs, library=library), namespace)
+	for point in POINTS:
+		assert namespace['cdf'](*point) == pytest.approx(cdf(*point), rel=1e-12)
+	assert namespace['c']() == 2*math.pi
+	assert namespace['n'](3.0) == pf.Func('(-2)**2 + -x')(3.0) == 1.0
+
+
+def test_bad_names():
+	for funcs in ({'lambda': 'x'}, {'_f': 'x'}, {'f': 'abs_ + float'}):
+		with pytest.raises(ValueError):
+			codegen.emit_source(funcs)
+	with pytest.raises(ValueError):
+		codegen.emit_source({'f': 'x*y', 'f_dx': 'y'}, derivatives=1)
+	with pytest.raises(ValueError):
+		codegen.emit_source({'f': 'x'}, library='sympy')
+	with pytest.raises(NotImplementedError):
+		codegen.emit_source({'f': 'max(x, y)'}, derivatives=1)
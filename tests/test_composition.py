@@ -0,0 +1,66 @@
+"""
+Funcs composed many times over, whose trees share their substituted subtrees
+"""
+import time
+
+import numpy as np
+import pytest
+
+import pfuncs as pf
+import pfuncs.backends as backends
+
+
+ROUNDS = 12
+
+
+def _composed(text, rounds):
+	g = pf.Func(text)
+	f = g
+	for _ in range(rounds):
+		f = g(x=f)
+	return f
+
+
+@pytest.mark.parametrize('backend', (backends.NUMEXPR, backends.BUFFERED, backends.FUSED))
+def test_backends(backend):
+	if backend == backends.NUMEXPR:
+		pytest.importorskip('numexpr')
+	f = _composed('x*x/(1 + x) + x', ROUNDS)
+	x = np.linspace(0.1, 2.0, 1001)
+	expected = f.evaluate(x=x)
+
+	start = time.perf_counter()
+	result = f.evaluate(backend=backend, x=x)
+	assert time.perf_counter() - start < 5.0
+	np.testing.assert_allclose(result, expected, rtol=1e-10)
+
+
+def test_polynomial():
+	# the degree doubles with every round, far past what the backend expands
+	f = _composed('x*x/(1 + x) + x', ROUNDS)
+	start = time.perf_counter()
+	assert f.polynomial is None
+	with pytest.raises(ValueError):
+		f.evaluate(backend=backends.POLYNOMIAL, x=1.0)
+	assert time.perf_counter() - start < 5.0
+
+	# shared subtrees of a low degree are still expanded
+	f = _composed('x*x + 1', 3)
+	assert f.polynomial.degree == 16
+	x = np.linspace(-1.0, 1.0, 11)
+	np.testing.assert_allclose(
+		f.evaluate(backend=backends.POLYNOMIAL, x=x),
+		f.evaluate(x=x),
+		rtol=1e-12
+	)
+
+
+def test_derivative_text():
+	# derivatives of repeated subtrees are shared, and written as let-bindings
+	#	that parse back to the same Func
+	f = pf.Func('exp(-r*t)*erf(x) + exp(-r*t)*sin(x*t)')
+	dfdr = f.d['r']
+	assert dfdr.text.startswith('(let _s0 = ')
+	assert pf.Func(dfdr.text) == dfdr
+	point = {'r': 0.05, 't': 2.0, 'x': 0.3}
+	assert pf.Func(dfdr.text)(**point) == dfdr(**point)
@@ -0,0 +1,87 @@
+"""
+structural digests, equality and hashing of ASTs and Funcs
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+
+import pfuncs as pf
+import pfuncs.ast as ast
+import pfuncs.cache as cache
+
+
+def test_describe_hides_derived_attributes():
+	f = pf.Func('x*y + sin(x)')
+	printed = io.StringIO()
+	with contextlib.redirect_stdout(printed):
+		f.tree.describe()
+	for name in ('digest', 'free', 'shared'):
+		assert '{}:'.format(name) not in printed.getvalue()
+	# describing doesn't hash the tree
+	assert '_digest' not in f.tree.__dict__
+
+
+def test_equal_structure():
+	f, g = pf.Func('x*y + sin(x)'), pf.Func('x * y + sin( x )')
+	assert f is not g and f.tree is not g.tree
+	assert f == g and hash(f) == hash(g)
+	assert f.digest == g.digest
+	assert len({f, g}) == 1
+
+	for text in ('y*x + sin(x)', 'x*y + cos(x)', 'x*y + sin(x) + 0', 'x*z + sin(x)'):
+		h = pf.Func(text)
+		assert h != f and h.digest != f.digest
+
+	# built another way, the same tree
+	assert pf.Func('x*y')(y='sin(z)') == pf.Func('x*sin(z)')
+	assert pf.Func('x**2 + y').d['x'] == pf.Func('2*x')
+
+
+def test_equal_numbers():
+	assert pf.Func('2*x') == pf.Func('2.0*x')
+	assert hash(pf.Func('2*x')) == hash(pf.Func('2.0*x'))
+	assert pf.Func('x*y')(y=2) == pf.Func('x*y')(y=2.0) == pf.Func('x*2')
+	assert pf.Func('2*x') != pf.Func('2.5*x')
+
+
+def test_digest_forgotten():
+	tree = pf.Func('x + 2').tree
+	before = tree.digest
+	assert tree.__dict__['_digest'] == before
+
+	# nodes changed in place are refreshed by whoever changes them
+	tree.right = pf.Func('y').tree
+	ast.refresh(tree)
+	assert '_digest' not in tree.__dict__
+	assert tree.digest != before
+	assert tree.digest == pf.Func('x + y').tree.digest
+	assert tree.free == ('x', 'y')
+
+	# and refreshing forgets digests everywhere, leaves included
+	for node in (tree, tree.left, tree.right):
+		assert node.digest
+	ast.refresh(tree)
+	for node in (tree, tree.left, tree.right):
+		assert '_digest' not in node.__dict__
+
+
+def test_digest_across_processes():
+	texts = ('x*y + sin(x)', 'max(x, 2.0) - exp(-x/y)', '3')
+	script = (
+		'import pfuncs as pf\n'
+		'for text in {!r}:\n'
+		'	print(pf.Func(text).digest)\n'
+	).format(texts)
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	env = dict(os.environ, PYTHONPATH=root, PYTHONHASHSEED='12345')
+	env.pop(cache.DIR_VARIABLE, None)
+	out = subprocess.run(
+		[sys.executable, '-c', script], 
+		cwd=root, 
+		env=env, 
+		stdout=subprocess.PIPE, 
+		check=True
+	)
+	assert out.stdout.decode().split() == [pf.Func(t).digest for t in texts]
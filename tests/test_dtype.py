@@ -0,0 +1,96 @@
+"""
+evaluating in a given dtype: every intermediate, not just the result, is in it
+"""
+import numpy as np
+import pytest
+
+import pfuncs as pf
+import pfuncs.backends as backends
+
+from pfuncs.plan import (
+	EvaluationPlan,
+	FusedEvaluator
+)
+from pfuncs.semantics import ScopedMemory
+
+
+EXPRESSIONS = (
+	'2*x + pi*y - e',
+	'exp(-x**2/2)*sin(y) + log(x)/3',
+	'max(x, y, 1.5) + normcdf(x, 0, 1)*2.5 - min(x, pi)',
+	'normpdf(y, pi, 2) / sqrt(x**2 + y**2)'
+)
+
+DTYPE = np.float32
+
+
+@pytest.fixture
+def intermediates(monkeypatch):
+	""" dtypes of the values computed by the Interpreter and the plans """
+	seen = list()
+
+	visit = backends.CastingInterpreter.visit
+	def checked_visit(self, node):
+		value = visit(self, node)
+		seen.append(np.asarray(value).dtype)
+		return value
+	monkeypatch.setattr(backends.CastingInterpreter, 'visit', checked_visit)
+
+	run = EvaluationPlan._run
+	def checked_run(self, values, *args):
+		allocated = run(self, values, *args)
+		seen.extend(np.asarray(v).dtype for v in values)
+		return allocated
+	monkeypatch.setattr(EvaluationPlan, '_run', checked_run)
+
+	run_scalar = EvaluationPlan._run_scalar
+	def checked_run_scalar(self, values):
+		run_scalar(self, values)
+		seen.extend(np.asarray(v).dtype for v in values)
+	monkeypatch.setattr(EvaluationPlan, '_run_scalar', checked_run_scalar)
+
+	return seen
+
+
+def _inputs(f, n):
+	x = np.linspace(0.1, 2.0, n)
+	return {'x': x, 'y': 2*x + 0.5}
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+@pytest.mark.parametrize('backend', backends.DTYPE_BACKENDS)
+def test_arrays(text, backend, intermediates):
+	f = pf.Func(text)
+	inputs = _inputs(f, 1000)
+	result = f.evaluate(backend=backend, dtype=DTYPE, **inputs)
+
+	assert result.dtype == DTYPE
+	assert intermediates
+	assert set(intermediates) == {np.dtype(DTYPE)}
+	np.testing.assert_allclose(result, f.evaluate(**inputs), rtol=1e-5, atol=1e-5)
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+@pytest.mark.parametrize('backend', backends.DTYPE_BACKENDS)
+def test_scalars(text, backend, intermediates):
+	f = pf.Func(text)
+	result = f.evaluate(backend=backend, dtype=DTYPE, x=0.75, y=1.25)
+
+	assert np.asarray(result).dtype == DTYPE
+	assert set(intermediates) == {np.dtype(DTYPE)}
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_fused_blocks(text, intermediates):
+	# blocks much smaller than the inputs, so the plan runs block by block
+	f = pf.Func(text)
+	inputs = _inputs(f, 10000)
+	scope = ScopedMemory(scope_name='global', scope_level=1)
+	for name, value in inputs.items():
+		scope.assign(name, value)
+	evaluator = FusedEvaluator(f.tree, block=500, dtype=DTYPE)
+	result = evaluator.evaluate(scope)
+
+	assert result.dtype == DTYPE
+	assert len(intermediates) == 20 * evaluator.plan.n_slots
+	assert set(intermediates) == {np.dtype(DTYPE)}
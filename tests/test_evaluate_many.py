@@ -0,0 +1,73 @@
+"""
+Func.evaluate_many against evaluating each dict of arguments on its own
+"""
+import numpy as np
+import pytest
+
+import pfuncs as pf
+import pfuncs.backends as backends
+
+
+EXPRESSIONS = (
+	'max(x, y)',
+	'min(x, y)',
+	'max(x, 2*y, 1) - min(x, y)',
+	'x*y + max(x**2, y) / (1 + min(x, 0.5))',
+	'normcdf(max(x, y), 0, 1)'
+)
+BACKENDS = (
+	backends.NUMPY,
+	backends.NUMEXPR,
+	backends.BUFFERED,
+	backends.FUSED
+)
+
+ROWS = [
+	{'x': 1.0, 'y': 2.0},
+	{'x': 3.0, 'y': -1.0},
+	{'x': -2.0, 'y': -4.5},
+	{'x': 0.25, 'y': 0.75},
+	{'x': 5.0, 'y': 5.0}
+]
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_rows(text, backend):
+	f = pf.Func(text)
+	expected = [f(**kw) for kw in ROWS]
+	results = f.evaluate_many(ROWS, backend=backend)
+	np.testing.assert_allclose(results, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_arrays(text):
+	# vectorized max & min are elementwise, on every backend
+	f = pf.Func(text)
+	x = np.array([kw['x'] for kw in ROWS])
+	y = np.array([kw['y'] for kw in ROWS])
+	expected = [f(**kw) for kw in ROWS]
+	for backend in BACKENDS:
+		result = f.evaluate(backend=backend, x=x, y=y)
+		np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+def test_mixed_rows():
+	f = pf.Func('max(x, y)')
+	rows = ROWS + [{'x': 'y'}]
+	results = f.evaluate_many(rows)
+	assert results[:-1] == [f(**kw) for kw in ROWS]
+	assert isinstance(results[-1], pf.Func)
+
+
+def test_integer_rows():
+	# ints and bools are evaluated row by row, as float64 can't hold them all
+	f = pf.Func('x - y')
+	rows = [{'x': 10**17 + 1, 'y': 1}, {'x': True, 'y': False}, {'x': 2.5, 'y': 1.0}]
+	assert f.evaluate_many(rows) == [f(**kw) for kw in rows] == [10**17, 1, 1.5]
+
+
+def test_broadcast_arrays():
+	f = pf.Func('max(x, 0) + min(x, y)')
+	x = np.array([-1.0, 0.5, 2.0])
+	np.testing.assert_array_equal(f(x=x, y=1.0), [-1.0, 1.0, 3.0])
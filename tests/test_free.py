@@ -0,0 +1,71 @@
+"""
+free variables kept on AST nodes, against walking the tree, after the
+operators that rewrite it: currying, reducing and differentiating
+"""
+import pfuncs as pf
+import pfuncs.ast as ast
+from pfuncs.utils import Reducer, is_constant
+
+
+def _walk(node):
+	""" the free variables of 'node' found by walking all of it """
+	if isinstance(node, ast.Var):
+		return (node.value,)
+	free = ()
+	for child in ast.iter_children(node):
+		free += tuple(v for v in _walk(child) if v not in free)
+	return free
+
+
+def _check(f, variables):
+	assert f.variables == variables
+	assert pf.Func(f.text).variables == variables
+
+	# every node's set is up to date, not just the root's
+	stack = [f.tree]
+	while stack:
+		node = stack.pop()
+		assert node.free == _walk(node)
+		stack.extend(ast.iter_children(node))
+
+	for name in ('w', 'x', 'y', 'z'):
+		assert is_constant(f.tree, name) == (name not in variables)
+
+
+def test_parsed():
+	_check(pf.Func('x*y + sin(z)'), ('x', 'y', 'z'))
+	_check(pf.Func('max(y, x) - exp(-x/y)'), ('y', 'x'))
+	_check(pf.Func('3 + 4'), ())
+
+
+def test_currying():
+	f = pf.Func('x*y + sin(z)*x')
+	_check(f(x=2.0), ('y', 'z'))
+	_check(f(x=2.0, z=1.0), ('y',))
+	_check(f(z='w + y'), ('x', 'y', 'w'))
+
+	# substituting a constant expression removes the variable too
+	_check(f(x='2 + 1'), ('y', 'z'))
+
+
+def test_reduction():
+	f = Reducer(pf.Func('0*z + y').tree)
+	_check(pf.Func(tree=f.tree), ('y',))
+	f = Reducer(pf.Func('x**0*y + z/1').tree)
+	_check(pf.Func(tree=f.tree), ('y', 'z'))
+
+	# the Reducer doesn't cancel like terms, so 'x' is still free in 'x - x'
+	f = Reducer(pf.Func('x - x + y').tree)
+	_check(pf.Func(tree=f.tree), ('x', 'y'))
+
+
+def test_derivatives():
+	f = pf.Func('x*y + z**2')
+	_check(f.d['x'], ('y',))
+	_check(f.d['z'], ('z',))
+	_check(f.d['x', 'y'], ())
+
+	g = pf.Func('x*y*z + w')
+	_check(g.d['x'], ('y', 'z'))
+	_check(g.d['x'](y=2.0), ('z',))
+	_check(g(w=1.0, y='x + z').d['z'], ('x', 'z'))
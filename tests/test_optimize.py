@@ -0,0 +1,94 @@
+"""
+pfuncs.minimize against known minima, and on objectives it can't minimize
+"""
+import warnings
+
+import numpy as np
+import pytest
+
+import pfuncs as pf
+import pfuncs.optimize as optimize
+
+
+METHODS = ('lbfgs', 'newton')
+
+ROSENBROCK = '(a - x)**2 + b*(y - x**2)**2'
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_rosenbrock(method):
+	minimum = pf.minimize(ROSENBROCK, {'x': -1.2, 'y': 1.0}, method=method, a=1, b=100)
+	assert minimum.converged
+	assert abs(minimum.x['x'] - 1) < 1e-6 and abs(minimum.x['y'] - 1) < 1e-6
+	assert minimum.fun < 1e-12
+	assert np.max(np.abs(minimum.gradient)) <= 1e-8
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_quadratic(method):
+	# minimized where the gradient, linear in x, y and z, is zero
+	f = pf.Func('(x - 1)**2 + (y + 2)**2 + (z - 3)**2 + x*y/10')
+	minimum = pf.minimize(f, {'x': 0.0, 'y': 0.0, 'z': 0.0}, method=method)
+	expected = np.linalg.solve([[2, 0.1, 0], [0.1, 2, 0], [0, 0, 2]], [2, -4, 6])
+	assert minimum.converged
+	np.testing.assert_allclose([minimum.x[k] for k in 'xyz'], expected, atol=1e-8)
+	assert minimum.fun == pytest.approx(f(**dict(zip('xyz', expected))))
+
+	# with z fixed, over x and y only
+	minimum = pf.minimize(f, {'x': 0.0, 'y': 0.0}, method=method, z=1.0)
+	assert sorted(minimum.x) == ['x', 'y']
+	np.testing.assert_allclose([minimum.x['x'], minimum.x['y']], expected[:2], atol=1e-8)
+
+
+def test_newton_nonconvex_start():
+	# the Hessian is negative at 0, so Newton's method shifts it
+	minimum = pf.minimize('x**4 - 3*x**2 + x', {'x': 0.0}, method='newton')
+	assert minimum.converged
+	assert abs(4*minimum.x['x']**3 - 6*minimum.x['x'] + 1) < 1e-8
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_not_converging(method):
+	minimum = pf.minimize(
+		ROSENBROCK,
+		{'x': -1.2, 'y': 1.0},
+		method=method,
+		maxiter=3,
+		a=1,
+		b=100
+	)
+	assert not minimum.converged and minimum.iterations == 3
+
+	# unbounded below
+	minimum = pf.minimize('x - y**2', {'x': 0.0, 'y': 1.0}, method=method, maxiter=20)
+	assert not minimum.converged
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_nan(method):
+	with warnings.catch_warnings():
+		warnings.simplefilter('ignore', RuntimeWarning)
+		minimum = pf.minimize('sqrt(x) + y**2', {'x': -1.0, 'y': 1.0}, method=method)
+	assert not minimum.converged and minimum.iterations == 0
+	assert minimum.x == {'x': -1.0, 'y': 1.0}
+
+
+def test_nonfinite_hessian():
+	# shifting can't make these positive definite, so Newton's method stops
+	#	rather than shifting forever
+	for h in ([[-np.inf, 0.0], [0.0, 1.0]], [[-1.0, np.nan], [np.nan, -1.0]]):
+		def objective(x, h=np.array(h)):
+			return 1.0, np.ones(2), h
+
+		x, f, g, it, converged = optimize._newton(objective, np.zeros(2), 1e-8, 10)
+		assert not converged and it == 0
+		assert x.tolist() == [0.0, 0.0]
+
+
+def test_names():
+	with pytest.raises(NameError):
+		pf.minimize(ROSENBROCK, {'x': 0.0, 'y': 0.0}, a=1)
+	with pytest.raises(NameError):
+		pf.minimize(ROSENBROCK, {'x': 0.0, 'w': 0.0}, a=1, b=100)
+	with pytest.raises(ValueError):
+		pf.minimize(ROSENBROCK, {'x': 0.0, 'y': 0.0}, method='cg', a=1, b=100)
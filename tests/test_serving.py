@@ -0,0 +1,60 @@
+"""
+AsyncEvaluator against evaluating each request on its own
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+import pfuncs as pf
+
+
+EXPRESSIONS = (
+	'max(x, y)',
+	'min(x, y) + x*y',
+	'x**2*y + exp(-x/y) - normcdf(max(x, y), 0, 1)'
+)
+
+
+def _gather(evaluator, requests):
+	async def run():
+		return await asyncio.gather(
+			*(evaluator(**kw) for kw in requests),
+			return_exceptions=True
+		)
+	return asyncio.run(run())
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_concurrent(text):
+	f = pf.Func(text)
+	rng = np.random.default_rng(0)
+	requests = [
+		{'x': float(x), 'y': float(y)}
+		for x, y in rng.uniform(0.1, 4.0, size=(200, 2))
+	]
+	evaluator = pf.AsyncEvaluator(f, max_batch=32, max_delay_ms=5)
+	try:
+		results = _gather(evaluator, requests)
+	finally:
+		evaluator.close()
+
+	expected = [f(**kw) for kw in requests]
+	np.testing.assert_allclose(results, expected, rtol=1e-12)
+	# the requests were evaluated in batches, not one at a time
+	assert evaluator.metrics.batches < len(requests)
+
+
+def test_partial_requests():
+	f = pf.Func('max(x, y)')
+	# a request missing a variable curries, without holding up its batch
+	requests = [{'x': 1.0, 'y': 2.0}, {'x': 1.0}, {'x': 3.0, 'y': 0.5}]
+	evaluator = pf.AsyncEvaluator(f, max_delay_ms=5)
+	try:
+		results = _gather(evaluator, requests)
+	finally:
+		evaluator.close()
+
+	assert results[0] == 2.0
+	assert isinstance(results[1], pf.Func)
+	assert results[2] == 3.0
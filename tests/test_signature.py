@@ -0,0 +1,51 @@
+"""
+signatures of the Funcs derived from a signed Func
+"""
+import pfuncs as pf
+
+
+def _f():
+	return pf.Func('x*y + exp(y)', signature=('y', 'x'))
+
+
+def test_algebra():
+	f = _f()
+	assert (f + 1).signature == ('y', 'x')
+	assert (2*f - f/'x').signature == ('y', 'x')
+	assert (-f).signature == ('y', 'x')
+	assert (f + 'x*z').signature is None
+	assert (pf.Func('x*y') + 1).signature is None
+
+
+def test_derivatives():
+	f = _f()
+	dfdx = f.d['x']
+	assert dfdx.signature == ('y', 'x')
+	# positionally, it takes the same arguments as f
+	assert dfdx(2.0, 3.0) == dfdx.fast(2.0, 3.0) == 2.0
+	assert f.d[('x', 'y')].signature == ('y', 'x')
+
+
+def test_currying():
+	f = _f()
+	assert f(y=2.0).signature == ('x',)
+	assert f(x='x + 1').signature == ('y', 'x')
+	assert f(x='z').signature is None
+	g = f(y=2.0)
+	assert g.fast(3.0) == f.fast(2.0, 3.0)
+
+
+def test_fast_integers():
+	# Python ints and bools are computed as __call__ computes them, not with
+	#	NumPy's fixed-width integers
+	f = pf.Func('x**y', signature=('x', 'y'))
+	assert f.fast(2, -1) == f(2, -1) == 0.5
+	assert f.evaluate(backend='buffered', x=2, y=-1) == 0.5
+
+	g = pf.Func('x*y', signature=('x', 'y'))
+	assert g.fast(10**10, 10**10) == 1e20
+	assert g.evaluate(backend='buffered', x=10**10, y=10**10) == 1e20
+
+	h = pf.Func('x + y', signature=('x', 'y'))
+	assert h.fast(True, True) == h(True, True) == 2
+	assert h.evaluate(backend='buffered', x=True, y=True) == 2
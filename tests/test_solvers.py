@@ -0,0 +1,73 @@
+"""
+pfuncs.solve against known roots, with and without brackets, and on
+equations it can't solve
+"""
+import warnings
+
+import numpy as np
+import pytest
+
+import pfuncs as pf
+
+
+METHODS = ('newton', 'halley')
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_square_roots(method):
+	a = np.array([[0.25, 2.0, 9.0], [16.0, 1e-4, 1e6]])
+	solution = pf.solve('x**2 - a', 'x', 1.0, method=method, a=a)
+	assert solution.x.shape == a.shape
+	assert solution.converged.all()
+	np.testing.assert_allclose(solution.x, np.sqrt(a), rtol=1e-12)
+	assert (solution.iterations < 50).all()
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_scalar(method):
+	solution = pf.solve('cos(x) - x', 'x', 1.0, method=method)
+	assert np.ndim(solution.x) == 0 and solution.converged
+	assert abs(solution.x - 0.7390851332151607) < 1e-12
+
+
+def test_halley_is_faster():
+	# Halley's method converges cubically, so never takes more iterations
+	x0 = np.linspace(0.5, 5.0, 10)
+	newton = pf.solve('exp(x) - 10*x', 'x', x0, method='newton')
+	halley = pf.solve('exp(x) - 10*x', 'x', x0, method='halley')
+	assert newton.converged.all() and halley.converged.all()
+	np.testing.assert_allclose(halley.x, newton.x, rtol=1e-10)
+	assert (halley.iterations <= newton.iterations).all()
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_bracket(method):
+	# Newton's steps from 0 leave the bracket, which bisection catches
+	f = 'x**3 - 2*x - 5'
+	solution = pf.solve(f, 'x', 0.0, method=method, bracket=(2.0, 3.0))
+	assert solution.converged
+	assert abs(solution.x - 2.0945514815423265) < 1e-12
+
+	# no sign change in the bracket
+	solution = pf.solve(f, 'x', 0.0, method=method, bracket=(3.0, 4.0))
+	assert np.isnan(solution.x) and not solution.converged
+
+
+def test_not_converging():
+	# no real roots: steps wander until maxiter
+	solution = pf.solve('x**2 + 1', 'x', np.array([0.5, 3.0]), maxiter=20)
+	assert not solution.converged.any()
+	assert (solution.iterations == 20).all()
+
+	# nan steps stop an element where it is, leaving the others to converge
+	with warnings.catch_warnings():
+		warnings.simplefilter('ignore', RuntimeWarning)
+		solution = pf.solve('sqrt(x) - 2', 'x', np.array([-1.0, 1.0]))
+	assert solution.converged.tolist() == [False, True]
+	assert solution.x[0] == -1.0 and solution.iterations[0] == 1
+	assert abs(solution.x[1] - 4.0) < 1e-12
+
+
+def test_unknown_method():
+	with pytest.raises(ValueError):
+		pf.solve('x - 1', 'x', 0.0, method='secant')